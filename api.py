@@ -1,14 +1,50 @@
+import asyncio
 import sys
 import uvicorn
 import click
-from fastapi import FastAPI
-from app.routes import upload, rag, add_url
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from app.resources import init_resources, close_resources, get_job_queue
+from app.routes import upload, rag, rag_stream, rag_batch, add_url, jobs, metrics
+from ingestion.worker import start_worker_threads, stop_workers
+from app.config import JOB_WORKERS
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Builds the shared repository, LLM clients and chains once per worker process,
+    and starts the background ingestion workers.
+
+    Workers run as threads of this process and share its repository: embedded
+    Chroma cannot be opened by several processes.
+    """
+    init_resources()
+    workers = start_worker_threads(JOB_WORKERS) if JOB_WORKERS > 0 else []
+    yield
+    stop_workers(workers)
+    close_resources()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+@app.middleware("http")
+async def note_query_activity(request: Request, call_next):
+    """Tells the ingestion workers that queries are being served, so they yield the LLM."""
+    if request.url.path.startswith("/ask"):
+        # The queue is a SQLite file: keep its writes off the event loop
+        await asyncio.to_thread(get_job_queue().note_query)
+    return await call_next(request)
 
-app = FastAPI()
 
 app.include_router(upload.router)
 app.include_router(rag.router)
+app.include_router(rag_stream.router)
+app.include_router(rag_batch.router)
 app.include_router(add_url.router)
+app.include_router(jobs.router)
+app.include_router(metrics.router)
 
 @click.group()
 def main():
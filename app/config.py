@@ -3,6 +3,142 @@ from app.environment import init_environment
 
 init_environment()  # Charge les variables d'env
 
+
+def _parse_bool(value: str) -> bool:
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _get_bool(name: str, default: bool = False) -> bool:
+    """Reads a boolean flag ("true"/"1"/"yes") from the environment."""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return _parse_bool(value)
+
+
+def _get_optional(name: str, cast, default: str = ""):
+    """Reads an optional setting, converted with `cast`; None when empty."""
+    value = os.getenv(name, default).strip()
+    return cast(value) if value else None
+
+
+def _keep_alive(value: str):
+    """Ollama takes a duration ("10m") or a number of seconds (-1 keeps the model loaded)."""
+    return int(value) if value.lstrip("-").isdigit() else value
+
+
 TAVILY_API_KEY = os.getenv("TAVILY_API_KEY")
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "deepseek-r1")
+
+# Per-role LLM settings: GENERATOR_*, GRADER_* and REWRITER_* variables.
+# An empty model uses OLLAMA_MODEL; empty options keep the model's defaults.
+# The grader only emits a one-word JSON verdict: its output is capped and
+# reasoning ("thinking") is off by default.
+LLM_ROLES = ("generator", "grader", "rewriter")
+_ROLE_DEFAULTS = {"grader": {"NUM_PREDICT": "16", "REASONING": "false"}}
+LLM_ROLE_SETTINGS = {
+    role: {
+        "model": os.getenv(f"{role.upper()}_MODEL", ""),
+        # Max output tokens (per verdict for the grader)
+        "num_predict": _get_optional(f"{role.upper()}_NUM_PREDICT", int, _ROLE_DEFAULTS.get(role, {}).get("NUM_PREDICT", "")),
+        "num_ctx": _get_optional(f"{role.upper()}_NUM_CTX", int),  # context window
+        "temperature": _get_optional(f"{role.upper()}_TEMPERATURE", float),
+        "keep_alive": _get_optional(f"{role.upper()}_KEEP_ALIVE", _keep_alive),  # e.g. "30m", -1 to keep loaded
+        # Ollama "think" flag of reasoning models; empty keeps the model's behavior
+        "reasoning": _get_optional(f"{role.upper()}_REASONING", _parse_bool, _ROLE_DEFAULTS.get(role, {}).get("REASONING", "")),
+    }
+    for role in LLM_ROLES
+}
+
+# LLM scheduling
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "2"))  # calls in flight per model, 0 for no limit
+LLM_MODEL_CONCURRENCY = os.getenv("LLM_MODEL_CONCURRENCY", "")  # per-model overrides, "model=limit,model=limit"
+LLM_COALESCE = _get_bool("LLM_COALESCE", True)  # identical in-flight requests share one call
+
+# Grading
+GRADING_MODE = os.getenv("GRADING_MODE", "sequential")  # "sequential", "concurrent" or "batched"
+GRADING_CONCURRENCY = int(os.getenv("GRADING_CONCURRENCY", "4"))
+GRADING_STOP_ON_IRRELEVANT = _get_bool("GRADING_STOP_ON_IRRELEVANT")
+GRADING_MIN_RELEVANT = int(os.getenv("GRADING_MIN_RELEVANT", "0"))  # 0 disables the fast path
+GRADING_STRUCTURED = _get_bool("GRADING_STRUCTURED", True)  # JSON schema output (Ollama >= 0.5), else plain JSON mode
+
+# Grading verdict cache
+GRADING_CACHE_ENABLED = _get_bool("GRADING_CACHE_ENABLED", True)
+GRADING_CACHE_SIZE = int(os.getenv("GRADING_CACHE_SIZE", "4096"))
+GRADING_CACHE_TTL = float(os.getenv("GRADING_CACHE_TTL", "86400"))  # seconds, 0 disables expiry
+GRADING_CACHE_PATH = os.getenv("GRADING_CACHE_PATH", "")  # SQLite file, empty for memory only
+GRADING_CACHE_MAX_DISK_ENTRIES = int(os.getenv("GRADING_CACHE_MAX_DISK_ENTRIES", "100000"))
+
+# Semantic answer cache
+ANSWER_CACHE_ENABLED = _get_bool("ANSWER_CACHE_ENABLED")
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))  # cosine similarity
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "512"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))  # seconds, 0 disables expiry
+
+# Query embedding cache
+EMBEDDING_CACHE_ENABLED = _get_bool("EMBEDDING_CACHE_ENABLED", True)
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "2048"))
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "")  # SQLite file, empty for memory only
+EMBEDDING_CACHE_MAX_DISK_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_DISK_ENTRIES", "100000"))
+
+# Ingestion pipeline
+INGEST_FETCH_WORKERS = int(os.getenv("INGEST_FETCH_WORKERS", "8"))
+INGEST_FETCH_PER_HOST = int(os.getenv("INGEST_FETCH_PER_HOST", "2"))
+INGEST_EMBED_BATCH_SIZE = int(os.getenv("INGEST_EMBED_BATCH_SIZE", "64"))
+INGEST_EMBED_WORKERS = int(os.getenv("INGEST_EMBED_WORKERS", "2"))
+INGEST_PAGE_WINDOW = int(os.getenv("INGEST_PAGE_WINDOW", "32"))  # pages of a streamed file split at once
+# PDF extraction and uploads
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", "0"))  # worker processes, 0 for one per core
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "64"))  # smaller PDFs are extracted in-process
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "16"))
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "temp")
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1 << 20)))  # bytes copied to disk at a time
+# Background ingestion jobs
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", "./jobs/jobs.sqlite3")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "1"))  # worker threads started by the API, 0 to run them with `run-workers` (NumPy store only)
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1.0"))  # queue polling interval of idle workers
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", "10"))  # jobs silent for 6 heartbeats are requeued
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_QUERY_WINDOW = float(os.getenv("JOB_QUERY_WINDOW", "5"))  # seconds after a query during which ingestion yields
+JOB_YIELD_SECONDS = float(os.getenv("JOB_YIELD_SECONDS", "0.5"))  # pause before each embedding batch while yielding
+# Web search
+WEB_SEARCH_RESULTS = int(os.getenv("WEB_SEARCH_RESULTS", "3"))
+WEB_SEARCH_CACHE_ENABLED = _get_bool("WEB_SEARCH_CACHE_ENABLED", True)
+WEB_SEARCH_CACHE_SIZE = int(os.getenv("WEB_SEARCH_CACHE_SIZE", "1024"))
+WEB_SEARCH_CACHE_TTL = float(os.getenv("WEB_SEARCH_CACHE_TTL", "3600"))  # seconds, 0 disables expiry
+WEB_SEARCH_CACHE_PATH = os.getenv("WEB_SEARCH_CACHE_PATH", "")  # SQLite file, empty for memory only
+WEB_SEARCH_CACHE_MAX_DISK_ENTRIES = int(os.getenv("WEB_SEARCH_CACHE_MAX_DISK_ENTRIES", "10000"))
+WEB_SEARCH_SPECULATIVE = _get_bool("WEB_SEARCH_SPECULATIVE")  # rewrite + search while grading
+# Retrieval
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "dense")  # "dense" or "hybrid" (BM25 + vectors)
+LEXICAL_INDEX_ENABLED = _get_bool("LEXICAL_INDEX_ENABLED", True)  # keep the BM25 index in sync with the store
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))  # candidates per ranking before fusion
+HYBRID_RRF_K = int(os.getenv("HYBRID_RRF_K", "60"))
+# Pre-grading (settles clear-cut chunks without the LLM grader)
+PREGRADE_ENABLED = _get_bool("PREGRADE_ENABLED")
+PREGRADE_ACCEPT_SIMILARITY = float(os.getenv("PREGRADE_ACCEPT_SIMILARITY", "0.85"))  # retrieval score, 0-1
+PREGRADE_REJECT_SIMILARITY = float(os.getenv("PREGRADE_REJECT_SIMILARITY", "0.35"))
+PREGRADE_ACCEPT_OVERLAP = float(os.getenv("PREGRADE_ACCEPT_OVERLAP", "0"))  # share of question terms, 0 disables
+PREGRADE_REJECT_OVERLAP = float(os.getenv("PREGRADE_REJECT_OVERLAP", "0"))
+# Context packing for answer generation
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "2048"))  # 0 disables packing
+CONTEXT_DEDUP_MAX_DISTANCE = int(os.getenv("CONTEXT_DEDUP_MAX_DISTANCE", "3"))  # SimHash bits, -1 disables
+CONTEXT_COMPRESS_WEB = _get_bool("CONTEXT_COMPRESS_WEB", True)
+CONTEXT_WEB_MAX_TOKENS = int(os.getenv("CONTEXT_WEB_MAX_TOKENS", "256"))  # per web page
+# Batch question answering
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))  # questions in flight
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "4"))  # LLM calls in flight, 0 for no cap
+BATCH_EMBED_SIZE = int(os.getenv("BATCH_EMBED_SIZE", "64"))  # questions embedded and retrieved together
+BATCH_CHECKPOINT_DIR = os.getenv("BATCH_CHECKPOINT_DIR", "./batch_checkpoints")
+# Vector store backend
+VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "chroma")  # "chroma" or "numpy" (memory-mapped matrix)
+NUMPY_STORE_IVF_LISTS = int(os.getenv("NUMPY_STORE_IVF_LISTS", "0"))  # IVF cells, 0 for exact search only
+NUMPY_STORE_IVF_PROBES = int(os.getenv("NUMPY_STORE_IVF_PROBES", "8"))  # cells scanned per query
+NUMPY_STORE_IVF_MIN_ROWS = int(os.getenv("NUMPY_STORE_IVF_MIN_ROWS", "50000"))  # train the IVF index from this size
+NUMPY_STORE_PQ_SUBVECTORS = int(os.getenv("NUMPY_STORE_PQ_SUBVECTORS", "0"))  # PQ bytes per vector, 0 disables PQ
+NUMPY_STORE_PQ_RERANK = int(os.getenv("NUMPY_STORE_PQ_RERANK", "10"))  # exact re-scoring candidates per result
+# Chroma HNSW index (0 keeps Chroma's default)
+CHROMA_HNSW_SEARCH_EF = int(os.getenv("CHROMA_HNSW_SEARCH_EF", "0"))
+CHROMA_HNSW_CONSTRUCTION_EF = int(os.getenv("CHROMA_HNSW_CONSTRUCTION_EF", "0"))  # new collections only
+CHROMA_HNSW_M = int(os.getenv("CHROMA_HNSW_M", "0"))  # new collections only
 # Ajoute d'autres variables si besoin
@@ -0,0 +1,99 @@
+"""
+resources.py
+------------
+Application-scoped resource registry.
+
+Holds the objects that are expensive to build and safe to share: the
+article repository (one Chroma client and one embedding client per process),
+the splitter, the pooled Ollama clients and the prebuilt chains. The FastAPI
+lifespan calls `init_resources` at startup and `close_resources` at shutdown;
+the CLI gets the same objects lazily. The background job queue is shared
+the same way.
+"""
+
+import logging
+import threading
+from typing import Optional
+from repository.article_repository import ArticleRepository
+from utils.tiktoken_spliter import TiktokenSpliter
+from generation.chains import warm_up_chains, clear_chains
+from generation.llm_manager import clear_llm_pool
+from ingestion.job_queue import JobQueue
+from app.config import JOB_QUEUE_PATH, JOB_MAX_ATTEMPTS
+
+_article_repository: Optional[ArticleRepository] = None
+_splitter: Optional[TiktokenSpliter] = None
+_job_queue: Optional[JobQueue] = None
+_lock = threading.Lock()
+
+
+def get_article_repository() -> ArticleRepository:
+    """
+    Returns the shared ArticleRepository, creating it on first use.
+
+    Returns:
+        ArticleRepository: The process-wide repository.
+    """
+    global _article_repository
+
+    with _lock:
+        if _article_repository is None:
+            _article_repository = ArticleRepository()
+        return _article_repository
+
+
+def get_splitter() -> TiktokenSpliter:
+    """
+    Returns the shared document splitter, creating it on first use.
+
+    Returns:
+        TiktokenSpliter: The process-wide splitter.
+    """
+    global _splitter
+
+    with _lock:
+        if _splitter is None:
+            _splitter = TiktokenSpliter()
+        return _splitter
+
+
+def get_job_queue() -> JobQueue:
+    """
+    Returns the shared background job queue, creating it on first use.
+
+    Returns:
+        JobQueue: The process-wide job queue.
+    """
+    global _job_queue
+
+    with _lock:
+        if _job_queue is None:
+            _job_queue = JobQueue(JOB_QUEUE_PATH, max_attempts=JOB_MAX_ATTEMPTS)
+        return _job_queue
+
+
+def init_resources() -> None:
+    """
+    Builds every shared resource up front, so the first request does not pay for it.
+    """
+    get_article_repository()
+    get_splitter()
+    warm_up_chains()
+    logging.info("Application resources initialized.")
+
+
+def close_resources() -> None:
+    """
+    Releases the shared resources.
+    """
+    global _article_repository, _splitter, _job_queue
+
+    clear_chains()
+    clear_llm_pool()
+    with _lock:
+        _article_repository = None
+        _splitter = None
+        if _job_queue is not None:
+            _job_queue.close()
+            _job_queue = None
+    logging.info("Application resources released.")
@@ -1,27 +1,27 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
 from typing import List
-from app.loader_factory import LoaderFactory
-from repository.article_repository import ArticleRepository
-from utils.tiktoken_spliter import TiktokenSpliter
+from app.resources import get_job_queue
 
 router = APIRouter()
-article_repository = ArticleRepository()
-splitter = TiktokenSpliter()
 
 class URLInput(BaseModel):
     urls: List[str]
 
-@router.post("/add-url")
-def add_documents_from_url(data: URLInput):
+@router.post("/add-url", status_code=202)
+async def add_documents_from_url(data: URLInput, request: Request):
     """
-    Adds documents from URLs to the vector store.
+    Queues the ingestion of documents from URLs into the vector store.
+
+    Ingestion runs in a background worker; poll `GET /jobs/{job_id}` for its
+    progress and result.
     """
+    if not data.urls:
+        raise HTTPException(status_code=400, detail="Missing required parameter: 'urls'.")
+
     try:
-        loader = LoaderFactory.create_loader("url", urls=data.urls)
-        docs = loader.load()
-        doc_splits = splitter.split(docs)
-        document_ids = article_repository.add(doc_splits)
-        return {"message": "Documents added successfully", "document_ids": document_ids}
+        client = request.client.host if request.client else "default"
+        job_id = get_job_queue().enqueue("urls", {"urls": list(dict.fromkeys(data.urls))}, client=client)
+        return {"message": "Ingestion queued", "job_id": job_id, "status_url": f"/jobs/{job_id}"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,29 @@
+import asyncio
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query
+from app.resources import get_job_queue
+from ingestion.job_queue import STATUSES
+
+router = APIRouter()
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Returns the status of a background ingestion job: "queued" (with its position
+    in the queue), "running" (with per-stage progress), "done" or "failed" (with
+    the ingestion result and stats).
+    """
+    job = await asyncio.to_thread(get_job_queue().get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return job
+
+@router.get("/jobs")
+async def list_jobs(status: Optional[str] = None, limit: int = Query(50, ge=1, le=500)):
+    """
+    Lists the most recent background ingestion jobs, with the number of jobs in each status.
+    """
+    if status is not None and status not in STATUSES:
+        raise HTTPException(status_code=400, detail=f"Unknown status: {status}")
+    queue = get_job_queue()
+    return await asyncio.to_thread(lambda: {"counts": queue.counts(), "jobs": queue.list(status, limit)})
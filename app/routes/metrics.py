@@ -0,0 +1,12 @@
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+router = APIRouter()
+
+@router.get("/metrics")
+async def metrics():
+    """
+    Exposes Prometheus metrics: per-step latency, LLM latency, time-to-first-token, token counts,
+    and LLM scheduler queue depth, wait time and coalesced calls.
+    """
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
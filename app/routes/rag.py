@@ -1,25 +1,32 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from repository.article_repository import ArticleRepository
-from workflow.graph import run_workflow
+from app.resources import get_article_repository
+from workflow.graph import arun_workflow
+from utils.tracing import start_trace
 
 router = APIRouter()
 
-article_repository = ArticleRepository()
-
 class QuestionRequest(BaseModel):
     question: str
+    include_timings: bool = False
 
 @router.post("/ask")
-def ask_question(request: QuestionRequest):
+async def ask_question(request: QuestionRequest):
     """
     Executes the RAG workflow for the given question.
+
+    With `include_timings`, the response also carries the per-step latency
+    and token breakdown of the request.
     """
     try:
-        final_state = run_workflow(request.question, article_repository)
-        return {
+        with start_trace() as trace:
+            final_state = await arun_workflow(request.question, get_article_repository())
+        response = {
             "answer": final_state["generation"],
             "steps": final_state["steps"]
         }
+        if request.include_timings:
+            response["timings"] = trace.to_dict()
+        return response
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
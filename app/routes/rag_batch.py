@@ -0,0 +1,45 @@
+import json
+import os
+import re
+from typing import AsyncIterator, Optional
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from app.resources import get_article_repository
+from app.config import BATCH_CHECKPOINT_DIR
+from workflow.batch import BatchRunner, read_questions
+
+router = APIRouter()
+
+_BATCH_ID = re.compile(r"^[\w-]{1,128}$")
+
+
+async def _ndjson_results(runner: BatchRunner, items: list) -> AsyncIterator[str]:
+    """
+    Formats batch results as JSON Lines, one line per question as it completes.
+    """
+    try:
+        async for result in runner.arun(items, replay=True):
+            yield json.dumps(result) + "\n"
+    except Exception as e:
+        yield json.dumps({"error": str(e)}) + "\n"
+
+
+@router.post("/ask/batch")
+async def ask_batch(request: Request, batch_id: Optional[str] = None):
+    """
+    Answers a JSONL body of questions ({"id": ..., "question": ...} per line)
+    and streams the results back as JSON Lines, in completion order.
+
+    With a `batch_id`, progress is checkpointed on the server: sending the same
+    batch again replays the answered questions and only runs the rest.
+    """
+    if batch_id is not None and not _BATCH_ID.match(batch_id):
+        raise HTTPException(status_code=400, detail="batch_id may only contain letters, digits, '_' and '-'.")
+    try:
+        items = read_questions((await request.body()).decode("utf-8").splitlines())
+    except (UnicodeDecodeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    checkpoint = os.path.join(BATCH_CHECKPOINT_DIR, f"{batch_id}.jsonl") if batch_id else None
+    runner = BatchRunner(get_article_repository(), checkpoint_path=checkpoint)
+    return StreamingResponse(_ndjson_results(runner, items), media_type="application/x-ndjson")
@@ -0,0 +1,40 @@
+import json
+from typing import AsyncIterator
+from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
+from app.resources import get_article_repository
+from app.routes.rag import QuestionRequest
+from workflow.graph import astream_workflow
+from utils.tracing import start_trace
+
+router = APIRouter()
+
+
+async def _sse_events(question: str, include_timings: bool = False) -> AsyncIterator[str]:
+    """
+    Formats workflow events as Server-Sent Events.
+
+    With `include_timings`, a final "timings" event carries the per-step
+    latency and token breakdown.
+    """
+    try:
+        with start_trace() as trace:
+            async for event in astream_workflow(question, get_article_repository()):
+                yield f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+        if include_timings:
+            yield f"event: timings\ndata: {json.dumps({'event': 'timings', **trace.to_dict()})}\n\n"
+    except Exception as e:
+        yield f"event: error\ndata: {json.dumps({'event': 'error', 'detail': str(e)})}\n\n"
+
+
+@router.post("/ask/stream")
+async def ask_question_stream(request: QuestionRequest):
+    """
+    Executes the RAG workflow for the given question and streams step events
+    and answer tokens as Server-Sent Events.
+    """
+    return StreamingResponse(
+        _sse_events(request.question, request.include_timings),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
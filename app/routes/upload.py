@@ -1,27 +1,47 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from app.loader_factory import LoaderFactory
-from repository.article_repository import ArticleRepository
+import asyncio
+import os
+import shutil
+import uuid
+from fastapi import APIRouter, UploadFile, File, HTTPException, Request
+from app.resources import get_job_queue
+from app.config import UPLOAD_DIR, UPLOAD_CHUNK_SIZE
 
 router = APIRouter()
-article_repository = ArticleRepository()
 
-@router.post("/upload")
-async def upload_document(file: UploadFile = File(...)):
+
+def _save_upload(file: UploadFile, file_path: str) -> None:
     """
-    Uploads a document and adds it to the vector store.
+    Copies an upload to disk a chunk at a time, so the file is never held in memory.
     """
-    try:
-        # Save file temporarily
-        file_path = f"temp/{file.filename}"
-        with open(file_path, "wb") as f:
-            f.write(await file.read())
+    with open(file_path, "wb") as f:
+        shutil.copyfileobj(file.file, f, UPLOAD_CHUNK_SIZE)
 
-        # Load & process document
-        loader = LoaderFactory.create_loader("pdf", file_path=file_path)
-        docs = loader.load()
-        doc_splits = article_repository.splitter.split(docs)
-        document_ids = article_repository.add(doc_splits)
 
-        return {"message": "Document uploaded successfully", "document_ids": document_ids}
+@router.post("/upload", status_code=202)
+async def upload_document(request: Request, file: UploadFile = File(...)):
+    """
+    Uploads a document and queues its ingestion into the vector store.
+
+    The upload is streamed to disk, in a directory of its own so that uploads
+    sharing a file name never overwrite each other; a background worker then
+    extracts, splits and embeds its pages, and deletes the directory once the
+    job is over. Chunks are recorded under the file name, so uploading a file
+    again only embeds what changed. Poll `GET /jobs/{job_id}` for progress and result.
+    """
+    filename = os.path.basename(file.filename or "")
+    if not filename:
+        raise HTTPException(status_code=400, detail="Missing file name.")
+    directory = os.path.join(UPLOAD_DIR, uuid.uuid4().hex)
+    try:
+        os.makedirs(directory)
+        file_path = os.path.join(directory, filename)
+        await asyncio.to_thread(_save_upload, file, file_path)
+
+        client = request.client.host if request.client else "default"
+        # The file name, not the temporary path, identifies the document: re-uploading it updates its chunks
+        payload = {"path": file_path, "name": filename, "upload_dir": directory, "source_type": "pdf"}
+        job_id = get_job_queue().enqueue("file", payload, client=client)
+        return {"message": "Document uploaded, ingestion queued", "job_id": job_id, "status_url": f"/jobs/{job_id}"}
     except Exception as e:
+        shutil.rmtree(directory, ignore_errors=True)
         raise HTTPException(status_code=500, detail=str(e))
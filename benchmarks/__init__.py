@@ -0,0 +1,4 @@
+"""
+Package `benchmarks`:
+Contient le harnais de benchmark hors ligne (faux serveurs Ollama/Tavily, corpus synthétique).
+"""
@@ -0,0 +1,112 @@
+"""
+corpus.py
+---------
+Deterministic synthetic corpus and question set for the benchmark harness.
+
+Every document belongs to a topic identified by a keyword ("kw" followed by
+letters, e.g. "kwbaxo"). Questions mention the keyword of the topic they
+are about; a share of them mention a keyword that is not in the corpus, so
+the workflow takes the web search path. The fake backend relies on these
+keywords to grade facts and to build embeddings that retrieve the right
+topic.
+"""
+
+import random
+import re
+from typing import List, Optional, Tuple
+from langchain.schema import Document
+
+KEYWORD_PATTERN = re.compile(r"\bkw[a-z]+\b")
+
+_SYLLABLES = ("ba", "ko", "ri", "tu", "ze", "mi", "lo", "va", "ne", "su", "da", "fi", "go", "pe", "xu", "ya")
+
+_FILLER = (
+    "system", "latency", "model", "index", "request", "pipeline", "memory", "network",
+    "storage", "query", "answer", "context", "cluster", "service", "vector", "cache",
+    "throughput", "document", "process", "thread", "signal", "record", "version", "metric",
+    "design", "method", "result", "sample", "measure", "report", "review", "update",
+)
+
+_TEMPLATES = (
+    "The {keyword} {a} depends on the {b} and the {c}.",
+    "Engineers tuned the {keyword} {a} to reduce {b} under heavy {c}.",
+    "A {a} built around {keyword} keeps the {b} close to the {c}.",
+    "Reports about {keyword} describe how the {a} interacts with the {b}.",
+    "In {keyword} deployments, the {a} usually limits the {c}.",
+)
+
+
+def topic_keyword(index: int) -> str:
+    """
+    Returns the keyword of a topic ("kw" followed by letters, unique per index).
+
+    Args:
+        index (int): Topic index.
+
+    Returns:
+        str: The topic keyword.
+    """
+    word = ""
+    index += 1
+    while index:
+        index, digit = divmod(index - 1, len(_SYLLABLES))
+        word = _SYLLABLES[digit] + word
+    return "kw" + word
+
+
+def make_corpus(size: int, topics: int, sentences: int = 12, seed: int = 0) -> List[Document]:
+    """
+    Builds a synthetic corpus.
+
+    Args:
+        size (int): Number of documents.
+        topics (int): Number of distinct topics (documents are spread evenly over them).
+        sentences (int, optional): Sentences per document. Defaults to 12.
+        seed (int, optional): Random seed. Defaults to 0.
+
+    Returns:
+        List[Document]: Documents with "source" and "topic" metadata.
+    """
+    rng = random.Random(seed)
+    topics = max(1, topics)
+    documents = []
+    for index in range(size):
+        topic = index % topics
+        keyword = topic_keyword(topic)
+        text = " ".join(
+            rng.choice(_TEMPLATES).format(
+                keyword=keyword, a=rng.choice(_FILLER), b=rng.choice(_FILLER), c=rng.choice(_FILLER)
+            )
+            for _ in range(sentences)
+        )
+        documents.append(Document(
+            page_content=text,
+            metadata={"source": f"synthetic://doc/{index}", "topic": topic},
+        ))
+    return documents
+
+
+def make_questions(count: int, topics: int, miss_rate: float = 0.2, seed: int = 0) -> List[Tuple[str, Optional[int]]]:
+    """
+    Builds the benchmark questions.
+
+    Args:
+        count (int): Number of questions.
+        topics (int): Number of topics in the corpus.
+        miss_rate (float, optional): Share of questions about a topic absent from the corpus. Defaults to 0.2.
+        seed (int, optional): Random seed. Defaults to 0.
+
+    Returns:
+        List[Tuple[str, Optional[int]]]: (question, topic) pairs; topic is None for out-of-corpus questions.
+    """
+    rng = random.Random(seed + 1)
+    topics = max(1, topics)
+    questions = []
+    for index in range(count):
+        if rng.random() < miss_rate:
+            topic, keyword = None, topic_keyword(topics + index)
+        else:
+            topic = rng.randrange(topics)
+            keyword = topic_keyword(topic)
+        questions.append((f"How does the {rng.choice(_FILLER)} of {keyword} affect the {rng.choice(_FILLER)}?", topic))
+    return questions
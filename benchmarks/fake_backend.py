@@ -0,0 +1,298 @@
+"""
+fake_backend.py
+---------------
+Local stand-in for the Ollama and Tavily HTTP APIs used by the benchmark harness.
+
+One threaded HTTP server answers:
+- Ollama: `/api/chat` (streamed or not), `/api/embed`, `/api/embeddings`, `/api/tags`, `/api/show`;
+- Tavily: `/search`.
+
+Answers are deterministic and shaped after the prompts of `generation/prompts.py`:
+a fact is graded relevant when it shares a topic keyword with the question
+(see `benchmarks/corpus.py`), embeddings are hashed bags of words, and the
+answer is a fixed number of tokens. Every call waits for a configurable
+latency, so the client side (HTTP clients, LangGraph, Chroma, caches) is
+measured under a realistic, reproducible load.
+"""
+
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from benchmarks.corpus import KEYWORD_PATTERN
+
+EMBEDDING_DIMENSION = 384
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def fake_embedding(text: str, dimension: int = EMBEDDING_DIMENSION) -> List[float]:
+    """
+    Returns a deterministic, L2-normalized hashed bag-of-words embedding.
+
+    Topic keywords weigh more than other words, so texts about the same topic are close.
+    """
+    vector = [0.0] * dimension
+    for word in _WORD.findall(text.lower()):
+        digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+        slot = int.from_bytes(digest[:4], "little") % dimension
+        sign = 1.0 if digest[4] & 1 else -1.0
+        vector[slot] += sign * (8.0 if word.startswith("kw") else 1.0)
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [value / norm for value in vector]
+
+
+def _keywords(text: str) -> set:
+    return set(KEYWORD_PATTERN.findall(text.lower()))
+
+
+class FakeBackend:
+    """
+    Threaded HTTP server emulating Ollama and Tavily.
+
+    Attributes:
+        llm_latency (float): Seconds before the first token of a chat answer.
+        token_latency (float): Seconds between two streamed tokens.
+        embed_latency (float): Seconds per embedding request.
+        search_latency (float): Seconds per web search.
+        answer_tokens (int): Number of tokens in a generated answer.
+        calls (Counter): Number of calls per kind (chat_generate, chat_grade, chat_batch_grade,
+            chat_rewrite, embed_requests, embed_inputs, search).
+    """
+
+    def __init__(
+        self,
+        llm_latency: float = 0.05,
+        token_latency: float = 0.0,
+        embed_latency: float = 0.005,
+        search_latency: float = 0.1,
+        answer_tokens: int = 40,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        self.llm_latency = llm_latency
+        self.token_latency = token_latency
+        self.embed_latency = embed_latency
+        self.search_latency = search_latency
+        self.answer_tokens = answer_tokens
+        self.calls: Counter = Counter()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), _make_handler(self))
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeBackend":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeBackend":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def count(self, kind: str, amount: int = 1) -> None:
+        with self._lock:
+            self.calls[kind] += amount
+
+    def snapshot(self) -> Dict[str, int]:
+        """
+        Returns the call counters.
+        """
+        with self._lock:
+            return dict(self.calls)
+
+    def reset(self) -> None:
+        """
+        Resets the call counters (e.g. after warm-up).
+        """
+        with self._lock:
+            self.calls.clear()
+
+    # --- Answers -------------------------------------------------------------
+
+    def chat_answer(self, prompt: str) -> Tuple[str, str]:
+        """
+        Returns (kind, content) for a chat prompt.
+        """
+        if '"query_search"' in prompt:
+            question = prompt.split("question/request:", 1)[-1].split("\n", 1)[0].strip()
+            return "chat_rewrite", json.dumps({"query_search": question})
+
+        if '"scores"' in prompt:
+            question = _between(prompt, "QUESTION:", "FACTS:")
+            facts = re.split(r"^\[\d+\] ", _between(prompt, "FACTS:", "Output:"), flags=re.MULTILINE)[1:]
+            scores = [self._grade(question, fact) for fact in facts]
+            return "chat_batch_grade", json.dumps({"scores": scores})
+
+        if '"score"' in prompt:
+            question = _between(prompt, "QUESTION:", "FACT:")
+            fact = _between(prompt, "FACT:", "Output:")
+            return "chat_grade", json.dumps({"score": self._grade(question, fact)})
+
+        question = _between(prompt, "Question:", "Documents:")
+        words = [f"answer{index}" for index in range(self.answer_tokens)]
+        if question:
+            words[:len(question.split())] = question.split()[:self.answer_tokens]
+        return "chat_generate", " ".join(words[:self.answer_tokens])
+
+    @staticmethod
+    def _grade(question: str, fact: str) -> str:
+        return "yes" if _keywords(question) & _keywords(fact) else "no"
+
+    def search_results(self, query: str, max_results: int) -> List[Dict[str, Any]]:
+        keywords = " ".join(sorted(_keywords(query))) or "web"
+        return [
+            {
+                "title": f"Result {index} for {query}",
+                "url": f"https://example.com/{hashlib.sha1(query.encode('utf-8')).hexdigest()[:12]}/{index}",
+                "content": f"Web page {index} explaining {keywords}: {query}",
+                "score": round(1.0 - index * 0.1, 2),
+            }
+            for index in range(max_results)
+        ]
+
+
+def _between(text: str, start: str, end: str) -> str:
+    head = text.split(start, 1)
+    if len(head) < 2:
+        return ""
+    return head[1].split(end, 1)[0].strip()
+
+
+def _make_handler(backend: FakeBackend):
+    """
+    Builds the request handler class bound to a backend.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _read_json(self) -> Dict[str, Any]:
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length) if length else b"{}"
+            return json.loads(body or b"{}")
+
+        def _send_json(self, payload: Any, status: int = 200) -> None:
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.startswith("/api/tags"):
+                self._send_json({"models": []})
+            else:
+                self._send_json({"error": "not found"}, status=404)
+
+        def do_HEAD(self):
+            self.send_response(200)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def do_POST(self):
+            payload = self._read_json()
+            if self.path.startswith("/api/chat"):
+                self._chat(payload)
+            elif self.path.startswith("/api/embeddings"):
+                texts = [payload.get("prompt", "")]
+                self._embed(texts)
+                self._send_json({"embedding": fake_embedding(texts[0])})
+            elif self.path.startswith("/api/embed"):
+                texts = payload.get("input", [])
+                texts = [texts] if isinstance(texts, str) else texts
+                self._embed(texts)
+                self._send_json({"model": payload.get("model"), "embeddings": [fake_embedding(text) for text in texts]})
+            elif self.path.startswith("/api/show"):
+                self._send_json({"modelfile": "", "parameters": "", "template": "", "details": {}, "model_info": {}})
+            elif self.path.startswith("/search"):
+                backend.count("search")
+                time.sleep(backend.search_latency)
+                query = payload.get("query", "")
+                results = backend.search_results(query, int(payload.get("max_results") or 5))
+                self._send_json({"query": query, "results": results, "response_time": backend.search_latency})
+            else:
+                self._send_json({"error": "not found"}, status=404)
+
+        def _embed(self, texts: List[str]) -> None:
+            backend.count("embed_requests")
+            backend.count("embed_inputs", len(texts))
+            time.sleep(backend.embed_latency)
+
+        def _chat(self, payload: Dict[str, Any]) -> None:
+            started = time.perf_counter()
+            messages = payload.get("messages") or []
+            prompt = "\n".join(str(message.get("content", "")) for message in messages)
+            kind, content = backend.chat_answer(prompt)
+            backend.count(kind)
+            time.sleep(backend.llm_latency)
+
+            model = payload.get("model", "")
+            prompt_tokens = len(prompt.split())
+            # JSON answers are sent in one piece; text answers token by token
+            tokens = [content] if payload.get("format") else [word + " " for word in content.split()]
+
+            def final() -> Dict[str, Any]:
+                return {
+                    "model": model,
+                    "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                    "message": {"role": "assistant", "content": ""},
+                    "done": True,
+                    "done_reason": "stop",
+                    "total_duration": int((time.perf_counter() - started) * 1e9),
+                    "load_duration": 0,
+                    "prompt_eval_count": prompt_tokens,
+                    "prompt_eval_duration": int(backend.llm_latency * 1e9),
+                    "eval_count": len(tokens),
+                    "eval_duration": int(backend.token_latency * len(tokens) * 1e9),
+                }
+
+            if payload.get("stream") is False:
+                time.sleep(backend.token_latency * len(tokens))
+                response = final()
+                response["message"]["content"] = "".join(tokens)
+                self._send_json(response)
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for token in tokens:
+                self._write_chunk({
+                    "model": model,
+                    "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                    "message": {"role": "assistant", "content": token},
+                    "done": False,
+                })
+                if backend.token_latency:
+                    time.sleep(backend.token_latency)
+            self._write_chunk(final())
+            self.wfile.write(b"0\r\n\r\n")
+
+        def _write_chunk(self, payload: Dict[str, Any]) -> None:
+            data = (json.dumps(payload) + "\n").encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+    return Handler
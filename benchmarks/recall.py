@@ -0,0 +1,214 @@
+"""
+recall.py
+---------
+Recall-vs-latency benchmark of the vector index, on the live collection.
+
+`python -m benchmarks.recall` opens the configured repository (Chroma or the
+NumPy store, as selected by `VECTOR_STORE_BACKEND`), computes the exact top-k
+of each query by brute force over every stored embedding, then runs the same
+queries through the store for each index setting:
+- Chroma: HNSW search ef values (`--ef`);
+- NumPy store: IVF probes (`--probes`) and, with product quantization,
+  exact re-scoring candidates per result (`--rerank`).
+
+For each setting it reports recall@k against the exact results and the
+p50/p95 latency of a store search, and saves everything as JSON. Queries are
+the questions of a JSONL file (`--questions`, same format as `run-batch`) or,
+by default, a sample of stored chunk embeddings.
+"""
+
+import itertools
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+import click
+import numpy as np
+from benchmarks.run import git_commit, latency_summary
+
+CHROMA_DEFAULT_SEARCH_EF = 10
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(",") if item.strip()]
+
+
+def _chroma_vectors(store, page_size: int = 5000) -> Tuple[List[str], np.ndarray, str]:
+    """
+    Reads every embedding of a Chroma collection, with its distance space.
+    """
+    collection = store.vector_store._collection
+    ids, vectors = [], []
+    offset = 0
+    while True:
+        page = collection.get(include=["embeddings"], limit=page_size, offset=offset)
+        if not len(page["ids"]):
+            break
+        ids.extend(page["ids"])
+        vectors.append(np.asarray(page["embeddings"], dtype=np.float32))
+        offset += len(page["ids"])
+    space = (collection.metadata or {}).get("hnsw:space", "l2")
+    matrix = np.concatenate(vectors) if vectors else np.empty((0, 0), dtype=np.float32)
+    return ids, matrix, space
+
+
+def _exact_top(matrix: np.ndarray, queries: np.ndarray, k: int, space: str) -> np.ndarray:
+    """
+    Returns the row numbers of the exact top-k of each query, best first.
+    """
+    if space == "cosine":
+        matrix = matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+    tops = []
+    for start in range(0, len(queries), 64):
+        block = queries[start:start + 64]
+        scores = block @ matrix.T
+        if space == "l2":
+            # Ranking by -||q - x||^2, without the per-query constant ||q||^2
+            scores = 2.0 * scores - (matrix ** 2).sum(axis=1)
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1, kind="stable")
+        tops.append(np.take_along_axis(top, order, axis=1))
+    return np.concatenate(tops)
+
+
+def _measure(store, queries: np.ndarray, truth: List[set], k: int) -> Dict[str, Any]:
+    """
+    Runs every query through the store and measures recall@k and latency.
+    """
+    from utils.id_utils import generate_chunk_ids
+
+    latencies, recalls = [], []
+    for query, expected in zip(queries, truth):
+        started = time.perf_counter()
+        results = store.similarity_search_by_embedding_with_score(query.tolist(), k)
+        latencies.append(time.perf_counter() - started)
+        documents = [doc for doc, _ in results]
+        found = {doc.id or chunk_id for doc, chunk_id in zip(documents, generate_chunk_ids(documents))}
+        recalls.append(len(found & expected) / len(expected) if expected else 1.0)
+    latency = latency_summary(latencies)
+    return {
+        "recall": round(float(np.mean(recalls)), 4),
+        "latency_ms": {key: round(value * 1000, 3) if value is not None else None for key, value in latency.items()},
+        "qps": round(len(latencies) / sum(latencies), 1) if latencies else None,
+    }
+
+
+def _settings(store, ef: List[int], probes: List[int], rerank: List[int]) -> List[Dict[str, int]]:
+    """
+    Lists the index settings to sweep for the store's backend.
+    """
+    from store.numpy_store import NumpyStore
+
+    if isinstance(store, NumpyStore):
+        stats = store.stats()
+        if not stats["ivf_lists"]:
+            return [{}]
+        reranks = rerank if stats["pq_subvectors"] else [store.pq_rerank]
+        return [{"probes": p, "rerank": r} for p, r in itertools.product(probes, reranks)]
+    return [{"ef": value} for value in ef]
+
+
+def _apply(store, setting: Dict[str, int]) -> None:
+    if "ef" in setting:
+        store.set_search_ef(setting["ef"])
+    if "probes" in setting:
+        store.ivf_probes = setting["probes"]
+        store.pq_rerank = setting["rerank"]
+
+
+@click.command()
+@click.option("--k", "k", default=10, show_default=True, help="Results per query (recall@k).")
+@click.option("--queries", "query_count", default=200, show_default=True, help="Number of queries.")
+@click.option("--questions", default=None, type=click.Path(exists=True, dir_okay=False),
+              help="JSONL file of questions to embed as queries (default: sampled stored embeddings).")
+@click.option("--ef", default="16,32,64,128,256", show_default=True, help="Chroma HNSW search ef values.")
+@click.option("--probes", default="1,2,4,8,16,32", show_default=True, help="NumPy store IVF probes values.")
+@click.option("--rerank", default="2,5,10,20", show_default=True, help="NumPy store PQ re-scoring factors.")
+@click.option("--seed", default=0, show_default=True)
+@click.option("--output", default=None, help="Result file. Defaults to benchmarks/results/recall-<timestamp>-<commit>.json.")
+def main(k: int, query_count: int, questions: Optional[str], ef: str, probes: str, rerank: str, seed: int, output: Optional[str]):
+    """
+    Measures recall@k and latency of the vector index against exact search on the live collection.
+    """
+    logging.basicConfig(level=logging.ERROR, format="%(asctime)s - %(levelname)s - %(message)s")
+    from app.resources import get_article_repository
+    from app.config import VECTOR_STORE_BACKEND, CHROMA_HNSW_SEARCH_EF
+    from store.numpy_store import NumpyStore
+    from workflow.batch import read_questions
+
+    repository = get_article_repository()
+    store = repository.store_instance
+
+    click.echo("📥 Reading the stored embeddings...")
+    if isinstance(store, NumpyStore):
+        ids, matrix = store.live_vectors()
+        space = "ip"
+    else:
+        ids, matrix, space = _chroma_vectors(store)
+    if not ids:
+        click.echo("❌ The collection is empty.", err=True)
+        return
+    k = min(k, len(ids))
+
+    rng = np.random.default_rng(seed)
+    if questions:
+        with open(questions, encoding="utf-8") as file:
+            texts = [item["question"] for item in read_questions(file)][:query_count]
+        queries = np.asarray(repository.embed_queries(texts), dtype=np.float32)
+        if isinstance(store, NumpyStore):
+            queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+    else:
+        queries = matrix[rng.choice(len(ids), size=min(query_count, len(ids)), replace=False)]
+
+    started = time.perf_counter()
+    exact = _exact_top(matrix, queries, k, space)
+    exact_ms = (time.perf_counter() - started) * 1000 / len(queries)
+    truth = [{ids[row] for row in rows} for rows in exact]
+    click.echo(f"✅ Exact top-{k} of {len(queries)} queries over {len(ids)} vectors ({exact_ms:.3f} ms/query brute force).")
+
+    original = {"probes": getattr(store, "ivf_probes", None), "rerank": getattr(store, "pq_rerank", None)}
+    results = []
+    try:
+        for setting in _settings(store, _int_list(ef), _int_list(probes), _int_list(rerank)):
+            _apply(store, setting)
+            measured = _measure(store, queries, truth, k)
+            results.append({"setting": setting, **measured})
+            latency = measured["latency_ms"]
+            label = ", ".join(f"{key}={value}" for key, value in setting.items()) or "exact"
+            click.echo(
+                f"  {label:<22} recall@{k}={measured['recall']:.4f}  "
+                f"p50={latency['p50']}ms  p95={latency['p95']}ms  {measured['qps']} QPS"
+            )
+    finally:
+        if isinstance(store, NumpyStore):
+            store.ivf_probes, store.pq_rerank = original["probes"], original["rerank"]
+        else:
+            # The search ef is persisted in the collection: put the configured one back (Chroma's default is 10)
+            store.set_search_ef(CHROMA_HNSW_SEARCH_EF or CHROMA_DEFAULT_SEARCH_EF)
+
+    commit = git_commit()
+    result = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_commit": commit,
+        "backend": VECTOR_STORE_BACKEND,
+        "vectors": len(ids),
+        "dim": int(matrix.shape[1]),
+        "space": space,
+        "k": k,
+        "queries": len(queries),
+        "exact_ms_per_query": round(exact_ms, 3),
+        "store": store.stats() if isinstance(store, NumpyStore) else None,
+        "results": results,
+    }
+    if output is None:
+        output = os.path.join("benchmarks", "results", f"recall-{time.strftime('%Y%m%d-%H%M%S')}-{commit or 'nogit'}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    click.echo(f"💾 Results saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,378 @@
+"""
+run.py
+------
+Offline benchmark of the corrective RAG pipeline.
+
+`python -m benchmarks.run run` starts the fake Ollama/Tavily backend, ingests a
+synthetic corpus through `IngestionPipeline`, then answers a question set
+with `run_workflow` (or `arun_workflow`) at a given concurrency. It reports
+ingestion throughput, p50/p95/p99 latency, QPS, LLM calls per question,
+per-step timings and peak memory, and saves everything as JSON.
+
+`python -m benchmarks.run compare BASELINE CANDIDATE` prints the difference
+between two result files (e.g. from two commits).
+
+Nothing leaves the machine: the app settings are pointed at the fake backend
+through environment variables before any project module is imported.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+import click
+from benchmarks.corpus import make_corpus, make_questions
+from benchmarks.fake_backend import FakeBackend
+
+CHAT_CALLS = ("chat_grade", "chat_batch_grade", "chat_rewrite", "chat_generate")
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """
+    Returns the q-th percentile (0-100) of the values, with linear interpolation.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def latency_summary(values: List[float]) -> Dict[str, Optional[float]]:
+    """
+    Returns mean, p50, p95, p99 and max of a list of durations (seconds).
+    """
+    def rounded(value):
+        return round(value, 4) if value is not None else None
+
+    return {
+        "mean": rounded(sum(values) / len(values)) if values else None,
+        "p50": rounded(percentile(values, 50)),
+        "p95": rounded(percentile(values, 95)),
+        "p99": rounded(percentile(values, 99)),
+        "max": rounded(max(values)) if values else None,
+    }
+
+
+def peak_rss_mb() -> float:
+    """
+    Returns the peak resident set size of the process, in MB.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # KB on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def configure_environment(
+    backend: FakeBackend, grading_mode: str, caches: bool, speculative: bool, retrieval_mode: str, pregrade: bool
+) -> None:
+    """
+    Points the application settings at the fake backend. Must run before the
+    project modules are imported, since `app.config` reads them at import time.
+    """
+    os.environ["OLLAMA_HOST"] = backend.url
+    os.environ.setdefault("TAVILY_API_KEY", "benchmark")
+    os.environ["GRADING_MODE"] = grading_mode
+    os.environ["WEB_SEARCH_SPECULATIVE"] = "true" if speculative else "false"
+    os.environ["RETRIEVAL_MODE"] = retrieval_mode
+    os.environ["PREGRADE_ENABLED"] = "true" if pregrade else "false"
+    flag = "true" if caches else "false"
+    for name in ("GRADING_CACHE_ENABLED", "ANSWER_CACHE_ENABLED", "EMBEDDING_CACHE_ENABLED", "WEB_SEARCH_CACHE_ENABLED"):
+        os.environ[name] = flag
+    # Caches, when enabled, stay in memory so runs do not influence each other
+    for name in ("GRADING_CACHE_PATH", "EMBEDDING_CACHE_PATH", "WEB_SEARCH_CACHE_PATH"):
+        os.environ[name] = ""
+
+    from langchain_community.utilities import tavily_search
+    tavily_search.TAVILY_API_URL = backend.url
+
+
+def run_ingestion(backend: FakeBackend, repository, corpus_size: int, topics: int, seed: int) -> Dict[str, Any]:
+    """
+    Ingests the synthetic corpus and returns throughput figures.
+    """
+    from app.resources import get_splitter
+    from ingestion.pipeline import IngestionPipeline
+
+    documents = make_corpus(corpus_size, topics, seed=seed)
+    backend.reset()
+    started = time.perf_counter()
+    result = IngestionPipeline(repository, get_splitter()).ingest_documents(documents, "synthetic-corpus")
+    seconds = time.perf_counter() - started
+    calls = backend.snapshot()
+
+    return {
+        "documents": len(documents),
+        "chunks": len(result["document_ids"]),
+        "seconds": round(seconds, 4),
+        "documents_per_second": round(len(documents) / seconds, 2) if seconds else None,
+        "chunks_per_second": round(len(result["document_ids"]) / seconds, 2) if seconds else None,
+        "embed_requests": calls.get("embed_requests", 0),
+        "failed_sources": result["failed_sources"],
+        "stages": result["stats"],
+    }
+
+
+def run_queries(backend: FakeBackend, repository, questions: List[str], concurrency: int, mode: str) -> Dict[str, Any]:
+    """
+    Answers the questions at the given concurrency and returns latency, QPS and call counts.
+    """
+    from utils.tracing import start_trace
+    from workflow.graph import run_workflow, arun_workflow
+
+    def answer(question: str) -> Dict[str, Any]:
+        started = time.perf_counter()
+        try:
+            with start_trace() as trace:
+                state = run_workflow(question, repository)
+            return {"seconds": time.perf_counter() - started, "steps": state["steps"], "trace": trace.to_dict()}
+        except Exception as e:
+            return {"seconds": time.perf_counter() - started, "error": str(e)}
+
+    async def aanswer(question: str, semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                with start_trace() as trace:
+                    state = await arun_workflow(question, repository)
+                return {"seconds": time.perf_counter() - started, "steps": state["steps"], "trace": trace.to_dict()}
+            except Exception as e:
+                return {"seconds": time.perf_counter() - started, "error": str(e)}
+
+    async def aanswer_all() -> List[Dict[str, Any]]:
+        semaphore = asyncio.Semaphore(concurrency)
+        return await asyncio.gather(*(aanswer(question, semaphore) for question in questions))
+
+    backend.reset()
+    started = time.perf_counter()
+    if mode == "async":
+        runs = asyncio.run(aanswer_all())
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            runs = list(executor.map(answer, questions))
+    wall_seconds = time.perf_counter() - started
+    calls = backend.snapshot()
+
+    succeeded = [run for run in runs if "error" not in run]
+    count = len(questions) or 1
+    llm_calls = {kind: round(calls.get(kind, 0) / count, 3) for kind in CHAT_CALLS}
+    llm_calls["total"] = round(sum(calls.get(kind, 0) for kind in CHAT_CALLS) / count, 3)
+
+    # Per-step wall time, summed per question then summarized across questions
+    step_seconds: Dict[str, List[float]] = {}
+    role_calls: Dict[str, List[float]] = {}
+    pregraded = {"accepted": 0, "rejected": 0, "ambiguous": 0}
+    for run in succeeded:
+        for call in run["trace"]["llm_calls"]:
+            role_calls.setdefault(f"{call.get('role') or 'unknown'}:{call['model']}", []).append(call["seconds"])
+        per_question: Dict[str, float] = {}
+        for recorded in run["trace"]["spans"]:
+            per_question[recorded["name"]] = per_question.get(recorded["name"], 0.0) + recorded["seconds"]
+            if recorded["name"] == "pregrade":
+                for verdict in pregraded:
+                    pregraded[verdict] += recorded.get(verdict, 0)
+        for name, seconds in per_question.items():
+            step_seconds.setdefault(name, []).append(seconds)
+
+    return {
+        "questions": len(questions),
+        "errors": len(runs) - len(succeeded),
+        "error_samples": [run["error"] for run in runs if "error" in run][:5],
+        "concurrency": concurrency,
+        "mode": mode,
+        "wall_seconds": round(wall_seconds, 4),
+        "qps": round(len(succeeded) / wall_seconds, 3) if wall_seconds else None,
+        "latency": latency_summary([run["seconds"] for run in succeeded]),
+        "web_search_rate": round(
+            sum("web_search" in run["steps"] for run in succeeded) / len(succeeded), 3
+        ) if succeeded else None,
+        "llm_calls_per_question": llm_calls,
+        "embed_requests_per_question": round(calls.get("embed_requests", 0) / count, 3),
+        "search_calls_per_question": round(calls.get("search", 0) / count, 3),
+        "pregraded_documents_per_question": {verdict: round(total / count, 3) for verdict, total in pregraded.items()},
+        "tokens_per_question": {
+            "prompt": round(sum(run["trace"]["prompt_tokens"] for run in succeeded) / count, 1),
+            "completion": round(sum(run["trace"]["completion_tokens"] for run in succeeded) / count, 1),
+        },
+        "steps": {name: {"count": len(values), **latency_summary(values)} for name, values in sorted(step_seconds.items())},
+        # Latency of single LLM calls per "role:model", to compare routing a role to another model
+        "llm_roles": {name: {"count": len(values), **latency_summary(values)} for name, values in sorted(role_calls.items())},
+    }
+
+
+@click.group()
+def cli():
+    """
+    Offline benchmark harness for the corrective RAG pipeline.
+    """
+    pass
+
+
+@cli.command("run")
+@click.option("--corpus-size", default=500, show_default=True, help="Number of synthetic documents to ingest.")
+@click.option("--topics", default=50, show_default=True, help="Number of distinct topics in the corpus.")
+@click.option("--questions", "question_count", default=100, show_default=True, help="Number of measured questions.")
+@click.option("--warmup", default=5, show_default=True, help="Questions run before measuring (not reported).")
+@click.option("--miss-rate", default=0.2, show_default=True, help="Share of questions about topics absent from the corpus (web search path).")
+@click.option("--concurrency", default=4, show_default=True, help="Questions answered at once.")
+@click.option("--mode", type=click.Choice(["sync", "async"]), default="sync", show_default=True, help="run_workflow in threads, or arun_workflow on one event loop.")
+@click.option("--grading-mode", type=click.Choice(["sequential", "concurrent", "batched"]), default="sequential", show_default=True)
+@click.option("--retrieval-mode", type=click.Choice(["dense", "hybrid"]), default="dense", show_default=True)
+@click.option("--pregrade/--no-pregrade", default=False, show_default=True, help="Settle clear-cut chunks without the LLM grader.")
+@click.option("--caches/--no-caches", default=False, show_default=True, help="Enable the grading, answer, embedding and web search caches.")
+@click.option("--speculative/--no-speculative", default=False, show_default=True, help="Rewrite and search the web while grading.")
+@click.option("--llm-latency", default=0.05, show_default=True, help="Fake LLM latency before the first token (seconds).")
+@click.option("--token-latency", default=0.0, show_default=True, help="Fake LLM latency between streamed tokens (seconds).")
+@click.option("--embed-latency", default=0.005, show_default=True, help="Fake latency per embedding request (seconds).")
+@click.option("--search-latency", default=0.1, show_default=True, help="Fake web search latency (seconds).")
+@click.option("--answer-tokens", default=40, show_default=True, help="Tokens per generated answer.")
+@click.option("--trace-memory", is_flag=True, default=False, help="Also report the Python heap peak (tracemalloc, slower).")
+@click.option("--seed", default=0, show_default=True)
+@click.option("--output", default=None, help="Result file. Defaults to benchmarks/results/<timestamp>-<commit>.json.")
+def run(corpus_size, topics, question_count, warmup, miss_rate, concurrency, mode, grading_mode, retrieval_mode, pregrade, caches, speculative,
+        llm_latency, token_latency, embed_latency, search_latency, answer_tokens, trace_memory, seed, output):
+    """
+    Ingests a synthetic corpus and benchmarks the RAG workflow against the fake backend.
+    """
+    logging.basicConfig(level=logging.ERROR, format="%(asctime)s - %(levelname)s - %(message)s")
+    config = {key: value for key, value in locals().items() if key != "output"}
+
+    with FakeBackend(
+        llm_latency=llm_latency,
+        token_latency=token_latency,
+        embed_latency=embed_latency,
+        search_latency=search_latency,
+        answer_tokens=answer_tokens,
+    ) as backend, tempfile.TemporaryDirectory(prefix="crag-bench-") as persist_directory:
+        configure_environment(backend, grading_mode, caches, speculative, retrieval_mode, pregrade)
+
+        from langchain_ollama import OllamaEmbeddings
+        from repository.article_repository import ArticleRepository
+
+        repository = ArticleRepository(
+            embeddings=OllamaEmbeddings(model="all-minilm", base_url=backend.url),
+            persist_directory=persist_directory,
+        )
+
+        if trace_memory:
+            tracemalloc.start()
+
+        click.echo(f"📥 Ingesting {corpus_size} synthetic documents...")
+        ingestion = run_ingestion(backend, repository, corpus_size, topics, seed)
+        ingestion["peak_rss_mb"] = peak_rss_mb()
+        if trace_memory:
+            ingestion["python_heap_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+            tracemalloc.reset_peak()
+
+        questions = [question for question, _ in make_questions(warmup + question_count, topics, miss_rate, seed)]
+        if warmup:
+            click.echo(f"🔥 Warming up with {warmup} questions...")
+            run_queries(backend, repository, questions[:warmup], concurrency, mode)
+
+        click.echo(f"⏱️ Answering {question_count} questions (concurrency={concurrency}, mode={mode})...")
+        queries = run_queries(backend, repository, questions[warmup:], concurrency, mode)
+        queries["peak_rss_mb"] = peak_rss_mb()
+        if trace_memory:
+            queries["python_heap_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+            tracemalloc.stop()
+
+    commit = git_commit()
+    result = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": config,
+        "ingestion": ingestion,
+        "queries": queries,
+    }
+
+    if output is None:
+        output = os.path.join("benchmarks", "results", f"{time.strftime('%Y%m%d-%H%M%S')}-{commit or 'nogit'}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+
+    latency = queries["latency"]
+    click.echo(f"✅ Ingestion: {ingestion['chunks']} chunks in {ingestion['seconds']}s ({ingestion['chunks_per_second']} chunks/s)")
+    click.echo(f"✅ Queries: {queries['qps']} QPS, p50={latency['p50']}s p95={latency['p95']}s p99={latency['p99']}s, errors={queries['errors']}")
+    click.echo(f"✅ LLM calls per question: {queries['llm_calls_per_question']['total']}, peak RSS: {queries['peak_rss_mb']} MB")
+    click.echo(f"💾 Results saved to {output}")
+
+
+COMPARED_METRICS = (
+    ("ingestion.seconds", False),
+    ("ingestion.chunks_per_second", True),
+    ("queries.qps", True),
+    ("queries.latency.p50", False),
+    ("queries.latency.p95", False),
+    ("queries.latency.p99", False),
+    ("queries.llm_calls_per_question.total", False),
+    ("queries.embed_requests_per_question", False),
+    ("queries.peak_rss_mb", False),
+)
+
+
+def _lookup(result: Dict[str, Any], path: str) -> Optional[float]:
+    value: Any = result
+    for key in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value if isinstance(value, (int, float)) else None
+
+
+@cli.command("compare")
+@click.argument("baseline", type=click.Path(exists=True))
+@click.argument("candidate", type=click.Path(exists=True))
+@click.option("--fail-over", default=None, type=float, help="Exit with an error if a metric regresses by more than this percentage.")
+def compare(baseline: str, candidate: str, fail_over: Optional[float]):
+    """
+    Compares two benchmark result files.
+    """
+    with open(baseline) as f:
+        before = json.load(f)
+    with open(candidate) as f:
+        after = json.load(f)
+
+    click.echo(f"Baseline:  {before.get('git_commit')} ({before.get('timestamp')})")
+    click.echo(f"Candidate: {after.get('git_commit')} ({after.get('timestamp')})")
+    regressions = []
+    for path, higher_is_better in COMPARED_METRICS:
+        old, new = _lookup(before, path), _lookup(after, path)
+        if old is None or new is None:
+            continue
+        change = (new - old) / old * 100 if old else 0.0
+        regression = -change if higher_is_better else change
+        marker = "⚠️" if fail_over is not None and regression > fail_over else "  "
+        click.echo(f"{marker} {path:<42} {old:>12} → {new:<12} ({change:+.1f}%)")
+        if fail_over is not None and regression > fail_over:
+            regressions.append(path)
+
+    if regressions:
+        click.echo(f"❌ Regressions over {fail_over}%: {', '.join(regressions)}", err=True)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    cli()
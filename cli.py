@@ -1,13 +1,18 @@
+import asyncio
 import click
+import json
 import logging
-from app.loader_factory import LoaderFactory
-from utils.tiktoken_spliter import TiktokenSpliter
-from repository.article_repository import ArticleRepository
-from workflow.graph import run_workflow  # Import workflow logic
+from app.resources import get_article_repository, get_splitter
+from ingestion.pipeline import IngestionPipeline
+from workflow.graph import run_workflow, stream_workflow  # Import workflow logic
+from workflow.batch import BatchRunner, read_questions
+from utils.tracing import start_trace
+from ingestion.worker import start_workers, stop_workers
+from app.config import BATCH_CONCURRENCY, BATCH_LLM_CONCURRENCY, BATCH_EMBED_SIZE, JOB_WORKERS, VECTOR_STORE_BACKEND
 
 # Initialize dependencies
-article_repository = ArticleRepository()
-spliter = TiktokenSpliter()
+article_repository = get_article_repository()
+spliter = get_splitter()
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -18,7 +23,10 @@ def cli():
     """
     CLI for managing various tasks:
     - add-source: Add and index a new data source.
+    - rebuild-lexical-index: Rebuild the BM25 index used by hybrid retrieval.
     - run-rag: Execute the RAG workflow.
+    - run-batch: Answer a JSONL file of questions, resuming interrupted runs.
+    - run-workers: Run the background ingestion workers (jobs queued by /upload and /add-url).
     """
     pass
 
@@ -39,52 +47,168 @@ def add_source(source_type: str, value: tuple[str]):
         return
 
     try:
-        # 1) Create the loader using the factory
+        pipeline = IngestionPipeline(article_repository, spliter)
+
         if source_type == "url":
-            loader = LoaderFactory.create_loader("url", urls=value)
+            # Fetch, split, embed and store concurrently; failed URLs do not stop the others
+            result = pipeline.ingest_urls(value)
         elif source_type == "pdf":
-            loader = LoaderFactory.create_loader("pdf", file_path=value[0])
+            # Skipped entirely when the file's mtime and size did not change
+            result = pipeline.ingest_file(value[0], source_type="pdf")
         else:
             click.echo("Error: Unsupported source type.", err=True)
             return
 
-        # 2) Load documents
-        docs = loader.load()
-        click.echo(f"✅ Loaded {len(docs)} documents from {source_type}.")
-
-        # 3) Split documents into smaller chunks
-        docs_splits = spliter.split(docs)
-        click.echo(f"✅ After splitting, {len(docs_splits)} documents available.")
-
-        # 4) Store in the vector database
-        article_repository.add(docs_splits)
+        stats = result["stats"]
+        click.echo(f"✅ Fetched {stats['fetch']['items']} documents, split into {stats['split']['items']} chunks.")
+        click.echo(
+            f"✅ Embedded {stats['embed']['items']} chunks ({stats['embed']['items_per_second']}/s), "
+            f"stored {stats['upsert']['items']} in {stats['elapsed_seconds']}s."
+        )
+        for source in result["skipped_sources"]:
+            click.echo(f"⏭️ Unchanged, skipped: {source}")
+        for source, error in result["failed_sources"].items():
+            click.echo(f"⚠️ Failed to load {source}: {error}", err=True)
         click.echo("✅ Source successfully indexed!")
-    
+
     except Exception as e:
         logging.error(f"Error while adding source: {e}")
         click.echo(f"❌ Failed to index source: {e}", err=True)
 
 
+@cli.command("rebuild-lexical-index")
+def rebuild_lexical_index():
+    """
+    Rebuilds the BM25 index used by hybrid retrieval from the vector store.
+    """
+    try:
+        indexed = article_repository.rebuild_lexical_index()
+        click.echo(f"✅ Lexical index rebuilt: {indexed} chunks indexed.")
+    except Exception as e:
+        logging.error(f"Error while rebuilding the lexical index: {e}")
+        click.echo(f"❌ Failed to rebuild the lexical index: {e}", err=True)
+
+
 @cli.command("run-rag")
 @click.option("--question", prompt="Your question", help="The question to ask the RAG workflow.")
-def run_rag(question: str):
+@click.option("--stream/--no-stream", default=False, help="Print steps and answer tokens as they are produced.")
+@click.option("--timings", is_flag=True, default=False, help="Print the per-step latency and token breakdown.")
+def run_rag(question: str, stream: bool, timings: bool):
     """
     Runs the RAG workflow: retrieve, grade, generate.
 
     Args:
         question (str): The input question.
+        stream (bool): Whether to print the answer incrementally.
+        timings (bool): Whether to print the latency and token breakdown.
     """
     try:
         retriever = article_repository
-        final_state = run_workflow(question, retriever)
-        click.echo(f"💡 Answer: {final_state['generation']}")
-        click.echo(f"🔄 Steps followed: {final_state['steps']}")
+        with start_trace() as trace:
+            if stream:
+                answer_started = False
+                for event in stream_workflow(question, retriever):
+                    if event["event"] == "step":
+                        click.echo(f"⏳ Step completed: {event['node']}")
+                    elif event["event"] == "token":
+                        if not answer_started:
+                            click.echo("💡 Answer: ", nl=False)
+                            answer_started = True
+                        click.echo(event["content"], nl=False)
+                    elif event["event"] == "end":
+                        click.echo("")
+                        click.echo(f"🔄 Steps followed: {event['steps']}")
+            else:
+                final_state = run_workflow(question, retriever)
+                click.echo(f"💡 Answer: {final_state['generation']}")
+                click.echo(f"🔄 Steps followed: {final_state['steps']}")
+
+        if timings:
+            click.echo(f"⏱️ Timings: {json.dumps(trace.to_dict(), indent=2)}")
     
     except Exception as e:
         logging.error(f"Error while running RAG workflow: {e}")
         click.echo(f"❌ Failed to run RAG workflow: {e}", err=True)
 
 
+@cli.command("run-batch")
+@click.option("--input", "input_path", required=True, type=click.Path(exists=True, dir_okay=False),
+              help="JSONL file of questions ({\"id\": ..., \"question\": ...} per line).")
+@click.option("--output", "output_path", required=True, type=click.Path(dir_okay=False),
+              help="JSONL file receiving the answers; also the checkpoint a rerun resumes from.")
+@click.option("--concurrency", type=int, default=BATCH_CONCURRENCY, show_default=True, help="Questions in flight.")
+@click.option("--llm-concurrency", type=int, default=BATCH_LLM_CONCURRENCY, show_default=True,
+              help="LLM calls in flight across the batch (0 for no cap).")
+@click.option("--embed-batch-size", type=int, default=BATCH_EMBED_SIZE, show_default=True,
+              help="Questions embedded and retrieved together.")
+def run_batch(input_path: str, output_path: str, concurrency: int, llm_concurrency: int, embed_batch_size: int):
+    """
+    Answers every question of a JSONL file and appends the results to the output file as they complete.
+
+    Questions already answered in the output file are skipped, so an interrupted
+    batch resumes where it stopped; failed questions are retried.
+    """
+    try:
+        with open(input_path, encoding="utf-8") as file:
+            items = read_questions(file)
+        runner = BatchRunner(
+            article_repository,
+            concurrency=concurrency,
+            llm_concurrency=llm_concurrency,
+            embed_batch_size=embed_batch_size,
+            checkpoint_path=output_path,
+        )
+        done = len(runner.completed())
+        if done:
+            click.echo(f"⏭️ Resuming: {done} questions already answered in {output_path}.")
+
+        async def consume() -> int:
+            answered = failed = 0
+            async for result in runner.arun(items):
+                if "error" in result:
+                    failed += 1
+                    click.echo(f"⚠️ Question {result['id']} failed: {result['error']}", err=True)
+                else:
+                    answered += 1
+                    click.echo(f"✅ [{done + answered}/{len(items)}] {result['id']} ({result['seconds']}s)")
+            return failed
+
+        failed = asyncio.run(consume())
+        click.echo(f"✅ Batch finished: answers written to {output_path} ({failed} failed).")
+
+    except Exception as e:
+        logging.error(f"Error while running batch: {e}")
+        click.echo(f"❌ Failed to run batch: {e}", err=True)
+
+
+@cli.command("run-workers")
+@click.option("--workers", type=int, default=max(1, JOB_WORKERS), show_default=True, help="Worker processes.")
+def run_workers(workers: int):
+    """
+    Runs background ingestion workers until interrupted (Ctrl+C).
+
+    Use with `JOB_WORKERS=0` on the API to run ingestion on its own processes.
+    Requires the NumPy store: embedded Chroma cannot be shared with the API process.
+    """
+    if VECTOR_STORE_BACKEND == "chroma":
+        click.echo(
+            "❌ run-workers needs VECTOR_STORE_BACKEND=numpy: embedded Chroma supports a single process. "
+            "Keep JOB_WORKERS > 0 to run ingestion inside the API.",
+            err=True,
+        )
+        raise SystemExit(1)
+
+    processes = start_workers(max(1, workers))
+    click.echo(f"✅ {len(processes)} ingestion workers started. Press Ctrl+C to stop.")
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        click.echo("⏹️ Stopping workers...")
+    finally:
+        stop_workers(processes)
+
+
 # Entry point
 if __name__ == "__main__":
     cli()
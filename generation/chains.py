@@ -1,47 +1,104 @@
 import logging
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+from langchain_core.runnables import Runnable, RunnableConfig
 from langchain_core.output_parsers import StrOutputParser, JsonOutputParser
-from generation.llm_manager import get_llm
-from generation.prompts import RAG_PROMPT, GRADING_PROMPT, SEARCH_REWRITE_PROMPT
+from generation.llm_manager import get_llm, llm_slot
+from generation.grading_cache import get_grading_cache, grading_cache_key
+from generation.verdicts import GRADING_SCHEMA, batch_grading_schema, parse_verdict, parse_verdicts
+from utils.tracing import span
+from generation.prompts import RAG_PROMPT, GRADING_PROMPT, BATCH_GRADING_PROMPT, SEARCH_REWRITE_PROMPT
+from app.config import GRADING_STRUCTURED, LLM_ROLE_SETTINGS
 
+RAG_ERROR_MESSAGE = "An error occurred while generating the response."
 
-def get_rag_chain():
+# Chain factories are memoized: each prompt | llm | parser pipeline is built
+# once per process and shared by every graph run.
+
+
+@lru_cache(maxsize=None)
+def get_rag_chain(asynchronous: bool = False):
     """
     Constructs a function for executing the RAG (Retrieval-Augmented Generation) logic.
 
+    Args:
+        asynchronous (bool, optional): Return a coroutine function using `ainvoke`. Defaults to False.
+
     Returns:
         function: A callable that takes a question and documents as input, returning the generated response.
     """
-    llm = get_llm()
+    llm = get_llm(role="generator")
+    rag_pipeline = RAG_PROMPT | llm | StrOutputParser()
 
-    def rag_chain(question: str, documents: str) -> str:
+    def rag_chain(question: str, documents: str, config: Optional[RunnableConfig] = None) -> str:
         """
         Generates a response based on the provided question and retrieved documents.
 
         Args:
             question (str): The input question.
             documents (str): Concatenated content of the retrieved documents.
+            config (Optional[RunnableConfig], optional): Run configuration propagated from the graph node,
+                so that callbacks (e.g. token streaming) see the LLM call.
 
         Returns:
             str: The generated response.
         """
         try:
-            rag_pipeline = RAG_PROMPT | llm | StrOutputParser()
-            return rag_pipeline.invoke({'question': question, 'documents': documents})
+            with span("rag_generation"):
+                return rag_pipeline.invoke({'question': question, 'documents': documents}, config=config)
+        except Exception as e:
+            logging.error(f"Error in RAG chain: {e}")
+            return RAG_ERROR_MESSAGE
+
+    async def arag_chain(question: str, documents: str, config: Optional[RunnableConfig] = None) -> str:
+        """
+        Async version of `rag_chain`.
+        """
+        try:
+            async with llm_slot():
+                with span("rag_generation"):
+                    return await rag_pipeline.ainvoke({'question': question, 'documents': documents}, config=config)
         except Exception as e:
             logging.error(f"Error in RAG chain: {e}")
-            return "An error occurred while generating the response."
+            return RAG_ERROR_MESSAGE
 
-    return rag_chain
+    return arag_chain if asynchronous else rag_chain
 
 
-def get_grading_chain():
+@lru_cache(maxsize=None)
+def get_grading_chain(asynchronous: bool = False):
     """
     Constructs a function for evaluating document relevance using the grading logic.
 
+    Args:
+        asynchronous (bool, optional): Return a coroutine function using `ainvoke`. Defaults to False.
+
+    With `GRADING_STRUCTURED`, the output is constrained to the verdict's JSON schema,
+    and its length is capped by `GRADER_NUM_PREDICT`.
+
     Returns:
         function: A callable that takes a question and a fact as input, returning a dictionary with a relevance score.
     """
-    llm = get_llm(output_format="json")
+    llm = get_llm(output_format=GRADING_SCHEMA if GRADING_STRUCTURED else "json", role="grader")
+    cache = get_grading_cache()
+    retrieval_grader = GRADING_PROMPT | llm | StrOutputParser()
+
+    def lookup(question: str, fact: str) -> Tuple[Optional[dict], Optional[Tuple[str, str]]]:
+        if cache is None:
+            return None, None
+        key = grading_cache_key(question, fact, llm.model)
+        return cache.get(key[0]), key
+
+    def remember(key: Optional[Tuple[str, str]], result) -> None:
+        # Only well-formed verdicts are cached, never the error fallback
+        if key is not None and isinstance(result, dict) and result.get("score") in ("yes", "no"):
+            cache.set(key[0], {"score": result["score"]}, tag=key[1])
+
+    def verdict(output: str, attributes: dict) -> Optional[dict]:
+        result = parse_verdict(output)
+        if result is None:
+            attributes["parse_error"] = True
+        return result
 
     def grading_chain(question: str, fact: str) -> dict:
         """
@@ -52,26 +109,172 @@ def get_grading_chain():
             fact (str): A document or text passage to evaluate.
 
         Returns:
-            dict: A dictionary containing a relevance score: {"score": "yes"} or {"score": "no"}.
+            dict: A dictionary containing a relevance score: {"score": "yes"} or {"score": "no"}
+            ("no" when the model output cannot be parsed).
         """
+        cached, key = lookup(question, fact)
+        if cached is not None:
+            return cached
+
         try:
-            retrieval_grader = GRADING_PROMPT | llm | JsonOutputParser()
-            return retrieval_grader.invoke({'question': question, 'fact': fact})
+            with span("grade_document") as attributes:
+                result = verdict(retrieval_grader.invoke({'question': question, 'fact': fact}), attributes)
         except Exception as e:
             logging.warning(f"Error in grading chain: {e}. Defaulting to 'no'.")
             return {"score": "no"}
 
-    return grading_chain
+        if result is None:
+            # Unvetted documents must not reach generation; the fallback is not cached
+            logging.warning("Unparsable grading output. Defaulting to 'no'.")
+            return {"score": "no"}
+        remember(key, result)
+        return result
+
+    async def agrading_chain(question: str, fact: str) -> dict:
+        """
+        Async version of `grading_chain`.
+        """
+        cached, key = lookup(question, fact)
+        if cached is not None:
+            return cached
+
+        try:
+            async with llm_slot():
+                with span("grade_document") as attributes:
+                    result = verdict(await retrieval_grader.ainvoke({'question': question, 'fact': fact}), attributes)
+        except Exception as e:
+            logging.warning(f"Error in grading chain: {e}. Defaulting to 'no'.")
+            return {"score": "no"}
+
+        if result is None:
+            # Unvetted documents must not reach generation; the fallback is not cached
+            logging.warning("Unparsable grading output. Defaulting to 'no'.")
+            return {"score": "no"}
+        remember(key, result)
+        return result
+
+    return agrading_chain if asynchronous else grading_chain
+
+
+@lru_cache(maxsize=None)
+def get_batch_grading_chain(asynchronous: bool = False):
+    """
+    Constructs a function for evaluating the relevance of several documents in a single LLM call.
+
+    Args:
+        asynchronous (bool, optional): Return a coroutine function using `ainvoke`. Defaults to False.
+
+    Returns:
+        function: A callable that takes a question and a list of facts as input, returning one
+        relevance score per fact, or None when the model output cannot be parsed.
+    """
+    model = get_llm(role="grader").model
+    cache = get_grading_cache()
+    graders: Dict[int, Runnable] = {}
+
+    def batch_grader(count: int) -> Runnable:
+        # The schema and the token cap depend on the number of facts: one client per count
+        grader = graders.get(count)
+        if grader is None:
+            per_verdict = LLM_ROLE_SETTINGS["grader"]["num_predict"]
+            llm = get_llm(
+                output_format=batch_grading_schema(count) if GRADING_STRUCTURED else "json",
+                role="grader",
+                num_predict=per_verdict * count if per_verdict else None,
+            )
+            grader = graders[count] = BATCH_GRADING_PROMPT | llm | StrOutputParser()
+        return grader
+
+    def prepare(question: str, facts: List[str]):
+        results: List[Optional[dict]] = [None] * len(facts)
+        keys = [grading_cache_key(question, fact, model) for fact in facts] if cache is not None else []
+        if cache is not None:
+            results = [cache.get(key) for key, _ in keys]
+
+        # Only the facts missing from the cache are sent to the model
+        pending = [index for index, result in enumerate(results) if result is None]
+        numbered_facts = "\n".join(f"[{n}] {facts[index]}" for n, index in enumerate(pending, start=1))
+        return results, keys, pending, {'question': question, 'facts': numbered_facts, 'count': len(pending)}
+
+    def collect(output: str, results: List[Optional[dict]], keys, pending: List[int]) -> Optional[List[dict]]:
+        verdicts = parse_verdicts(output, len(pending))
+        if verdicts is None:
+            logging.warning(f"Unexpected batch grading output: {output[:200]!r}.")
+            return None
+
+        for index, verdict in zip(pending, verdicts):
+            results[index] = verdict
+            if cache is not None:
+                key, tag = keys[index]
+                cache.set(key, results[index], tag=tag)
 
+        return results
 
-def get_rewrite_web_search_chain():
+    def batch_grading_chain(question: str, facts: List[str]) -> Optional[List[dict]]:
+        """
+        Evaluates the relevance of every given document (fact) in relation to the question.
+
+        Args:
+            question (str): The question being asked.
+            facts (List[str]): Documents or text passages to evaluate.
+
+        Returns:
+            Optional[List[dict]]: One {"score": "yes" | "no"} per fact, in the same order,
+            or None if the output is not a well-formed list of verdicts.
+        """
+        if not facts:
+            return []
+
+        results, keys, pending, inputs = prepare(question, facts)
+        if not pending:
+            return results
+
+        try:
+            with span("grade_batch", documents=len(pending)):
+                output = batch_grader(len(pending)).invoke(inputs)
+        except Exception as e:
+            logging.warning(f"Error in batch grading chain: {e}.")
+            return None
+
+        return collect(output, results, keys, pending)
+
+    async def abatch_grading_chain(question: str, facts: List[str]) -> Optional[List[dict]]:
+        """
+        Async version of `batch_grading_chain`.
+        """
+        if not facts:
+            return []
+
+        results, keys, pending, inputs = prepare(question, facts)
+        if not pending:
+            return results
+
+        try:
+            async with llm_slot():
+                with span("grade_batch", documents=len(pending)):
+                    output = await batch_grader(len(pending)).ainvoke(inputs)
+        except Exception as e:
+            logging.warning(f"Error in batch grading chain: {e}.")
+            return None
+
+        return collect(output, results, keys, pending)
+
+    return abatch_grading_chain if asynchronous else batch_grading_chain
+
+
+@lru_cache(maxsize=None)
+def get_rewrite_web_search_chain(asynchronous: bool = False):
     """
     Constructs a function for refining the web search query before executing a web search.
 
+    Args:
+        asynchronous (bool, optional): Return a coroutine function using `ainvoke`. Defaults to False.
+
     Returns:
         function: A callable that takes a question as input and returns a refined search query.
     """
-    llm = get_llm(output_format="json")
+    llm = get_llm(output_format="json", role="rewriter")
+    rewrite_pipeline = SEARCH_REWRITE_PROMPT | llm | JsonOutputParser()
 
     def rewrite_web_search_chain(question: str) -> dict:
         """
@@ -84,10 +287,39 @@ def get_rewrite_web_search_chain():
             dict: A dictionary containing the rewritten query: {"query_search": <rewritten_query>}.
         """
         try:
-            rewrite_pipeline = SEARCH_REWRITE_PROMPT | llm | JsonOutputParser()
-            return rewrite_pipeline.invoke({'question': question})
+            with span("rewrite_query"):
+                return rewrite_pipeline.invoke({'question': question})
         except Exception as e:
             logging.warning(f"Error in web search query rewriting: {e}. Using original question.")
             return {"query_search": question}
 
-    return rewrite_web_search_chain
+    async def arewrite_web_search_chain(question: str) -> dict:
+        """
+        Async version of `rewrite_web_search_chain`.
+        """
+        try:
+            async with llm_slot():
+                with span("rewrite_query"):
+                    return await rewrite_pipeline.ainvoke({'question': question})
+        except Exception as e:
+            logging.warning(f"Error in web search query rewriting: {e}. Using original question.")
+            return {"query_search": question}
+
+    return arewrite_web_search_chain if asynchronous else rewrite_web_search_chain
+
+
+def warm_up_chains() -> None:
+    """
+    Builds every chain (sync and async) ahead of the first request.
+    """
+    for factory in (get_rag_chain, get_grading_chain, get_batch_grading_chain, get_rewrite_web_search_chain):
+        factory()
+        factory(asynchronous=True)
+
+
+def clear_chains() -> None:
+    """
+    Drops the memoized chains, so that the next call rebuilds them.
+    """
+    for factory in (get_rag_chain, get_grading_chain, get_batch_grading_chain, get_rewrite_web_search_chain):
+        factory.cache_clear()
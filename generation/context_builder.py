@@ -0,0 +1,160 @@
+"""
+context_builder.py
+------------------
+Builds the document context of the RAG prompt within a token budget.
+
+Steps:
+1. order the documents by retrieval score (documents without a score, such as
+   web results, keep their order after the scored ones);
+2. compress web pages to the sentences sharing the most terms with the question;
+3. drop near-duplicate chunks (64-bit SimHash over word trigrams);
+4. pack the remaining chunks until the budget is reached, counting tokens
+   with the splitter's tiktoken encoding.
+
+Token counts and SimHash fingerprints stored by the splitter at ingest time
+(`token_count`, `simhash` metadata) are used as is; only web pages and
+chunks indexed before they existed are measured on the fly.
+
+A smaller, bounded prompt keeps prefill time predictable, which dominates
+latency on CPU-only Ollama.
+"""
+
+import re
+from typing import List, Tuple
+from langchain.schema import Document
+from store.lexical_index import tokenize
+from utils.id_utils import simhash
+from utils.tiktoken_spliter import count_tokens, get_encoder
+from utils.tracing import span
+from app.config import (
+    CONTEXT_TOKEN_BUDGET,
+    CONTEXT_DEDUP_MAX_DISTANCE,
+    CONTEXT_COMPRESS_WEB,
+    CONTEXT_WEB_MAX_TOKENS,
+)
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def _relevance_key(doc: Document) -> Tuple[bool, float]:
+    score = doc.metadata.get("retrieval_score")
+    return score is None, -(score or 0.0)
+
+
+def _fingerprint(doc: Document, text: str) -> int:
+    stored = doc.metadata.get("simhash")
+    if stored and text == doc.page_content:
+        return int(stored, 16)
+    return simhash(text)
+
+
+def _token_count(doc: Document, text: str) -> int:
+    stored = doc.metadata.get("token_count")
+    if stored is not None and text == doc.page_content:
+        return int(stored)
+    return count_tokens(text)
+
+
+def _is_web_result(doc: Document) -> bool:
+    return "url" in doc.metadata and "source" not in doc.metadata
+
+
+def compress_text(question: str, text: str, max_tokens: int) -> str:
+    """
+    Keeps the sentences of a text that share the most terms with the question,
+    in their original order, within `max_tokens`.
+
+    Args:
+        question (str): The user question.
+        text (str): The text to compress (e.g. a web page extract).
+        max_tokens (int): Token budget for the compressed text.
+
+    Returns:
+        str: The compressed text (unchanged if it already fits).
+    """
+    if count_tokens(text) <= max_tokens:
+        return text
+
+    question_terms = set(tokenize(question))
+    sentences = [sentence for sentence in _SENTENCE_END.split(text) if sentence.strip()]
+    ranked = sorted(
+        range(len(sentences)),
+        key=lambda i: len(question_terms & set(tokenize(sentences[i]))),
+        reverse=True,
+    )
+
+    kept, used = set(), 0
+    for index in ranked:
+        tokens = count_tokens(sentences[index])
+        if used + tokens <= max_tokens:
+            kept.add(index)
+            used += tokens
+    return " ".join(sentences[i] for i in sorted(kept))
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    encoder = get_encoder()
+    return encoder.decode(encoder.encode(text, disallowed_special=())[:max_tokens])
+
+
+def build_context(
+    question: str,
+    documents: List[Document],
+    budget: int = CONTEXT_TOKEN_BUDGET,
+    max_distance: int = CONTEXT_DEDUP_MAX_DISTANCE,
+    compress_web: bool = CONTEXT_COMPRESS_WEB,
+    web_max_tokens: int = CONTEXT_WEB_MAX_TOKENS,
+) -> str:
+    """
+    Builds the document context passed to the RAG prompt.
+
+    Args:
+        question (str): The user question.
+        documents (List[Document]): Graded and web search documents.
+        budget (int, optional): Token budget of the context (0 disables packing and keeps every document).
+        max_distance (int, optional): SimHash Hamming distance under which two chunks are
+            near-duplicates (-1 disables deduplication).
+        compress_web (bool, optional): Compress web pages to their most relevant sentences.
+        web_max_tokens (int, optional): Token budget of each compressed web page.
+
+    Returns:
+        str: The documents to put in the prompt, one per line.
+    """
+    if budget <= 0:
+        return "\n".join(d.page_content for d in documents)
+
+    with span("context_packing", documents=len(documents)) as attributes:
+        ordered = sorted(documents, key=_relevance_key)
+
+        candidates: List[Tuple[str, int]] = []
+        fingerprints: List[int] = []
+        duplicates = compressed = 0
+        for doc in ordered:
+            text = doc.page_content
+            if compress_web and _is_web_result(doc):
+                shorter = compress_text(question, text, web_max_tokens)
+                compressed += shorter != text
+                text = shorter
+            if not text.strip():
+                continue
+
+            if max_distance >= 0:
+                fingerprint = _fingerprint(doc, text)
+                if any(bin(fingerprint ^ other).count("1") <= max_distance for other in fingerprints):
+                    duplicates += 1
+                    continue
+                fingerprints.append(fingerprint)
+            candidates.append((text, _token_count(doc, text)))
+
+        packed, used = [], 0
+        for text, tokens in candidates:
+            if used + tokens <= budget:
+                packed.append(text)
+                used += tokens
+        if not packed and candidates:
+            # Not even the best chunk fits: keep its beginning
+            packed = [_truncate(candidates[0][0], budget)]
+            used = budget
+
+        attributes.update(tokens=used, kept=len(packed), duplicates=duplicates, compressed=compressed)
+        return "\n".join(packed)
@@ -0,0 +1,101 @@
+"""
+grading_cache.py
+----------------
+Process-wide cache of grading verdicts.
+
+Verdicts are keyed by a hash of the normalized question, the chunk content
+and the grader model name. Every entry is tagged with the chunk content hash
+so that all verdicts for a chunk can be dropped when the chunk is deleted
+or re-indexed.
+"""
+
+import logging
+import re
+import threading
+from typing import Iterable, Optional, Tuple
+from utils.cache import TieredCache
+from utils.id_utils import hash_text
+from app.config import (
+    GRADING_CACHE_ENABLED,
+    GRADING_CACHE_SIZE,
+    GRADING_CACHE_TTL,
+    GRADING_CACHE_PATH,
+    GRADING_CACHE_MAX_DISK_ENTRIES,
+)
+
+_grading_cache: Optional[TieredCache] = None
+_lock = threading.Lock()
+
+
+def get_grading_cache() -> Optional[TieredCache]:
+    """
+    Returns the shared grading cache, creating it on first use.
+
+    Returns:
+        Optional[TieredCache]: The cache, or None when `GRADING_CACHE_ENABLED` is false.
+    """
+    global _grading_cache
+
+    if not GRADING_CACHE_ENABLED:
+        return None
+
+    with _lock:
+        if _grading_cache is None:
+            _grading_cache = TieredCache(
+                max_size=GRADING_CACHE_SIZE,
+                ttl=GRADING_CACHE_TTL or None,
+                path=GRADING_CACHE_PATH or None,
+                table="grading_verdicts",
+                max_disk_entries=GRADING_CACHE_MAX_DISK_ENTRIES,
+            )
+        return _grading_cache
+
+
+def normalize_question(question: str) -> str:
+    """
+    Normalizes a question for cache lookups (case and whitespace insensitive).
+    """
+    return re.sub(r"\s+", " ", question).strip().lower()
+
+
+def chunk_hash(content: str) -> str:
+    """
+    Returns the hash identifying a chunk by its content.
+    """
+    return hash_text(content)
+
+
+def grading_cache_key(question: str, fact: str, model: str) -> Tuple[str, str]:
+    """
+    Builds the cache key for a (question, chunk, grader model) triple.
+
+    Args:
+        question (str): The user question.
+        fact (str): The chunk content.
+        model (str): The grader model name.
+
+    Returns:
+        Tuple[str, str]: The cache key and the chunk hash used as invalidation tag.
+    """
+    fact_hash = chunk_hash(fact)
+    return hash_text(model, normalize_question(question), fact_hash), fact_hash
+
+
+def invalidate_chunks(contents: Iterable[str]) -> int:
+    """
+    Drops every cached verdict for the given chunk contents.
+
+    Args:
+        contents (Iterable[str]): Contents of the deleted or re-indexed chunks.
+
+    Returns:
+        int: Number of removed cache entries.
+    """
+    cache = get_grading_cache()
+    if cache is None:
+        return 0
+
+    removed = cache.delete_tags(chunk_hash(content) for content in contents)
+    if removed:
+        logging.info(f"Invalidated {removed} cached grading verdicts.")
+    return removed
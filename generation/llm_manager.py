@@ -1,28 +1,196 @@
+import asyncio
+import contextvars
+import json
 import logging
+import threading
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple, Union
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
 from langchain_ollama import ChatOllama
-from app.config import OLLAMA_MODEL  # Environment variable defined in config.py
+from generation.llm_scheduler import get_scheduler
+from app.config import OLLAMA_MODEL, LLM_COALESCE, LLM_ROLE_SETTINGS  # Environment variables defined in config.py
+from utils.id_utils import hash_text
+from utils.tracing import llm_metrics_callback
 
+# Ollama options that can be set per role (see LLM_ROLE_SETTINGS)
+ROLE_OPTIONS = ("num_predict", "num_ctx", "temperature", "keep_alive", "reasoning")
 
-def get_llm(model: str = "", output_format: str = None) -> ChatOllama:
+# One ChatOllama per (model, format, role, token cap): each instance owns sync and async HTTP clients
+# whose keep-alive connections to Ollama are reused across requests.
+_llm_pool: Dict[Tuple[str, Optional[str], str, Optional[int]], "ScheduledChatOllama"] = {}
+_pool_lock = threading.Lock()
+
+# Optional cap on concurrent async LLM calls, inherited by every task started
+# from the context that set it (see `set_llm_concurrency_limit`).
+_llm_limit: contextvars.ContextVar[Optional[asyncio.Semaphore]] = contextvars.ContextVar("llm_limit", default=None)
+
+
+def _coalesced_copy(result: ChatResult) -> ChatResult:
+    """
+    Copies the result of a coalesced call for a waiting caller. Its generations are
+    marked "coalesced" so the metrics callback does not count the LLM call twice.
+    """
+    result = result.model_copy(deep=True)
+    for generation in result.generations:
+        generation.generation_info = {**(generation.generation_info or {}), "coalesced": True}
+    return result
+
+
+class ScheduledChatOllama(ChatOllama):
+    """
+    ChatOllama whose calls go through the model's scheduler (see `llm_scheduler`):
+    they wait for a slot in the priority class of their role, and identical
+    non-streamed requests in flight share one call.
+
+    Attributes:
+        role (str): "generator", "grader" or "rewriter".
+    """
+
+    role: str = "generator"
+
+    def _request_key(self, messages: List[BaseMessage], stop: Optional[List[str]], kwargs: Dict[str, Any]) -> str:
+        request = {
+            "model": self.model,
+            "format": self.format,
+            "role": self.role,
+            "num_predict": self.num_predict,
+            "stop": stop,
+            "kwargs": kwargs,
+            "messages": [(message.type, message.content) for message in messages],
+        }
+        return hash_text(json.dumps(request, sort_keys=True, default=str))
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        scheduler = get_scheduler(self.model)
+
+        def call() -> ChatResult:
+            with scheduler.slot(self.role):
+                return ChatOllama._generate(self, messages, stop, run_manager, **kwargs)
+
+        if not LLM_COALESCE:
+            return call()
+        return scheduler.coalesce(self._request_key(messages, stop, kwargs), call, _coalesced_copy)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        scheduler = get_scheduler(self.model)
+
+        async def call() -> ChatResult:
+            async with scheduler.aslot(self.role):
+                return await ChatOllama._agenerate(self, messages, stop, run_manager, **kwargs)
+
+        if not LLM_COALESCE:
+            return await call()
+        return await scheduler.acoalesce(self._request_key(messages, stop, kwargs), call, _coalesced_copy)
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        # Streamed tokens go to this caller's callbacks only: never coalesced
+        with get_scheduler(self.model).slot(self.role):
+            yield from ChatOllama._stream(self, messages, stop, run_manager, **kwargs)
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        async with get_scheduler(self.model).aslot(self.role):
+            async for chunk in ChatOllama._astream(self, messages, stop, run_manager, **kwargs):
+                yield chunk
+
+
+def get_llm(
+    model: str = "",
+    output_format: Union[str, Dict[str, Any], None] = None,
+    role: str = "generator",
+    num_predict: Optional[int] = None,
+) -> ChatOllama:
     """
     Returns an instance of the ChatOllama LLM.
-    If no model is specified, it uses the default model from the environment variable.
+    If no model is specified, it uses the role's model (`GRADER_MODEL`...), or
+    else the default model from the environment variable. The role's options
+    (`GRADER_NUM_PREDICT`...) are applied to the client.
+
+    Instances are pooled: the same (model, output_format, role, num_predict) always returns
+    the same client, so HTTP connections to Ollama are kept alive and reused.
+    Calls are admitted by the model's scheduler, with the priority of the role.
 
     Args:
         model (str, optional): The name of the Ollama model to load. Defaults to the configured model.
-        output_format (str, optional): The desired output format (e.g., "json").
+        output_format (Union[str, Dict[str, Any]], optional): The desired output format: "json",
+            or a JSON schema the output must follow.
+        role (str, optional): "generator", "grader" or "rewriter". Defaults to "generator".
+        num_predict (Optional[int], optional): Output token cap overriding the role's.
 
     Returns:
         ChatOllama: An instance of the ChatOllama LLM.
+
+    Raises:
+        ValueError: If no model is configured or the role is unknown.
     """
+    settings = LLM_ROLE_SETTINGS.get(role)
+    if settings is None:
+        raise ValueError(f"Unknown LLM role: {role}")
+    model = model or settings["model"]
     if not model:
         if not OLLAMA_MODEL:
             logging.error("OLLAMA_MODEL is not set in the environment configuration.")
             raise ValueError("OLLAMA_MODEL must be defined in the environment configuration.")
         model = OLLAMA_MODEL
 
-    try:
-        return ChatOllama(model=model) if output_format is None else ChatOllama(model=model, format=output_format)
-    except Exception as e:
-        logging.error(f"Error initializing ChatOllama with model '{model}': {e}")
-        raise
+    format_key = json.dumps(output_format, sort_keys=True) if isinstance(output_format, dict) else output_format
+    key = (model, format_key, role, num_predict)
+    with _pool_lock:
+        llm = _llm_pool.get(key)
+        if llm is not None:
+            return llm
+
+        options = {name: settings[name] for name in ROLE_OPTIONS if settings[name] is not None}
+        if num_predict is not None:
+            options["num_predict"] = num_predict
+        if output_format is not None:
+            options["format"] = output_format
+        try:
+            # The metrics callback records latency, time-to-first-token and token usage of every call,
+            # labelled with the role found in the client metadata
+            llm = ScheduledChatOllama(
+                model=model,
+                role=role,
+                metadata={"llm_role": role},
+                callbacks=[llm_metrics_callback],
+                **options,
+            )
+        except Exception as e:
+            logging.error(f"Error initializing ChatOllama with model '{model}': {e}")
+            raise
+
+        _llm_pool[key] = llm
+        return llm
+
+
+def clear_llm_pool() -> None:
+    """
+    Drops every pooled ChatOllama instance (their HTTP clients are released with them).
+    """
+    with _pool_lock:
+        _llm_pool.clear()
+
+
+def set_llm_concurrency_limit(limit: int) -> None:
+    """
+    Caps the number of async LLM calls in flight for the current context and
+    the tasks it starts afterwards (e.g. every question of a batch run), on
+    top of the process-wide per-model limit of the scheduler.
+
+    Args:
+        limit (int): Maximum concurrent LLM calls (0 removes the cap).
+    """
+    _llm_limit.set(asyncio.Semaphore(limit) if limit > 0 else None)
+
+
+@asynccontextmanager
+async def llm_slot() -> AsyncIterator[None]:
+    """
+    Waits for a free LLM slot when a concurrency limit is set, and holds it for the call.
+    """
+    semaphore = _llm_limit.get()
+    if semaphore is None:
+        yield
+        return
+    async with semaphore:
+        yield
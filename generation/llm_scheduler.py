@@ -0,0 +1,303 @@
+"""
+llm_scheduler.py
+----------------
+Process-wide admission control for LLM calls to Ollama.
+
+Every pooled client of `get_llm` goes through one scheduler per model:
+- at most `LLM_MAX_CONCURRENCY` calls run at once against a model
+  (`LLM_MODEL_CONCURRENCY` overrides it per model); the others wait;
+- waiting calls are admitted by priority class — answer generation first,
+  then grading, then query rewriting — and in arrival order within a class,
+  so a burst of grading calls cannot delay the answers users are waiting for;
+- identical requests in flight (same model, options and prompt) are
+  coalesced: the duplicates wait for the first call and get a copy of its
+  result instead of reaching Ollama (`LLM_COALESCE`). Streamed calls are never coalesced.
+
+Sync callers (worker threads) and async callers (event loop tasks) share
+the same queue. Queue depth, calls in flight, wait time and coalesced calls
+are exported as Prometheus metrics.
+"""
+
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import CancelledError as FutureCancelledError, Future
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+from utils.tracing import LLM_QUEUE_DEPTH, LLM_IN_FLIGHT, LLM_QUEUE_WAIT_SECONDS, LLM_COALESCED
+from app.config import LLM_MAX_CONCURRENCY, LLM_MODEL_CONCURRENCY
+
+# Admission order of the LLM roles (lower is served first)
+PRIORITIES = {"generator": 0, "grader": 1, "rewriter": 2}
+
+
+def _parse_limits(value: str) -> Dict[str, int]:
+    """
+    Parses "model=limit,model=limit" into a dict.
+    """
+    limits = {}
+    for item in value.split(","):
+        if "=" in item:
+            model, limit = item.rsplit("=", 1)
+            limits[model.strip()] = int(limit)
+    return limits
+
+
+class _Waiter:
+    """
+    A call waiting for a slot: woken through an Event (thread) or a Future (event loop).
+    """
+
+    __slots__ = ("event", "loop", "future", "granted", "cancelled")
+
+    def __init__(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.loop = loop
+        self.future = loop.create_future() if loop is not None else None
+        self.event = threading.Event() if loop is None else None
+        self.granted = False
+        self.cancelled = False
+
+    def wake(self) -> None:
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(self._resolve)
+
+    def _resolve(self) -> None:
+        if not self.future.done():
+            self.future.set_result(None)
+
+
+class ModelScheduler:
+    """
+    Priority queue of the LLM calls to one model, with a concurrency limit and coalescing.
+
+    Attributes:
+        model (str): The model name (metrics label).
+        limit (int): Maximum concurrent calls (0 or less for no limit).
+    """
+
+    def __init__(self, model: str, limit: int):
+        """
+        Args:
+            model (str): The model name.
+            limit (int): Maximum concurrent calls (0 or less for no limit).
+        """
+        self.model = model
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._active = 0
+        self._waiting = 0
+        self._queue: List[Tuple[int, int, _Waiter]] = []
+        self._sequence = itertools.count()
+        self._in_flight: Dict[str, Future] = {}
+
+    def _try_enter(self) -> bool:
+        # Called with the lock held
+        if self.limit > 0 and (self._active >= self.limit or self._waiting):
+            return False
+        self._active += 1
+        LLM_IN_FLIGHT.labels(model=self.model).set(self._active)
+        return True
+
+    def _enqueue(self, priority: int, waiter: _Waiter) -> None:
+        # Called with the lock held
+        heapq.heappush(self._queue, (priority, next(self._sequence), waiter))
+        self._waiting += 1
+        LLM_QUEUE_DEPTH.labels(model=self.model).set(self._waiting)
+
+    def _observe_wait(self, role: str, started: float) -> None:
+        LLM_QUEUE_WAIT_SECONDS.labels(model=self.model, role=role).observe(time.perf_counter() - started)
+
+    def acquire(self, role: str = "generator") -> None:
+        """
+        Waits for a slot (blocking the calling thread).
+
+        Args:
+            role (str, optional): LLM role, giving the priority class (see `PRIORITIES`).
+        """
+        started = time.perf_counter()
+        with self._lock:
+            if self._try_enter():
+                self._observe_wait(role, started)
+                return
+            waiter = _Waiter()
+            self._enqueue(PRIORITIES.get(role, len(PRIORITIES)), waiter)
+        waiter.event.wait()
+        self._observe_wait(role, started)
+
+    async def aacquire(self, role: str = "generator") -> None:
+        """
+        Async version of `acquire`. A call cancelled while waiting leaves the queue.
+        """
+        started = time.perf_counter()
+        with self._lock:
+            if self._try_enter():
+                self._observe_wait(role, started)
+                return
+            waiter = _Waiter(asyncio.get_running_loop())
+            self._enqueue(PRIORITIES.get(role, len(PRIORITIES)), waiter)
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            with self._lock:
+                granted = waiter.granted
+                if not granted:
+                    waiter.cancelled = True
+                    self._waiting -= 1
+                    LLM_QUEUE_DEPTH.labels(model=self.model).set(self._waiting)
+            if granted:
+                # The slot was handed over just before the cancellation: pass it on
+                self.release()
+            raise
+        self._observe_wait(role, started)
+
+    def release(self) -> None:
+        """
+        Frees a slot, handing it over to the next waiting call by priority.
+        """
+        with self._lock:
+            while self._queue:
+                _, _, waiter = heapq.heappop(self._queue)
+                if waiter.cancelled:
+                    continue
+                waiter.granted = True
+                self._waiting -= 1
+                LLM_QUEUE_DEPTH.labels(model=self.model).set(self._waiting)
+                waiter.wake()
+                return
+            self._active -= 1
+            LLM_IN_FLIGHT.labels(model=self.model).set(self._active)
+
+    @contextmanager
+    def slot(self, role: str = "generator") -> Iterator[None]:
+        """
+        Holds a slot for the duration of the block.
+        """
+        self.acquire(role)
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def aslot(self, role: str = "generator") -> AsyncIterator[None]:
+        """
+        Async version of `slot`.
+        """
+        await self.aacquire(role)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def _join(self, key: str) -> Tuple[bool, Future]:
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is None:
+                future = self._in_flight[key] = Future()
+                return True, future
+        LLM_COALESCED.labels(model=self.model).inc()
+        return False, future
+
+    def _settle(self, key: str, future: Future) -> None:
+        with self._lock:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+
+    def coalesce(self, key: str, call: Callable[[], Any], share: Optional[Callable[[Any], Any]] = None) -> Any:
+        """
+        Runs `call`, unless an identical request (same key) is in flight: then waits for its result.
+
+        Args:
+            key (str): Identity of the request.
+            call (Callable[[], Any]): Performs the request.
+            share (Optional[Callable[[Any], Any]]): Gives each waiting caller its own result
+                (e.g. a copy). Without it, every coalesced caller gets the same object.
+
+        Returns:
+            Any: The result of the request.
+        """
+        while True:
+            leader, future = self._join(key)
+            if leader:
+                break
+            try:
+                return _shared(future.result(), share)
+            except FutureCancelledError:
+                # The first caller gave up: run the request again
+                continue
+
+        try:
+            result = call()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(_shared(result, share))
+            return result
+        finally:
+            self._settle(key, future)
+
+    async def acoalesce(
+        self, key: str, call: Callable[[], Awaitable[Any]], share: Optional[Callable[[Any], Any]] = None
+    ) -> Any:
+        """
+        Async version of `coalesce`. If the first caller is cancelled, the waiting ones run the request again.
+        """
+        while True:
+            leader, future = self._join(key)
+            if leader:
+                break
+            try:
+                return _shared(await asyncio.shield(asyncio.wrap_future(future)), share)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                continue
+
+        try:
+            result = await call()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(_shared(result, share))
+            return result
+        finally:
+            self._settle(key, future)
+
+
+def _shared(result: Any, share: Optional[Callable[[Any], Any]]) -> Any:
+    """
+    Applies the `share` hook of a coalesced request. The first caller publishes a shared
+    result too, so that waiters never copy an object it is still modifying.
+    """
+    return share(result) if share is not None else result
+
+
+_schedulers: Dict[str, ModelScheduler] = {}
+_schedulers_lock = threading.Lock()
+_model_limits = _parse_limits(LLM_MODEL_CONCURRENCY)
+
+
+def get_scheduler(model: str) -> ModelScheduler:
+    """
+    Returns the scheduler of a model, creating it on first use.
+
+    Args:
+        model (str): The model name.
+
+    Returns:
+        ModelScheduler: The process-wide scheduler of the model.
+    """
+    with _schedulers_lock:
+        scheduler = _schedulers.get(model)
+        if scheduler is None:
+            scheduler = _schedulers[model] = ModelScheduler(model, _model_limits.get(model, LLM_MAX_CONCURRENCY))
+        return scheduler
@@ -66,4 +66,28 @@ Output only valid JSON with a single key: "query_search"
 value should only be the text to search.
 """,
     input_variables=["question"],
-)
\ No newline at end of file
+)
+
+# Prompt pour le grading batché (plusieurs documents en un seul appel)
+BATCH_GRADING_PROMPT = PromptTemplate(
+    template="""
+You are a teacher grading quiz answers for relevance.  
+Your task is to determine, for each numbered FACT, whether it is relevant to the given QUESTION.
+
+"Relevant" means the FACT directly helps answer, clarify, or is closely related to the QUESTION.
+
+Output only valid JSON with a single key: "scores" 
+value should be a list with exactly {count} items, one per FACT, in the same order as the FACTS.
+Each item should only be : 
+- "yes" when relevant
+- "no" when no relevant
+
+Now grade the following:
+
+QUESTION: {question}
+FACTS:
+{facts}
+Output:
+""",
+    input_variables=["question", "facts", "count"],
+)
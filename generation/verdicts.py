@@ -0,0 +1,114 @@
+"""
+verdicts.py
+-----------
+Output format and parsing of grading verdicts.
+
+With `GRADING_STRUCTURED`, the grading schemas below are passed to Ollama as
+the `format` of the request: decoding is constrained to a {"score": "yes"|"no"}
+object (or a list of exactly one verdict per fact for batched grading), so
+the output is a few tokens long and always well formed.
+
+Parsing is defensive anyway (plain JSON mode, models ignoring the schema):
+reasoning blocks (`<think>...</think>`) are stripped, the first JSON object of
+the text is read, and anything that is not a valid verdict counts as a parse
+failure, exported as `crag_grading_outputs_total{outcome="parse_error"}`.
+"""
+
+import json
+import re
+from typing import Any, Dict, List, Optional
+from utils.tracing import GRADING_OUTPUTS
+
+VERDICTS = ("yes", "no")
+
+GRADING_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {"score": {"type": "string", "enum": list(VERDICTS)}},
+    "required": ["score"],
+}
+
+# Reasoning models may emit their chain of thought before the answer; a block
+# cut short by the token cap has no closing tag
+_REASONING = re.compile(r"<think>.*?(</think>|$)", re.DOTALL | re.IGNORECASE)
+_JSON_OBJECT = re.compile(r"\{.*\}", re.DOTALL)
+
+
+def batch_grading_schema(count: int) -> Dict[str, Any]:
+    """
+    Returns the JSON schema of a batched grading answer for `count` facts.
+    """
+    return {
+        "type": "object",
+        "properties": {
+            "scores": {
+                "type": "array",
+                "items": {"type": "string", "enum": list(VERDICTS)},
+                "minItems": count,
+                "maxItems": count,
+            }
+        },
+        "required": ["scores"],
+    }
+
+
+def strip_reasoning(text: str) -> str:
+    """
+    Removes the reasoning blocks of a model output.
+    """
+    return _REASONING.sub("", text).strip()
+
+
+def _read_object(text: str) -> Optional[dict]:
+    text = strip_reasoning(text)
+    try:
+        value = json.loads(text)
+    except json.JSONDecodeError:
+        match = _JSON_OBJECT.search(text)
+        if match is None:
+            return None
+        try:
+            value = json.loads(match.group(0))
+        except json.JSONDecodeError:
+            return None
+    return value if isinstance(value, dict) else None
+
+
+def _verdict(value: Any) -> Optional[str]:
+    verdict = str(value).strip().lower()
+    return verdict if verdict in VERDICTS else None
+
+
+def parse_verdict(text: str) -> Optional[dict]:
+    """
+    Reads a single grading verdict from a model output.
+
+    Args:
+        text (str): The raw model output.
+
+    Returns:
+        Optional[dict]: {"score": "yes" | "no"}, or None if the output holds no valid verdict.
+    """
+    output = _read_object(text)
+    verdict = _verdict(output.get("score")) if output is not None else None
+    GRADING_OUTPUTS.labels(mode="single", outcome="ok" if verdict else "parse_error").inc()
+    return {"score": verdict} if verdict else None
+
+
+def parse_verdicts(text: str, count: int) -> Optional[List[dict]]:
+    """
+    Reads the verdicts of a batched grading call from a model output.
+
+    Args:
+        text (str): The raw model output.
+        count (int): Number of graded facts.
+
+    Returns:
+        Optional[List[dict]]: One {"score": "yes" | "no"} per fact, or None if the output
+        is not a list of exactly `count` valid verdicts.
+    """
+    output = _read_object(text)
+    scores = output.get("scores") if output is not None else None
+    verdicts = [_verdict(score) for score in scores] if isinstance(scores, list) else []
+    valid = len(verdicts) == count and all(verdicts)
+    GRADING_OUTPUTS.labels(mode="batch", outcome="ok" if valid else "parse_error").inc()
+    return [{"score": verdict} for verdict in verdicts] if valid else None
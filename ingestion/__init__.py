@@ -0,0 +1,4 @@
+"""
+Package `ingestion`:
+Contient le pipeline d'ingestion (chargement, découpage, embedding, indexation).
+"""
@@ -0,0 +1,294 @@
+"""
+job_queue.py
+------------
+Persistent queue of background ingestion jobs.
+
+Jobs live in a SQLite database shared by the API processes, which enqueue
+them, and the worker processes (`ingestion/worker.py`), which claim and run
+them. A job goes through "queued" → "running" → "done" or "failed"; its
+progress (per-stage pipeline stats) and result are stored as JSON.
+
+Scheduling is fair between clients: a worker claims the oldest queued job
+of the client with the fewest running jobs, so one client enqueuing a
+large batch does not hold back everybody else's sources. Running jobs send
+heartbeats; a job whose worker died is put back in the queue (up to
+`max_attempts` runs). Heartbeats and results are only accepted from the
+worker that currently owns the job, so a worker that was presumed dead
+cannot overwrite the run of the worker that took over.
+
+The queue also carries the query activity of the API processes, which
+workers use to yield the shared Ollama instance to `/ask` traffic.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+STATUSES = ("queued", "running", "done", "failed")
+
+_COLUMNS = (
+    "id, kind, payload, client, status, progress, result, error, attempts, "
+    "worker, created_at, started_at, finished_at, heartbeat_at"
+)
+
+
+class JobQueue:
+    """
+    SQLite-backed job queue, safe to share across threads and processes.
+
+    Attributes:
+        path (str): Path of the SQLite database file.
+        max_attempts (int): Runs of a job before it is marked failed when its worker keeps dying.
+    """
+
+    def __init__(self, path: str, max_attempts: int = 3):
+        """
+        Opens (and creates if needed) the job database.
+
+        Args:
+            path (str): Path of the SQLite database file.
+            max_attempts (int, optional): Runs of a job before it is given up. Defaults to 3.
+        """
+        self.path = path
+        self.max_attempts = max(1, max_attempts)
+        self._lock = threading.Lock()
+        self._last_query_note = 0.0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Transactions are explicit: claims need BEGIN IMMEDIATE to be atomic across processes
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, kind TEXT NOT NULL, payload TEXT NOT NULL, client TEXT NOT NULL, "
+                "status TEXT NOT NULL, progress TEXT, result TEXT, error TEXT, attempts INTEGER NOT NULL DEFAULT 0, "
+                "worker TEXT, created_at REAL NOT NULL, started_at REAL, finished_at REAL, heartbeat_at REAL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS activity (name TEXT PRIMARY KEY, at REAL NOT NULL)")
+
+    def enqueue(self, kind: str, payload: Dict[str, Any], client: str = "default") -> str:
+        """
+        Adds a job to the queue.
+
+        Args:
+            kind (str): Job type ("urls" or "file", see `worker.run_job`).
+            payload (Dict[str, Any]): JSON-serializable job parameters.
+            client (str, optional): Who submitted the job, for fair scheduling.
+
+        Returns:
+            str: The job ID.
+        """
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, payload, client, status, created_at) VALUES (?, ?, ?, ?, 'queued', ?)",
+                (job_id, kind, json.dumps(payload), client, time.time()),
+            )
+        return job_id
+
+    def claim(self, worker: str) -> Optional[Dict[str, Any]]:
+        """
+        Takes the next job to run and marks it running.
+
+        Args:
+            worker (str): Identifier of the claiming worker.
+
+        Returns:
+            Optional[Dict[str, Any]]: The claimed job (see `get`), or None if the queue is empty.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT id FROM jobs AS j WHERE status = 'queued' ORDER BY "
+                    "(SELECT COUNT(*) FROM jobs AS r WHERE r.status = 'running' AND r.client = j.client), "
+                    "created_at LIMIT 1"
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1, "
+                        "started_at = ?, heartbeat_at = ? WHERE id = ?",
+                        (worker, now, now, row[0]),
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return self.get(row[0]) if row is not None else None
+
+    def heartbeat(self, job_id: str, worker: str, progress: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Records that a running job is alive, with its latest progress.
+
+        Args:
+            job_id (str): The job ID.
+            worker (str): Identifier of the worker running the job.
+            progress (Optional[Dict[str, Any]], optional): Progress to store (kept unchanged if None).
+
+        Returns:
+            bool: False if the worker no longer owns the job (it was requeued or finished).
+        """
+        with self._lock:
+            if progress is None:
+                cursor = self._conn.execute(
+                    "UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                    (time.time(), job_id, worker),
+                )
+            else:
+                cursor = self._conn.execute(
+                    "UPDATE jobs SET heartbeat_at = ?, progress = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                    (time.time(), json.dumps(progress), job_id, worker),
+                )
+        return cursor.rowcount > 0
+
+    def finish(self, job_id: str, worker: str, result: Dict[str, Any], error: Optional[str] = None) -> bool:
+        """
+        Marks a job done (or failed, with an error message) and stores its result.
+
+        Args:
+            job_id (str): The job ID.
+            worker (str): Identifier of the worker running the job.
+            result (Dict[str, Any]): The job result.
+            error (Optional[str], optional): Error message; marks the job failed.
+
+        Returns:
+            bool: False if the worker no longer owns the job; the result is then discarded.
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? "
+                "WHERE id = ? AND worker = ? AND status = 'running'",
+                ("failed" if error else "done", json.dumps(result), error, time.time(), job_id, worker),
+            )
+        return cursor.rowcount > 0
+
+    def requeue_stale(self, timeout: float) -> int:
+        """
+        Puts back in the queue the running jobs whose worker stopped sending heartbeats.
+        Jobs that already used all their attempts are marked failed instead.
+
+        Args:
+            timeout (float): Seconds without heartbeat after which a worker is considered dead.
+
+        Returns:
+            int: Number of jobs requeued or failed.
+        """
+        limit = time.time() - timeout
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                failed = self._conn.execute(
+                    "UPDATE jobs SET status = 'failed', error = 'worker stopped responding', finished_at = ? "
+                    "WHERE status = 'running' AND heartbeat_at < ? AND attempts >= ?",
+                    (time.time(), limit, self.max_attempts),
+                ).rowcount
+                requeued = self._conn.execute(
+                    "UPDATE jobs SET status = 'queued', worker = NULL WHERE status = 'running' AND heartbeat_at < ?",
+                    (limit,),
+                ).rowcount
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return failed + requeued
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns a job.
+
+        Args:
+            job_id (str): The job ID.
+
+        Returns:
+            Optional[Dict[str, Any]]: {"id", "kind", "payload", "client", "status", "progress", "result",
+            "error", "attempts", "worker", "created_at", "started_at", "finished_at", "heartbeat_at",
+            "position"}, or None if unknown. "position" is the number of jobs queued before it.
+        """
+        with self._lock:
+            row = self._conn.execute(f"SELECT {_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            job = self._to_dict(row)
+            job["position"] = None
+            if job["status"] == "queued":
+                job["position"] = self._conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND created_at < ?", (job["created_at"],)
+                ).fetchone()[0]
+        return job
+
+    def list(self, status: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        Returns the most recent jobs, newest first.
+
+        Args:
+            status (Optional[str], optional): Only jobs in this status.
+            limit (int, optional): Maximum number of jobs. Defaults to 50.
+
+        Returns:
+            List[Dict[str, Any]]: The jobs, without their result.
+        """
+        query = f"SELECT {_COLUMNS} FROM jobs"
+        params: tuple = ()
+        if status:
+            query += " WHERE status = ?"
+            params = (status,)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        with self._lock:
+            rows = self._conn.execute(query, params + (limit,)).fetchall()
+        jobs = [self._to_dict(row) for row in rows]
+        for job in jobs:
+            job.pop("result")
+        return jobs
+
+    def counts(self) -> Dict[str, int]:
+        """
+        Returns the number of jobs in each status.
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = dict.fromkeys(STATUSES, 0)
+        counts.update(dict(rows))
+        return counts
+
+    def note_query(self, min_interval: float = 1.0) -> None:
+        """
+        Records that the API is serving queries. Writes are throttled to one per `min_interval` seconds.
+        """
+        now = time.time()
+        if now - self._last_query_note < min_interval:
+            return
+        self._last_query_note = now
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO activity (name, at) VALUES ('query', ?)", (now,))
+
+    def query_active(self, window: float) -> bool:
+        """
+        Tells whether the API served queries during the last `window` seconds.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT at FROM activity WHERE name = 'query'").fetchone()
+        return row is not None and time.time() - row[0] < window
+
+    def close(self) -> None:
+        """
+        Closes the database connection.
+        """
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _to_dict(row: tuple) -> Dict[str, Any]:
+        job = dict(zip((column.strip() for column in _COLUMNS.split(",")), row))
+        for key in ("payload", "progress", "result"):
+            job[key] = json.loads(job[key]) if job[key] else None
+        return job
@@ -0,0 +1,520 @@
+"""
+pipeline.py
+-----------
+Staged ingestion pipeline used by `add-source` and `/add-url`.
+
+Stages:
+1. fetch: URLs are loaded concurrently, with a bound on parallel requests per host;
+2. split: each page is split as soon as it arrives;
+3. embed: chunks are embedded in fixed-size batches by a worker pool;
+4. upsert: each embedded batch is written to the vector store in one call.
+
+Files are streamed: their pages are split and queued for embedding a window
+of `INGEST_PAGE_WINDOW` pages at a time, as the loader extracts them, so a
+large PDF is ingested at bounded memory.
+
+A failure on one URL or one batch is recorded and does not stop the others.
+Every stage reports its item count, busy time and throughput.
+
+Ingestion is incremental: sources whose validator (ETag, Last-Modified,
+file mtime) or content hash did not change are skipped, only chunks that
+are not yet indexed are embedded, and chunks that disappeared from a source
+are deleted once its new chunks are stored.
+"""
+
+import hashlib
+import itertools
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+from langchain.schema import Document
+from repository.article_repository import ArticleRepository
+from retrieval.url_loader import URLLoader
+from app.loader_factory import LoaderFactory
+from utils.base_spliter import BaseSpliter
+from utils.id_utils import hash_text
+from app.config import (
+    INGEST_FETCH_WORKERS,
+    INGEST_FETCH_PER_HOST,
+    INGEST_EMBED_BATCH_SIZE,
+    INGEST_EMBED_WORKERS,
+    INGEST_PAGE_WINDOW,
+)
+
+STAGES = ("fetch", "split", "embed", "upsert")
+
+# A fetched source: (source name, loaded documents, validator). Documents given
+# as an iterator instead of a list are streamed a window of pages at a time.
+FetchedSource = Tuple[str, Iterable[Document], Optional[str]]
+
+
+class StageStats:
+    """
+    Counters for one pipeline stage.
+
+    Attributes:
+        name (str): Stage name.
+        items (int): Number of items processed (pages, chunks...).
+        failures (int): Number of failed units of work.
+        busy_seconds (float): Cumulated time spent in the stage, across workers.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.failures = 0
+        self.busy_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, items: int, seconds: float, failed: bool = False) -> None:
+        """
+        Records one unit of work.
+        """
+        with self._lock:
+            self.items += items
+            self.busy_seconds += seconds
+            if failed:
+                self.failures += 1
+
+    def to_dict(self, elapsed: float) -> Dict[str, Any]:
+        """
+        Returns the counters and the throughput over the pipeline wall time.
+        """
+        return {
+            "items": self.items,
+            "failures": self.failures,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "items_per_second": round(self.items / elapsed, 2) if elapsed > 0 else 0.0,
+        }
+
+
+class IngestionPipeline:
+    """
+    Concurrent, incremental fetch → split → embed → upsert pipeline.
+
+    Attributes:
+        repository (ArticleRepository): Target repository (its embedding model and manifest are used).
+        splitter (BaseSpliter): Splitter applied to each loaded page.
+        fetch_workers (int): Maximum number of URLs fetched at once.
+        fetch_per_host (int): Maximum number of URLs fetched at once from the same host.
+        embed_batch_size (int): Number of chunks per embedding call and per upsert.
+        embed_workers (int): Number of concurrent embedding batches.
+        page_window (int): Number of pages of a streamed source split at once.
+        on_progress (Optional[Callable]): Called with (stage, stats) after each unit of work.
+        before_embed (Optional[Callable]): Called by the embedding workers before each batch,
+            e.g. to pace background ingestion while the LLM serves queries.
+    """
+
+    def __init__(
+        self,
+        repository: ArticleRepository,
+        splitter: BaseSpliter,
+        fetch_workers: int = INGEST_FETCH_WORKERS,
+        fetch_per_host: int = INGEST_FETCH_PER_HOST,
+        embed_batch_size: int = INGEST_EMBED_BATCH_SIZE,
+        embed_workers: int = INGEST_EMBED_WORKERS,
+        page_window: int = INGEST_PAGE_WINDOW,
+        on_progress: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+        before_embed: Optional[Callable[[], None]] = None,
+    ):
+        self.repository = repository
+        self.splitter = splitter
+        self.fetch_workers = max(1, fetch_workers)
+        self.fetch_per_host = max(1, fetch_per_host)
+        self.embed_batch_size = max(1, embed_batch_size)
+        self.embed_workers = max(1, embed_workers)
+        self.page_window = max(1, page_window)
+        self.on_progress = on_progress
+        self.before_embed = before_embed
+        self._stats = {stage: StageStats(stage) for stage in STAGES}
+        self._start = time.perf_counter()
+        self._upsert_lock = threading.Lock()
+        self._skipped: List[str] = []
+
+    def ingest_urls(self, urls: Iterable[str]) -> Dict[str, Any]:
+        """
+        Fetches, splits, embeds and stores the given URLs.
+
+        Args:
+            urls (Iterable[str]): URLs to ingest.
+
+        Returns:
+            Dict[str, Any]: {"document_ids", "failed_sources", "skipped_sources", "stats"}.
+        """
+        urls = list(dict.fromkeys(urls))
+        return self._run(lambda failed: self._fetch_urls(urls, failed))
+
+    def ingest_file(self, file_path: str, source_type: str = "pdf", source: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Loads, splits, embeds and stores a local file, unless it is unchanged since the last run.
+
+        Pages are split and embedded while the next ones are extracted (see `BaseLoader.lazy_load`).
+
+        Args:
+            file_path (str): Path of the file.
+            source_type (str, optional): Loader type for `LoaderFactory`. Defaults to "pdf".
+            source (Optional[str], optional): Identity of the file in the manifest and in the chunks'
+                "source" metadata, e.g. the original name of an upload stored under a temporary path.
+                Defaults to `file_path`.
+
+        Returns:
+            Dict[str, Any]: {"document_ids", "failed_sources", "skipped_sources", "stats"}.
+        """
+        return self._run(lambda failed: self._load_file(file_path, source_type, failed, source or file_path))
+
+    def ingest_documents(self, documents: List[Document], source: str = "documents") -> Dict[str, Any]:
+        """
+        Splits, embeds and stores already loaded documents (e.g. PDF pages).
+
+        Args:
+            documents (List[Document]): Documents to ingest.
+            source (str, optional): Name reported for the source. Defaults to "documents".
+
+        Returns:
+            Dict[str, Any]: {"document_ids", "failed_sources", "skipped_sources", "stats"}.
+        """
+        return self._run(lambda failed: iter([(source, documents, None)]))
+
+    def _run(self, fetch: Callable[[Dict[str, str]], Iterator[FetchedSource]]) -> Dict[str, Any]:
+        """
+        Runs the split, embed and upsert stages over the sources produced by `fetch`,
+        then commits the manifest of every source whose chunks were all stored.
+        """
+        self._stats = {stage: StageStats(stage) for stage in STAGES}
+        self._start = time.perf_counter()
+        self._skipped = []
+        failed_sources: Dict[str, str] = {}
+        pending_commits: Dict[str, Dict[str, Any]] = {}
+        document_ids: List[str] = []
+        buffer: List[Tuple[str, Document]] = []
+        in_flight: List[Future] = []
+
+        def collect(future: Future) -> None:
+            ids, sources, error = future.result()
+            document_ids.extend(ids)
+            if error:
+                for source in sources:
+                    failed_sources.setdefault(source, error)
+
+        with ThreadPoolExecutor(max_workers=self.embed_workers) as embed_pool:
+
+            def submit(batch: List[Tuple[str, Document]]) -> None:
+                # Bounded number of in-flight batches keeps memory flat on large sources
+                while len(in_flight) >= self.embed_workers * 2:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        in_flight.remove(future)
+                        collect(future)
+                in_flight.append(embed_pool.submit(self._embed_and_upsert, batch))
+
+            def enqueue(source: str, chunks: List[Document]) -> None:
+                buffer.extend((source, chunk) for chunk in chunks)
+                while len(buffer) >= self.embed_batch_size:
+                    submit(buffer[:self.embed_batch_size])
+                    del buffer[:self.embed_batch_size]
+
+            for source, pages, validator in fetch(failed_sources):
+                if not isinstance(pages, list):
+                    commit = self._stream_source(source, iter(pages), validator, enqueue, failed_sources)
+                    if commit is not None:
+                        pending_commits[source] = commit
+                    continue
+
+                content_hash = hash_text(*(page.page_content for page in pages))
+                entry = self.repository.get_source(source)
+                if entry and entry["content_hash"] == content_hash:
+                    # Same content behind a new validator: only refresh the manifest
+                    self.repository.commit_source(source, entry["chunk_ids"], [], validator, content_hash)
+                    self._skipped.append(source)
+                    continue
+
+                started = time.perf_counter()
+                try:
+                    chunks = self.splitter.split(pages)
+                    new_chunks, chunk_ids, stale_ids = self.repository.plan_source_update(source, chunks)
+                except Exception as e:
+                    logging.error(f"Splitting failed for {source}: {e}")
+                    failed_sources[source] = str(e)
+                    self._stats["split"].record(0, time.perf_counter() - started, failed=True)
+                    self._progress("split")
+                    continue
+                self._stats["split"].record(len(chunks), time.perf_counter() - started)
+                self._progress("split")
+
+                pending_commits[source] = {
+                    "chunk_ids": chunk_ids,
+                    "stale_ids": stale_ids,
+                    "validator": validator,
+                    "content_hash": content_hash,
+                }
+                logging.info(
+                    f"{source}: {len(chunks)} chunks, {len(new_chunks)} to embed, {len(stale_ids)} stale."
+                )
+
+                enqueue(source, new_chunks)
+
+            if buffer:
+                submit(buffer)
+
+            for future in as_completed(in_flight):
+                collect(future)
+
+        for source, commit in pending_commits.items():
+            if source in failed_sources:
+                # Not recorded, so the next run retries the missing chunks
+                continue
+            try:
+                self.repository.commit_source(
+                    source, commit["chunk_ids"], commit["stale_ids"], commit["validator"], commit["content_hash"]
+                )
+            except Exception as e:
+                logging.error(f"Recording manifest for {source} failed: {e}")
+                failed_sources[source] = str(e)
+
+        return {
+            "document_ids": document_ids,
+            "failed_sources": failed_sources,
+            "skipped_sources": list(self._skipped),
+            "stats": self.stats(),
+        }
+
+    def _stream_source(
+        self,
+        source: str,
+        pages: Iterator[Document],
+        validator: Optional[str],
+        enqueue: Callable[[str, List[Document]], None],
+        failed_sources: Dict[str, str],
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Splits the pages of a source a window at a time, as the loader produces them,
+        and queues the chunks that are not indexed yet.
+
+        The whole source is never held in memory, so unlike loaded sources an unchanged
+        content is only detected at the end; its chunks are all indexed already, so
+        nothing is embedded again.
+
+        Returns:
+            Optional[Dict[str, Any]]: The manifest update to commit, or None if the source failed.
+        """
+        entry = self.repository.get_source(source)
+        indexed_ids = set(entry["chunk_ids"]) if entry else set()
+        # Same digest as hash_text(*pages), computed incrementally
+        digest = hashlib.sha256()
+        chunk_ids: List[str] = []
+        chunk_count = new_count = page_count = 0
+        try:
+            while True:
+                try:
+                    window = list(itertools.islice(pages, self.page_window))
+                except Exception as e:
+                    logging.error(f"Loading {source} failed: {e}")
+                    failed_sources[source] = str(e)
+                    return None
+                if not window:
+                    break
+                self._progress("fetch")
+                for page in window:
+                    if page_count:
+                        digest.update(b"\x1f")
+                    digest.update(page.page_content.encode("utf-8"))
+                    page_count += 1
+
+                started = time.perf_counter()
+                try:
+                    chunks = self.splitter.split(window)
+                    new_chunks, window_ids, _ = self.repository.plan_source_update(source, chunks)
+                except Exception as e:
+                    logging.error(f"Splitting failed for {source}: {e}")
+                    failed_sources[source] = str(e)
+                    self._stats["split"].record(0, time.perf_counter() - started, failed=True)
+                    self._progress("split")
+                    return None
+                self._stats["split"].record(len(chunks), time.perf_counter() - started)
+                self._progress("split")
+
+                chunk_ids.extend(window_ids)
+                chunk_count += len(chunks)
+                new_count += len(new_chunks)
+                enqueue(source, new_chunks)
+        finally:
+            close = getattr(pages, "close", None)
+            if close is not None:
+                # Stops the loader (and its pending extraction tasks) if the source failed early
+                close()
+
+        chunk_ids = list(dict.fromkeys(chunk_ids))
+        stale_ids = sorted(indexed_ids - set(chunk_ids))
+        logging.info(
+            f"{source}: {page_count} pages, {chunk_count} chunks, {new_count} to embed, {len(stale_ids)} stale."
+        )
+        return {
+            "chunk_ids": chunk_ids,
+            "stale_ids": stale_ids,
+            "validator": validator,
+            "content_hash": digest.hexdigest(),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns per-stage counters and throughput for the current (or last) run.
+        """
+        elapsed = time.perf_counter() - self._start
+        report = {stage: stats.to_dict(elapsed) for stage, stats in self._stats.items()}
+        report["skipped_sources"] = len(self._skipped)
+        report["elapsed_seconds"] = round(elapsed, 3)
+        return report
+
+    def _is_unchanged(self, source: str, validator: Optional[str]) -> bool:
+        """
+        Tells whether a source can be skipped without loading it.
+        """
+        if not validator:
+            return False
+        entry = self.repository.get_source(source)
+        return entry is not None and entry["validator"] == validator
+
+    def _fetch_urls(self, urls: List[str], failed_sources: Dict[str, str]) -> Iterator[FetchedSource]:
+        """
+        Fetches URLs concurrently and yields (url, documents, validator) as each one completes.
+        URLs whose ETag or Last-Modified did not change are skipped without being downloaded.
+        """
+        loader = URLLoader(urls)
+        host_limits: Dict[str, threading.BoundedSemaphore] = {}
+        for url in urls:
+            host_limits.setdefault(urlparse(url).netloc, threading.BoundedSemaphore(self.fetch_per_host))
+
+        def fetch_one(url: str) -> Tuple[Optional[List[Document]], Optional[str]]:
+            with host_limits[urlparse(url).netloc]:
+                started = time.perf_counter()
+                validator = loader.fetch_validator(url)
+                if self._is_unchanged(url, validator):
+                    return None, validator
+                try:
+                    docs = loader.load_url(url)
+                except Exception:
+                    self._stats["fetch"].record(0, time.perf_counter() - started, failed=True)
+                    raise
+                self._stats["fetch"].record(len(docs), time.perf_counter() - started)
+                return docs, validator
+
+        with ThreadPoolExecutor(max_workers=self.fetch_workers) as fetch_pool:
+            futures = {fetch_pool.submit(fetch_one, url): url for url in urls}
+            for future in as_completed(futures):
+                url = futures[future]
+                try:
+                    docs, validator = future.result()
+                except Exception as e:
+                    logging.error(f"Fetching {url} failed: {e}")
+                    failed_sources[url] = str(e)
+                    self._progress("fetch")
+                    continue
+                if docs is None:
+                    logging.info(f"{url} is unchanged, skipping.")
+                    self._skipped.append(url)
+                    continue
+                self._progress("fetch")
+                if docs:
+                    yield url, docs, validator
+
+    def _load_file(
+        self, file_path: str, source_type: str, failed_sources: Dict[str, str], source: str
+    ) -> Iterator[FetchedSource]:
+        """
+        Yields (source, lazily loaded pages, validator) for a local file, unless its mtime and size did not change.
+        """
+        try:
+            stat = os.stat(file_path)
+        except OSError as e:
+            failed_sources[source] = str(e)
+            return
+
+        validator = f"mtime:{stat.st_mtime_ns}:{stat.st_size}"
+        if self._is_unchanged(source, validator):
+            logging.info(f"{source} is unchanged, skipping.")
+            self._skipped.append(source)
+            return
+
+        try:
+            loader = LoaderFactory.create_loader(source_type, file_path=file_path)
+        except Exception as e:
+            logging.error(f"Loading {source} failed: {e}")
+            failed_sources[source] = str(e)
+            self._stats["fetch"].record(0, 0.0, failed=True)
+            self._progress("fetch")
+            return
+        # Chunk IDs hash the "source" metadata: it must not be the temporary path of an upload
+        yield source, self._timed_pages(loader.lazy_load(), source), validator
+
+    def _timed_pages(self, pages: Iterator[Document], source: str) -> Iterator[Document]:
+        """
+        Passes through the pages of a lazy loader, recording the time spent extracting each one
+        and labelling them with their source.
+        """
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    page = next(pages)
+                except StopIteration:
+                    return
+                except Exception:
+                    self._stats["fetch"].record(0, time.perf_counter() - started, failed=True)
+                    raise
+                self._stats["fetch"].record(1, time.perf_counter() - started)
+                page.metadata["source"] = source
+                yield page
+        finally:
+            close = getattr(pages, "close", None)
+            if close is not None:
+                close()
+
+    def _embed_and_upsert(self, batch: List[Tuple[str, Document]]) -> Tuple[List[str], List[str], Optional[str]]:
+        """
+        Embeds one batch of chunks and upserts it into the vector store.
+
+        Returns:
+            Tuple: The stored IDs, the sources present in the batch and an error message (None on success).
+        """
+        sources = list(dict.fromkeys(source for source, _ in batch))
+        documents = [doc for _, doc in batch]
+        if self.before_embed is not None:
+            self.before_embed()
+
+        started = time.perf_counter()
+        try:
+            vectors = self.repository.embeddings.embed_documents([doc.page_content for doc in documents])
+        except Exception as e:
+            logging.error(f"Embedding a batch of {len(documents)} chunks failed: {e}")
+            self._stats["embed"].record(0, time.perf_counter() - started, failed=True)
+            self._progress("embed")
+            return [], sources, str(e)
+        self._stats["embed"].record(len(documents), time.perf_counter() - started)
+        self._progress("embed")
+
+        started = time.perf_counter()
+        try:
+            # Writes are serialized: Chroma's local client does not benefit from concurrent upserts
+            with self._upsert_lock:
+                ids = self.repository.add_embedded(documents, vectors)
+            if ids is None:
+                raise ValueError("vector store rejected the batch")
+        except Exception as e:
+            logging.error(f"Upserting a batch of {len(documents)} chunks failed: {e}")
+            self._stats["upsert"].record(0, time.perf_counter() - started, failed=True)
+            self._progress("upsert")
+            return [], sources, str(e)
+        self._stats["upsert"].record(len(ids), time.perf_counter() - started)
+        self._progress("upsert")
+        return ids, sources, None
+
+    def _progress(self, stage: str) -> None:
+        stats = self._stats[stage].to_dict(time.perf_counter() - self._start)
+        if self.on_progress is not None:
+            self.on_progress(stage, stats)
+        else:
+            logging.info(f"Ingestion {stage}: {stats}")
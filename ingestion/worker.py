@@ -0,0 +1,252 @@
+"""
+worker.py
+---------
+Worker processes running the background ingestion jobs of `JobQueue`.
+
+Each worker claims one job at a time and runs it through the
+`IngestionPipeline`, storing the per-stage stats as progress while it runs
+(see `GET /jobs/{id}`). The API runs `JOB_WORKERS` of them as threads of
+its own process, sharing its repository: embedded Chroma supports a single
+process, so workers must not open the store elsewhere. With the NumPy store,
+which is safe across processes, `python cli.py run-workers` runs them as
+separate processes instead.
+
+Uploaded files are only kept until their job is over: the worker that
+finishes a job removes its upload directory, whether the job succeeded or
+failed. A job requeued after a worker died still finds its file.
+
+Ingestion and `/ask` share one Ollama instance. While the API served
+queries in the last `JOB_QUERY_WINDOW` seconds, workers pause
+`JOB_YIELD_SECONDS` before each embedding batch, so queries get the model
+between batches instead of queuing behind a large source.
+"""
+
+import logging
+import multiprocessing
+import os
+import shutil
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from ingestion.job_queue import JobQueue
+from app.config import (
+    JOB_QUEUE_PATH,
+    JOB_POLL_SECONDS,
+    JOB_HEARTBEAT_SECONDS,
+    JOB_MAX_ATTEMPTS,
+    JOB_QUERY_WINDOW,
+    JOB_YIELD_SECONDS,
+)
+
+# Missed heartbeats after which a running job is considered abandoned
+STALE_HEARTBEATS = 6
+
+
+def run_job(queue: JobQueue, job: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Runs one claimed job through the ingestion pipeline, recording its progress.
+
+    Args:
+        queue (JobQueue): The job queue (for heartbeats and progress).
+        job (Dict[str, Any]): The claimed job. "urls" jobs take {"urls"}, "file" jobs
+            take {"path", "source_type"} and optionally {"name"}, the original file name used as
+            the source of its chunks, and {"upload_dir"}, removed once the job is over.
+
+    Returns:
+        Dict[str, Any]: {"document_ids", "failed_sources", "skipped_sources", "stats"}.
+
+    Raises:
+        ValueError: If the job type is unknown.
+    """
+    from app.resources import get_article_repository, get_splitter
+    from ingestion.pipeline import IngestionPipeline
+
+    progress: Dict[str, Any] = {}
+    last_saved = 0.0
+    lock = threading.Lock()
+
+    def on_progress(stage: str, stats: Dict[str, Any]) -> None:
+        nonlocal last_saved
+        with lock:
+            progress[stage] = stats
+            if time.monotonic() - last_saved < 0.5:
+                return
+            last_saved = time.monotonic()
+            snapshot = dict(progress)
+        queue.heartbeat(job["id"], job["worker"], snapshot)
+
+    def yield_to_queries() -> None:
+        if JOB_YIELD_SECONDS > 0 and queue.query_active(JOB_QUERY_WINDOW):
+            time.sleep(JOB_YIELD_SECONDS)
+
+    pipeline = IngestionPipeline(
+        get_article_repository(), get_splitter(), on_progress=on_progress, before_embed=yield_to_queries
+    )
+    payload = job["payload"]
+    if job["kind"] == "urls":
+        result = pipeline.ingest_urls(payload["urls"])
+    elif job["kind"] == "file":
+        result = pipeline.ingest_file(payload["path"], payload.get("source_type", "pdf"), source=payload.get("name"))
+    else:
+        raise ValueError(f"Unknown job type: {job['kind']}")
+    queue.heartbeat(job["id"], job["worker"], pipeline.stats())
+    return result
+
+
+def _remove_upload(payload: Dict[str, Any]) -> None:
+    """
+    Deletes the upload directory of a finished "file" job, if any.
+    """
+    directory = payload.get("upload_dir")
+    if directory:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def _heartbeat_loop(queue: JobQueue, job_id: str, worker_id: str, done: threading.Event) -> None:
+    # Keeps the job alive during long steps that report no progress (large page extractions)
+    while not done.wait(JOB_HEARTBEAT_SECONDS):
+        try:
+            queue.heartbeat(job_id, worker_id)
+        except Exception as e:
+            logging.warning(f"Heartbeat of job {job_id} failed: {e}")
+
+
+def work(
+    worker_id: str,
+    stop: Optional[Any] = None,
+    queue_path: str = JOB_QUEUE_PATH,
+    parent_pid: Optional[int] = None,
+) -> None:
+    """
+    Claims and runs jobs until `stop` is set.
+
+    Args:
+        worker_id (str): Identifier recorded on the claimed jobs.
+        stop (Optional[Event], optional): Stops the loop once set (runs forever without).
+        queue_path (str, optional): Path of the job database.
+        parent_pid (Optional[int], optional): Also stops once this parent process is gone.
+    """
+    queue = JobQueue(queue_path, max_attempts=JOB_MAX_ATTEMPTS)
+    stop = stop or threading.Event()
+    logging.info(f"Ingestion worker {worker_id} started.")
+    while not stop.is_set():
+        if parent_pid is not None and os.getppid() != parent_pid:
+            logging.warning(f"Worker {worker_id}: parent process exited.")
+            break
+        try:
+            queue.requeue_stale(JOB_HEARTBEAT_SECONDS * STALE_HEARTBEATS)
+            job = queue.claim(worker_id)
+        except Exception as e:
+            logging.error(f"Worker {worker_id} could not read the job queue: {e}")
+            job = None
+        if job is None:
+            stop.wait(JOB_POLL_SECONDS)
+            continue
+
+        logging.info(f"Worker {worker_id} running job {job['id']} ({job['kind']}, attempt {job['attempts']}).")
+        done = threading.Event()
+        threading.Thread(target=_heartbeat_loop, args=(queue, job["id"], worker_id, done), daemon=True).start()
+        try:
+            result = run_job(queue, job)
+            failed = result["failed_sources"]
+            sources = job["payload"].get("urls") or [job["payload"].get("name") or job["payload"].get("path")]
+            error = None
+            if failed and set(failed) >= set(sources):
+                # The job fails only if every source failed; partial failures are reported in the result
+                error = "; ".join(f"{source}: {message}" for source, message in failed.items())
+            owned = queue.finish(job["id"], worker_id, result, error=error)
+        except Exception as e:
+            logging.error(f"Job {job['id']} failed: {e}")
+            owned = queue.finish(job["id"], worker_id, {}, error=str(e))
+        finally:
+            done.set()
+        if owned:
+            _remove_upload(job["payload"])
+        else:
+            # The worker that took the job over still needs its file
+            logging.warning(f"Worker {worker_id} lost job {job['id']} to another worker; its result was discarded.")
+    queue.close()
+    logging.info(f"Ingestion worker {worker_id} stopped.")
+
+
+def _worker_main(worker_id: str, stop, queue_path: str, parent_pid: int) -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    try:
+        work(worker_id, stop, queue_path, parent_pid)
+    except KeyboardInterrupt:
+        pass
+
+
+def start_worker_threads(count: int, queue_path: str = JOB_QUEUE_PATH) -> List[threading.Thread]:
+    """
+    Starts ingestion workers as threads of the current process, sharing its repository.
+
+    Args:
+        count (int): Number of threads.
+        queue_path (str, optional): Path of the job database.
+
+    Returns:
+        List[Thread]: The started threads (see `stop_workers`). Each carries its stop event as `stop_event`.
+    """
+    threads = []
+    for index in range(count):
+        stop = threading.Event()
+        thread = threading.Thread(
+            target=work,
+            args=(f"{os.getpid()}-thread-{index}", stop, queue_path),
+            name=f"ingestion-worker-{index}",
+            daemon=True,
+        )
+        thread.start()
+        thread.stop_event = stop
+        threads.append(thread)
+    return threads
+
+
+def start_workers(count: int, queue_path: str = JOB_QUEUE_PATH) -> List[multiprocessing.Process]:
+    """
+    Starts ingestion worker processes.
+
+    Args:
+        count (int): Number of processes.
+        queue_path (str, optional): Path of the job database.
+
+    Returns:
+        List[Process]: The started processes (see `stop_workers`). Each carries its stop event as `stop_event`.
+    """
+    # "spawn" avoids forking a process that runs threads (API server, client pools)
+    context = multiprocessing.get_context("spawn")
+    processes = []
+    for index in range(count):
+        stop = context.Event()
+        process = context.Process(
+            target=_worker_main,
+            args=(f"{os.getpid()}-{index}", stop, queue_path, os.getpid()),
+            name=f"ingestion-worker-{index}",
+            # Not a daemon: daemonic processes cannot start the PDF extraction pool
+        )
+        process.start()
+        process.stop_event = stop
+        processes.append(process)
+    return processes
+
+
+def stop_workers(processes: List[Any], timeout: float = 5.0) -> None:
+    """
+    Stops worker processes or threads, letting them finish their current step for up to `timeout` seconds.
+
+    Processes still running are terminated; threads (daemons) are left to end with the process.
+    A job interrupted by the stop is requeued once its heartbeats stop.
+    """
+    for process in processes:
+        process.stop_event.set()
+    deadline = time.monotonic() + timeout
+    for process in processes:
+        process.join(max(0.0, deadline - time.monotonic()))
+        if not process.is_alive():
+            continue
+        if isinstance(process, threading.Thread):
+            logging.warning(f"Ingestion worker {process.name} still running its job at shutdown.")
+        else:
+            process.terminate()
+            process.join()
@@ -1,8 +1,25 @@
-from typing import List, Optional
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
 from langchain.schema import Document
 from repository.base_repository import BaseRepository
+from repository.source_manifest import SourceManifest
+from utils.id_utils import generate_chunk_ids
+from utils.tracing import span
 from store.chroma_db_store import ChromaDBStore
+from store.numpy_store import NumpyStore
+from store.lexical_index import LexicalIndex, reciprocal_rank_fusion
 from langchain_ollama import OllamaEmbeddings
+from generation.grading_cache import invalidate_chunks
+from app.config import (
+    RETRIEVAL_MODE,
+    LEXICAL_INDEX_ENABLED,
+    HYBRID_CANDIDATES,
+    HYBRID_RRF_K,
+    VECTOR_STORE_BACKEND,
+)
 
 
 class ArticleRepository(BaseRepository):
@@ -10,18 +27,22 @@ class ArticleRepository(BaseRepository):
     Repository class for managing articles in a vector store.
 
     This class provides methods to add, retrieve, update, and delete articles
-    stored in a ChromaDB vector database.
+    stored in a ChromaDB vector database, or in the memory-mapped NumPy store
+    when `VECTOR_STORE_BACKEND=numpy`.
 
     Attributes:
         embeddings (OllamaEmbeddings): Embedding model used for vector storage.
         collection_name (str): Name of the collection in ChromaDB.
         vector_store: Vector database instance.
         store_instance: Store instance handling vector operations.
+        version_path (str): File stamped on every corpus change, shared across processes.
+        manifest (SourceManifest): Per-source record of indexed chunks, used for incremental re-indexing.
+        lexical_index (Optional[LexicalIndex]): BM25 index kept in sync with the store, used by hybrid retrieval.
     """
 
     def __init__(self, embeddings: Optional[OllamaEmbeddings] = None, persist_directory: str = "./chroma_langchain_db"):
         """
-        Initializes the ArticleRepository with an embedding model and a ChromaDB store.
+        Initializes the ArticleRepository with an embedding model and a vector store (ChromaDB by default).
 
         Args:
             embeddings (Optional[OllamaEmbeddings], optional): Embedding model. Defaults to "all-minilm" if not provided.
@@ -30,13 +51,49 @@ class ArticleRepository(BaseRepository):
         self.embeddings = embeddings if embeddings else OllamaEmbeddings(model="all-minilm")
         self.collection_name = "articles"
 
-        chroma_store = ChromaDBStore(
-            collection_name=self.collection_name,
-            embeddings=self.embeddings,
-            persist_directory=persist_directory,
-        )
-        self.vector_store = chroma_store.get_vector_store()
-        self.store_instance = chroma_store
+        if VECTOR_STORE_BACKEND == "numpy":
+            store = NumpyStore(
+                embeddings=self.embeddings,
+                path=os.path.join(persist_directory, "numpy_store", self.collection_name),
+            )
+        else:
+            store = ChromaDBStore(
+                collection_name=self.collection_name,
+                embeddings=self.embeddings,
+                persist_directory=persist_directory,
+            )
+        self.vector_store = store.get_vector_store()
+        self.store_instance = store
+        self.version_path = os.path.join(persist_directory, ".corpus_version")
+        self.manifest = SourceManifest(os.path.join(persist_directory, "sources.sqlite3"))
+        self.lexical_index = None
+        if LEXICAL_INDEX_ENABLED or RETRIEVAL_MODE == "hybrid":
+            self.lexical_index = LexicalIndex(os.path.join(persist_directory, "lexical.sqlite3"))
+
+    def corpus_version(self) -> str:
+        """
+        Returns a token that changes every time documents are added or deleted,
+        from this process or any other process sharing the persist directory.
+
+        Returns:
+            str: The current corpus version ("" if the corpus was never modified).
+        """
+        try:
+            with open(self.version_path, "r") as f:
+                return f.read().strip()
+        except OSError:
+            return ""
+
+    def _bump_corpus_version(self) -> None:
+        """
+        Stamps a new corpus version so that answer caches built on the old corpus are dropped.
+        """
+        try:
+            os.makedirs(os.path.dirname(self.version_path) or ".", exist_ok=True)
+            with open(self.version_path, "w") as f:
+                f.write(str(time.time_ns()))
+        except OSError as e:
+            logging.warning(f"Could not update corpus version: {e}")
 
     def add(self, documents: List[Document]) -> List[str]:
         """
@@ -48,7 +105,38 @@ class ArticleRepository(BaseRepository):
         Returns:
             List[str]: List of document IDs that were successfully added.
         """
-        return self.store_instance.add_documents(documents)
+        # Re-indexed chunks must be graded again
+        invalidate_chunks(doc.page_content for doc in documents)
+        ids = self.store_instance.add_documents(documents)
+        if ids is not None:
+            self._index_lexical(documents)
+        self._bump_corpus_version()
+        return ids
+
+    def add_embedded(self, documents: List[Document], vectors: List[List[float]]) -> List[str]:
+        """
+        Adds documents whose embeddings were computed by the caller (e.g. the ingestion pipeline).
+
+        Args:
+            documents (List[Document]): A list of LangChain Document objects to store.
+            vectors (List[List[float]]): One embedding per document, from `self.embeddings`.
+
+        Returns:
+            List[str]: List of document IDs that were successfully added.
+        """
+        invalidate_chunks(doc.page_content for doc in documents)
+        ids = self.store_instance.add_embedded_documents(documents, vectors)
+        if ids is not None:
+            self._index_lexical(documents)
+        self._bump_corpus_version()
+        return ids
+
+    async def aadd(self, documents: List[Document]) -> List[str]:
+        """
+        Async version of `add`. Chroma and the embedding client are synchronous,
+        so the work is offloaded to a worker thread.
+        """
+        return await asyncio.to_thread(self.add, documents)
 
     def delete(self, ids: List[str]) -> None:
         """
@@ -57,26 +145,244 @@ class ArticleRepository(BaseRepository):
         Args:
             ids (List[str]): List of document IDs to delete.
         """
-        pass
+        if not ids:
+            return
+        deleted = self.store_instance.get_documents(ids)
+        self.store_instance.delete_documents(ids)
+        if self.lexical_index is not None:
+            self.lexical_index.delete(ids)
+        invalidate_chunks(doc.page_content for doc in deleted)
+        self._bump_corpus_version()
+
+    def _index_lexical(self, documents: List[Document]) -> None:
+        """
+        Adds stored documents to the lexical index (no-op when it is disabled).
+        """
+        if self.lexical_index is not None:
+            self.lexical_index.add(generate_chunk_ids(documents), [doc.page_content for doc in documents])
 
-    def update(self, ids: List[str]) -> None:
+    def rebuild_lexical_index(self, batch_size: int = 500) -> int:
+        """
+        Rebuilds the lexical index from the documents in the vector store,
+        e.g. for a corpus indexed before hybrid retrieval was enabled.
+
+        Args:
+            batch_size (int, optional): Number of documents read from the store at once. Defaults to 500.
+
+        Returns:
+            int: Number of indexed documents.
+        """
+        if self.lexical_index is None:
+            self.lexical_index = LexicalIndex(os.path.join(os.path.dirname(self.version_path), "lexical.sqlite3"))
+
+        self.lexical_index.clear()
+        ids = self.store_instance.list_ids()
+        indexed = 0
+        for start in range(0, len(ids), batch_size):
+            documents = self.store_instance.get_documents(ids[start:start + batch_size])
+            indexed += self.lexical_index.add([doc.id for doc in documents], [doc.page_content for doc in documents])
+        return indexed
+
+    def update(self, ids: List[str], documents: Optional[List[Document]] = None) -> List[str]:
         """
         Updates documents in the vector store.
 
+        With `documents`, the chunks identified by `ids` are replaced by the new
+        documents (chunk IDs are content-addressed, so new content gets new IDs).
+        Without, the stored chunks are re-embedded in place, e.g. after a change
+        of embedding model.
+
         Args:
             ids (List[str]): List of document IDs to update.
+            documents (Optional[List[Document]], optional): Replacement documents.
+
+        Returns:
+            List[str]: IDs of the documents now stored.
+        """
+        if documents is None:
+            documents = self.store_instance.get_documents(ids)
+            if not documents:
+                return []
+            return self.add_embedded(documents, self.embeddings.embed_documents([d.page_content for d in documents]))
+
+        new_ids = self.add(documents) or []
+        kept = set(new_ids)
+        self.delete([doc_id for doc_id in ids if doc_id not in kept])
+        return new_ids
+
+    def get_source(self, source: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns the manifest entry of an indexed source (validator, content hash, chunk IDs).
+
+        Args:
+            source (str): The source URL or file path.
+
+        Returns:
+            Optional[Dict[str, Any]]: The manifest entry, or None if the source was never indexed.
+        """
+        return self.manifest.get(source)
+
+    def plan_source_update(self, source: str, chunks: List[Document]) -> Tuple[List[Document], List[str], List[str]]:
+        """
+        Compares freshly split chunks of a source with what is already indexed.
+
+        Args:
+            source (str): The source URL or file path.
+            chunks (List[Document]): All chunks of the current version of the source.
+
+        Returns:
+            Tuple[List[Document], List[str], List[str]]: The chunks that still need to be
+            embedded, the IDs of every current chunk and the IDs of stale chunks to delete.
         """
-        pass
+        for chunk in chunks:
+            chunk.metadata.setdefault("source", source)
 
-    def retrieve(self, query: str, count: int = 4) -> List[Document]:
+        chunk_ids = generate_chunk_ids(chunks)
+        entry = self.manifest.get(source)
+        indexed_ids = set(entry["chunk_ids"]) if entry else set()
+
+        new_chunks = [chunk for chunk, chunk_id in zip(chunks, chunk_ids) if chunk_id not in indexed_ids]
+        current_ids = list(dict.fromkeys(chunk_ids))
+        stale_ids = sorted(indexed_ids - set(current_ids))
+        return new_chunks, current_ids, stale_ids
+
+    def commit_source(
+        self,
+        source: str,
+        chunk_ids: List[str],
+        stale_ids: List[str],
+        validator: Optional[str] = None,
+        content_hash: Optional[str] = None,
+    ) -> None:
+        """
+        Deletes the stale chunks of a source and records its new manifest entry.
+        Called once every new chunk of the source has been stored.
+
+        Args:
+            source (str): The source URL or file path.
+            chunk_ids (List[str]): IDs of every current chunk of the source.
+            stale_ids (List[str]): IDs of chunks that no longer exist in the source.
+            validator (Optional[str], optional): ETag, Last-Modified or mtime of the source.
+            content_hash (Optional[str], optional): Hash of the loaded content.
+        """
+        self.delete(stale_ids)
+        self.manifest.save(source, chunk_ids, validator=validator, content_hash=content_hash)
+
+    def delete_source(self, source: str) -> None:
+        """
+        Deletes every chunk of a source and forgets it.
+
+        Args:
+            source (str): The source URL or file path.
+        """
+        entry = self.manifest.get(source)
+        if entry:
+            self.delete(entry["chunk_ids"])
+        self.manifest.delete(source)
+
+    def embed_query(self, query: str) -> List[float]:
+        """
+        Embeds a query with the repository's embedding model (cached).
+
+        Args:
+            query (str): The query text.
+
+        Returns:
+            List[float]: The query embedding.
+        """
+        return self.store_instance.embed_query(query)
+
+    async def aembed_query(self, query: str) -> List[float]:
+        """
+        Async version of `embed_query`, offloaded to a worker thread.
+        """
+        return await asyncio.to_thread(self.embed_query, query)
+
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """
+        Embeds several queries in one call to the embedding model (cached).
+
+        Args:
+            queries (List[str]): The query texts.
+
+        Returns:
+            List[List[float]]: One embedding per query, in order.
+        """
+        return self.store_instance.embed_queries(queries)
+
+    def retrieve(self, query: str, count: int = 4, embedding: Optional[List[float]] = None) -> List[Document]:
         """
         Retrieves the most relevant documents based on similarity search.
 
+        With `RETRIEVAL_MODE=hybrid`, the dense ranking is fused with a BM25
+        ranking from the lexical index (reciprocal rank fusion).
+
         Args:
             query (str): The query text for document retrieval.
             count (int, optional): Number of documents to retrieve. Defaults to 4.
+            embedding (Optional[List[float]], optional): Precomputed query embedding, skips re-embedding.
 
         Returns:
             List[Document]: A list of retrieved documents.
         """
+        if RETRIEVAL_MODE == "hybrid" and self.lexical_index is not None:
+            return self._hybrid_retrieve(query, count, embedding)
+        return self._dense_retrieve(query, count, embedding)
+
+    def _dense_retrieve(self, query: str, count: int, embedding: Optional[List[float]] = None) -> List[Document]:
+        """
+        Retrieves documents by vector similarity only.
+        """
+        if embedding is not None:
+            return self.store_instance.similarity_search_by_embedding(embedding, count)
         return self.store_instance.similarity_search_by_vector(query, count)
+
+    def _hybrid_retrieve(self, query: str, count: int, embedding: Optional[List[float]] = None) -> List[Document]:
+        """
+        Retrieves documents by fusing the dense and BM25 rankings.
+        """
+        candidates = max(count, HYBRID_CANDIDATES)
+        with span("lexical_search"):
+            lexical_ids = [doc_id for doc_id, _ in self.lexical_index.search(query, candidates)]
+        dense = self._dense_retrieve(query, candidates, embedding)
+
+        # Chunk IDs are content-addressed, so they can be recomputed if the store did not return them
+        dense_ids = [doc.id or chunk_id for doc, chunk_id in zip(dense, generate_chunk_ids(dense))]
+        documents = dict(zip(dense_ids, dense))
+        fused = reciprocal_rank_fusion([list(documents), lexical_ids], k=HYBRID_RRF_K)[:count]
+
+        # Lexical-only hits are not in the dense results yet
+        missing = [doc_id for doc_id in fused if doc_id not in documents]
+        for doc in self.store_instance.get_documents(missing):
+            documents[doc.id] = doc
+        return [documents[doc_id] for doc_id in fused if doc_id in documents]
+
+    async def aretrieve(self, query: str, count: int = 4, embedding: Optional[List[float]] = None) -> List[Document]:
+        """
+        Async version of `retrieve`, offloaded to a worker thread.
+        """
+        return await asyncio.to_thread(self.retrieve, query, count, embedding)
+
+    def retrieve_many(
+        self, queries: List[str], count: int = 4, embeddings: Optional[List[List[float]]] = None
+    ) -> List[List[Document]]:
+        """
+        Retrieves the most relevant documents of several queries at once.
+
+        In dense mode the queries are embedded together and sent to the vector
+        store as one grouped search; in hybrid mode each query is fused with its
+        own BM25 ranking (the embeddings are still computed in one call).
+
+        Args:
+            queries (List[str]): The query texts.
+            count (int, optional): Number of documents to retrieve per query. Defaults to 4.
+            embeddings (Optional[List[List[float]]], optional): Precomputed query embeddings, aligned with `queries`.
+
+        Returns:
+            List[List[Document]]: The retrieved documents of each query, in order.
+        """
+        if embeddings is None:
+            embeddings = self.embed_queries(queries)
+        if RETRIEVAL_MODE == "hybrid" and self.lexical_index is not None:
+            return [self._hybrid_retrieve(query, count, vector) for query, vector in zip(queries, embeddings)]
+        return self.store_instance.similarity_search_by_embeddings(embeddings, count)
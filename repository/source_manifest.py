@@ -0,0 +1,103 @@
+"""
+source_manifest.py
+------------------
+Per-source manifest of indexed content.
+
+For every indexed source (URL or file path), records a validator (ETag,
+Last-Modified or file mtime), a hash of the loaded content and the IDs of
+the chunks stored for it. The ingestion pipeline uses it to skip unchanged
+sources, embed only new chunks and delete stale ones.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+
+class SourceManifest:
+    """
+    SQLite-backed manifest of indexed sources.
+
+    Attributes:
+        path (str): Path of the SQLite database file.
+    """
+
+    def __init__(self, path: str):
+        """
+        Opens (and creates if needed) the manifest database.
+
+        Args:
+            path (str): Path of the SQLite database file.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS sources ("
+                "source TEXT PRIMARY KEY, validator TEXT, content_hash TEXT, "
+                "chunk_ids TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+
+    def get(self, source: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns the manifest entry of a source.
+
+        Args:
+            source (str): The source URL or file path.
+
+        Returns:
+            Optional[Dict[str, Any]]: {"validator", "content_hash", "chunk_ids", "updated_at"}, or None if unknown.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT validator, content_hash, chunk_ids, updated_at FROM sources WHERE source = ?", (source,)
+            ).fetchone()
+        if row is None:
+            return None
+        validator, content_hash, chunk_ids, updated_at = row
+        return {
+            "validator": validator,
+            "content_hash": content_hash,
+            "chunk_ids": json.loads(chunk_ids),
+            "updated_at": updated_at,
+        }
+
+    def save(self, source: str, chunk_ids: List[str], validator: Optional[str] = None, content_hash: Optional[str] = None) -> None:
+        """
+        Records (or replaces) the manifest entry of a source.
+
+        Args:
+            source (str): The source URL or file path.
+            chunk_ids (List[str]): IDs of every chunk stored for the source.
+            validator (Optional[str], optional): ETag, Last-Modified or mtime of the source.
+            content_hash (Optional[str], optional): Hash of the loaded content.
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sources (source, validator, content_hash, chunk_ids, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (source, validator, content_hash, json.dumps(chunk_ids), time.time()),
+            )
+
+    def delete(self, source: str) -> None:
+        """
+        Removes the manifest entry of a source.
+        """
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM sources WHERE source = ?", (source,))
+
+    def sources(self) -> List[str]:
+        """
+        Returns every source recorded in the manifest.
+        """
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT source FROM sources ORDER BY source")]
@@ -1,5 +1,6 @@
+import asyncio
 from abc import ABC, abstractmethod
-from typing import List
+from typing import Iterator, List
 from langchain.schema import Document
 
 class BaseLoader(ABC):
@@ -12,3 +13,19 @@ class BaseLoader(ABC):
     @abstractmethod
     def load(self) -> List[Document]:
         pass
+
+    def lazy_load(self) -> Iterator[Document]:
+        """
+        Yields the documents one at a time. Loaders that can produce documents
+        incrementally (e.g. PDF pages) override it to bound memory; by default
+        everything is loaded first.
+        """
+        yield from self.load()
+
+    async def aload(self) -> List[Document]:
+        """
+        Async version of `load`. Loaders are synchronous by default, so the
+        work is offloaded to a worker thread; subclasses may override it with
+        a native async implementation.
+        """
+        return await asyncio.to_thread(self.load)
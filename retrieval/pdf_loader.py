@@ -1,19 +1,170 @@
+"""
+pdf_loader.py
+-------------
+Loads the text of a PDF file, one Document per page, with pypdf.
+
+Pages are extracted lazily (`lazy_load`), so a caller can split and embed
+the first pages while the next ones are still being read. Documents of at
+least `PDF_PARALLEL_MIN_PAGES` pages are extracted by a shared process pool,
+in ranges of `PDF_PAGES_PER_TASK` pages: text extraction is CPU-bound pure
+Python, so threads would not help. Only a few ranges are in flight at once
+and pages are yielded in order, which keeps memory bounded whatever the
+size of the document.
+"""
+
+import logging
+import multiprocessing
 import os
-from typing import List
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Deque, Iterator, List, Optional, Tuple
 from langchain.schema import Document
 from .base_loader import BaseLoader
+from app.config import PDF_EXTRACT_WORKERS, PDF_PARALLEL_MIN_PAGES, PDF_PAGES_PER_TASK
+
+# (page number, text, error message)
+ExtractedPage = Tuple[int, str, Optional[str]]
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+# Reader reused by the successive tasks of a worker process on the same file
+_reader_cache: Tuple[Optional[Tuple[str, int]], object] = (None, None)
+
+
+def _open(file_path: str):
+    """
+    Opens a PDF, reusing the reader of the previous call on the same unchanged file.
+    """
+    global _reader_cache
+    from pypdf import PdfReader
+
+    key = (os.path.abspath(file_path), os.stat(file_path).st_mtime_ns)
+    if _reader_cache[0] != key:
+        _reader_cache = (key, PdfReader(file_path))
+    return _reader_cache[1]
+
+
+def _extract_pages(file_path: str, start: int, stop: int) -> List[ExtractedPage]:
+    """
+    Extracts the text of pages [start, stop). Runs in a worker process.
+
+    A page that cannot be extracted gets an empty text and an error message,
+    so one broken page does not fail the whole document.
+    """
+    reader = _open(file_path)
+    pages = []
+    for number in range(start, stop):
+        try:
+            pages.append((number, reader.pages[number].extract_text() or "", None))
+        except Exception as e:
+            pages.append((number, "", str(e)))
+    return pages
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    Returns the process pool shared by every PDF loader, (re)created for the requested size.
+    """
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False, cancel_futures=True)
+            # "spawn" avoids forking a process that runs threads (API server, embedding pool)
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _pool_workers = workers
+        return _pool
+
 
 class PDFLoader(BaseLoader):
-    def __init__(self, file_path: str):
+    """
+    Loads a PDF file, one Document per page with text.
+
+    Attributes:
+        file_path (str): Path of the PDF file.
+        workers (int): Worker processes used for large documents (1 extracts in the calling process).
+        parallel_min_pages (int): Page count from which extraction uses the process pool.
+        pages_per_task (int): Pages extracted per process pool task.
+    """
+
+    def __init__(
+        self,
+        file_path: str,
+        workers: int = PDF_EXTRACT_WORKERS,
+        parallel_min_pages: int = PDF_PARALLEL_MIN_PAGES,
+        pages_per_task: int = PDF_PAGES_PER_TASK,
+    ):
+        """
+        Args:
+            file_path (str): Path of the PDF file.
+            workers (int, optional): Worker processes for large documents (0 uses every core).
+            parallel_min_pages (int, optional): Page count from which extraction uses the process pool.
+            pages_per_task (int, optional): Pages extracted per process pool task.
+
+        Raises:
+            FileNotFoundError: If the file does not exist.
+        """
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"PDF file not found: {file_path}")
         self.file_path = file_path
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+        self.parallel_min_pages = parallel_min_pages
+        self.pages_per_task = max(1, pages_per_task)
 
     def load(self) -> List[Document]:
-        # Ici on utiliserait un loader PDF (PyPDFLoader ou autre)
-        # from langchain.document_loaders import PyPDFLoader
-        # loader = PyPDFLoader(self.file_path)
-        # docs = loader.load()
-        # return docs
-        # Code d'exemple:
-        return []
+        """
+        Loads every page of the PDF.
+
+        Returns:
+            List[Document]: One Document per page with text.
+        """
+        return list(self.lazy_load())
+
+    def lazy_load(self) -> Iterator[Document]:
+        """
+        Extracts the pages of the PDF one at a time, in page order.
+
+        Yields:
+            Document: One Document per page with text, with "source", "page"
+            (0-based) and "total_pages" metadata.
+        """
+        total_pages = len(_open(self.file_path).pages)
+        if self.workers <= 1 or total_pages < self.parallel_min_pages:
+            for number in range(total_pages):
+                yield from self._documents(_extract_pages(self.file_path, number, number + 1), total_pages)
+            return
+
+        pool = _get_pool(self.workers)
+        ranges = iter(range(0, total_pages, self.pages_per_task))
+        in_flight: Deque[Future] = deque()
+
+        def submit_next() -> None:
+            start = next(ranges, None)
+            if start is not None:
+                in_flight.append(pool.submit(_extract_pages, self.file_path, start, min(start + self.pages_per_task, total_pages)))
+
+        try:
+            # Two ranges per worker keep every process busy without reading far ahead
+            for _ in range(self.workers * 2):
+                submit_next()
+            while in_flight:
+                pages = in_flight.popleft().result()
+                submit_next()
+                yield from self._documents(pages, total_pages)
+        finally:
+            # Stopped early (error downstream, closed generator): drop the ranges not started yet
+            for future in in_flight:
+                future.cancel()
+
+    def _documents(self, pages: List[ExtractedPage], total_pages: int) -> Iterator[Document]:
+        for number, text, error in pages:
+            if error:
+                logging.warning(f"{self.file_path}: text extraction failed on page {number + 1}: {error}")
+            if text.strip():
+                yield Document(
+                    page_content=text,
+                    metadata={"source": self.file_path, "page": number, "total_pages": total_pages},
+                )
@@ -1,5 +1,6 @@
 import logging
-from typing import List
+from typing import List, Optional
+import requests
 from langchain_community.document_loaders import WebBaseLoader
 from langchain.schema import Document
 from .base_loader import BaseLoader
@@ -43,3 +44,43 @@ class URLLoader(BaseLoader):
         except Exception as e:
             logging.error(f"Error loading documents from URLs: {e}")
             return []
+
+    def load_url(self, url: str) -> List[Document]:
+        """
+        Loads the documents of a single URL.
+
+        Unlike `load`, errors are raised to the caller, so that a pipeline
+        loading many URLs can record which ones failed.
+
+        Args:
+            url (str): The URL to fetch.
+
+        Returns:
+            List[Document]: The documents retrieved from the URL.
+        """
+        return WebBaseLoader(url).load()
+
+    @staticmethod
+    def fetch_validator(url: str, timeout: float = 10.0) -> Optional[str]:
+        """
+        Returns the HTTP cache validator of a URL (ETag, or Last-Modified) with a HEAD request.
+
+        Args:
+            url (str): The URL to check.
+            timeout (float, optional): Request timeout in seconds. Defaults to 10.
+
+        Returns:
+            Optional[str]: The validator, or None if the server provides none or the request fails.
+        """
+        try:
+            response = requests.head(url, allow_redirects=True, timeout=timeout)
+        except requests.RequestException as e:
+            logging.debug(f"HEAD request failed for {url}: {e}")
+            return None
+        if response.status_code >= 400:
+            return None
+        etag = response.headers.get("ETag")
+        if etag:
+            return f"etag:{etag}"
+        last_modified = response.headers.get("Last-Modified")
+        return f"last-modified:{last_modified}" if last_modified else None
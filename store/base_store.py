@@ -6,7 +6,7 @@ Each store implementation must handle document storage, retrieval, and similarit
 """
 
 from abc import ABC, abstractmethod
-from typing import List, Any
+from typing import List, Any, Tuple
 from langchain.schema import Document
 
 
@@ -23,12 +23,30 @@ class BaseStore(ABC):
         
         add_documents(documents: List[Document]) -> List[str]:
             Adds documents to the store and returns their unique IDs.
+
+        add_embedded_documents(documents: List[Document], embeddings: List[List[float]]) -> List[str]:
+            Adds documents with precomputed embeddings and returns their unique IDs.
+
+        get_documents(ids: List[str]) -> List[Document]:
+            Returns the stored documents matching the given IDs.
+
+        list_ids() -> List[str]:
+            Returns the IDs of every stored document.
+
+        delete_documents(ids: List[str]) -> None:
+            Deletes documents from the store by their IDs.
         
         similarity_search(query: str, count: int = 4) -> List[Document]:
             Performs a similarity search based on text queries.
         
         similarity_search_by_vector(query: str, count: int = 4) -> List[Document]:
             Performs a similarity search based on embeddings.
+
+        similarity_search_by_embedding(embedding: List[float], count: int = 4) -> List[Document]:
+            Performs a similarity search with a precomputed query embedding.
+
+        similarity_search_by_embedding_with_score(embedding: List[float], count: int = 4) -> List[Tuple[Document, float]]:
+            Same, also returning a relevance score between 0 and 1 for each document.
     """
 
     @abstractmethod
@@ -54,6 +72,50 @@ class BaseStore(ABC):
         """
         pass
 
+    @abstractmethod
+    def add_embedded_documents(self, documents: List[Document], embeddings: List[List[float]]) -> List[str]:
+        """
+        Adds a list of documents whose embeddings were already computed.
+
+        Args:
+            documents (List[Document]): A list of LangChain Document objects to be stored.
+            embeddings (List[List[float]]): One embedding per document.
+
+        Returns:
+            List[str]: A list of document IDs that were successfully added.
+        """
+        pass
+
+    @abstractmethod
+    def get_documents(self, ids: List[str]) -> List[Document]:
+        """
+        Returns the stored documents matching the given IDs.
+
+        Args:
+            ids (List[str]): Document IDs to fetch.
+
+        Returns:
+            List[Document]: The matching documents (unknown IDs are skipped).
+        """
+        pass
+
+    @abstractmethod
+    def list_ids(self) -> List[str]:
+        """
+        Returns the IDs of every stored document.
+        """
+        pass
+
+    @abstractmethod
+    def delete_documents(self, ids: List[str]) -> None:
+        """
+        Deletes documents from the vector store by their IDs.
+
+        Args:
+            ids (List[str]): Document IDs to delete.
+        """
+        pass
+
     @abstractmethod
     def similarity_search(self, query: str, count: int = 4) -> List[Document]:
         """
@@ -81,3 +143,45 @@ class BaseStore(ABC):
             List[Document]: A list of retrieved documents.
         """
         pass
+
+    @abstractmethod
+    def similarity_search_by_embedding(self, embedding: List[float], count: int = 4) -> List[Document]:
+        """
+        Performs a similarity search using a precomputed query embedding.
+
+        Args:
+            embedding (List[float]): The query embedding.
+            count (int, optional): Number of documents to retrieve. Defaults to 4.
+
+        Returns:
+            List[Document]: A list of retrieved documents.
+        """
+        pass
+
+    @abstractmethod
+    def similarity_search_by_embedding_with_score(self, embedding: List[float], count: int = 4) -> List[Tuple[Document, float]]:
+        """
+        Performs a similarity search using a precomputed query embedding, with relevance scores.
+
+        Args:
+            embedding (List[float]): The query embedding.
+            count (int, optional): Number of documents to retrieve. Defaults to 4.
+
+        Returns:
+            List[Tuple[Document, float]]: Documents with a relevance score between 0 and 1 (higher is more similar).
+        """
+        pass
+
+    @abstractmethod
+    def similarity_search_by_embeddings(self, embeddings: List[List[float]], count: int = 4) -> List[List[Document]]:
+        """
+        Performs one grouped similarity search for several query embeddings.
+
+        Args:
+            embeddings (List[List[float]]): The query embeddings.
+            count (int, optional): Number of documents to retrieve per query. Defaults to 4.
+
+        Returns:
+            List[List[Document]]: The retrieved documents of each query, in order.
+        """
+        pass
@@ -1,9 +1,12 @@
 import logging
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from langchain.schema import Document
 from store.base_store import BaseStore
 from langchain_chroma import Chroma
-from utils.id_utils import generate_list_ids
+from utils.id_utils import generate_chunk_ids
+from store.embedding_cache import cached_embed_query, cached_embed_queries
+from utils.tracing import span
+from app.config import CHROMA_HNSW_SEARCH_EF, CHROMA_HNSW_CONSTRUCTION_EF, CHROMA_HNSW_M
 
 
 class ChromaDBStore(BaseStore):
@@ -30,11 +33,42 @@ class ChromaDBStore(BaseStore):
         self.embeddings = embeddings
         self.persist_directory = persist_directory
 
+        # HNSW build parameters only apply when the collection is created
+        hnsw_settings = {
+            key: value
+            for key, value in (
+                ("hnsw:M", CHROMA_HNSW_M),
+                ("hnsw:construction_ef", CHROMA_HNSW_CONSTRUCTION_EF),
+                ("hnsw:search_ef", CHROMA_HNSW_SEARCH_EF),
+            )
+            if value > 0
+        }
         self.vector_store = Chroma(
             collection_name=self.collection_name,
             embedding_function=self.embeddings,
-            persist_directory=self.persist_directory
+            persist_directory=self.persist_directory,
+            collection_metadata=hnsw_settings or None,
         )
+        if CHROMA_HNSW_SEARCH_EF > 0:
+            self.set_search_ef(CHROMA_HNSW_SEARCH_EF)
+
+    def set_search_ef(self, ef: int) -> None:
+        """
+        Sets the HNSW `ef` used at query time (size of the candidate list):
+        higher values raise recall and latency.
+
+        Args:
+            ef (int): The search ef.
+        """
+        collection = self.vector_store._collection
+        try:
+            try:
+                collection.modify(configuration={"hnsw": {"ef_search": ef}})
+            except TypeError:
+                # Chroma < 1.0 reads the search ef from the collection metadata
+                collection.modify(metadata={**(collection.metadata or {}), "hnsw:search_ef": ef})
+        except Exception as e:
+            logging.warning(f"Could not set the HNSW search ef of '{self.collection_name}': {e}")
 
     def get_vector_store(self) -> Chroma:
         """
@@ -49,20 +83,102 @@ class ChromaDBStore(BaseStore):
         """
         Adds a list of documents to the ChromaDB vector store.
 
+        Documents get content-addressed IDs (see `generate_chunk_ids`), so adding
+        the same chunk twice overwrites it instead of duplicating it.
+
         Args:
             documents (List[Document]): A list of LangChain Document objects.
 
         Returns:
             Optional[List[str]]: List of document IDs if successful, None otherwise.
         """
-        uuids = generate_list_ids(len(documents))
+        documents, ids = _unique_chunks(documents)
+        if not documents:
+            return []
 
         try:
-            return self.vector_store.add_documents(documents=documents, ids=uuids)
+            return self.vector_store.add_documents(documents=documents, ids=ids)
         except ValueError as e:
             logging.error(f"Error saving documents to ChromaDB: {e}")
             return None
 
+    def add_embedded_documents(self, documents: List[Document], embeddings: List[List[float]]) -> Optional[List[str]]:
+        """
+        Upserts documents whose embeddings were computed by the caller, in a single Chroma call.
+
+        Args:
+            documents (List[Document]): A list of LangChain Document objects.
+            embeddings (List[List[float]]): One embedding per document.
+
+        Returns:
+            Optional[List[str]]: List of document IDs if successful, None otherwise.
+        """
+        documents, ids, embeddings = _unique_chunks(documents, embeddings)
+        if not documents:
+            return []
+
+        collection = self.vector_store._collection
+
+        try:
+            # Chroma rejects empty metadata dicts, so documents without metadata are upserted separately
+            with_metadata = [i for i, doc in enumerate(documents) if doc.metadata]
+            without_metadata = [i for i, doc in enumerate(documents) if not doc.metadata]
+            if with_metadata:
+                collection.upsert(
+                    ids=[ids[i] for i in with_metadata],
+                    embeddings=[embeddings[i] for i in with_metadata],
+                    documents=[documents[i].page_content for i in with_metadata],
+                    metadatas=[documents[i].metadata for i in with_metadata],
+                )
+            if without_metadata:
+                collection.upsert(
+                    ids=[ids[i] for i in without_metadata],
+                    embeddings=[embeddings[i] for i in without_metadata],
+                    documents=[documents[i].page_content for i in without_metadata],
+                )
+            return ids
+        except ValueError as e:
+            logging.error(f"Error saving documents to ChromaDB: {e}")
+            return None
+
+    def get_documents(self, ids: List[str]) -> List[Document]:
+        """
+        Returns the stored documents matching the given IDs.
+
+        Args:
+            ids (List[str]): Document IDs to fetch.
+
+        Returns:
+            List[Document]: The matching documents (unknown IDs are skipped).
+        """
+        if not ids:
+            return []
+
+        records = self.vector_store.get(ids=ids, include=["documents", "metadatas"])
+        return [
+            Document(page_content=content, metadata=metadata or {}, id=doc_id)
+            for doc_id, content, metadata in zip(records["ids"], records["documents"], records["metadatas"])
+        ]
+
+    def list_ids(self) -> List[str]:
+        """
+        Returns the IDs of every document in the collection.
+
+        Returns:
+            List[str]: The stored document IDs.
+        """
+        return self.vector_store.get(include=[])["ids"]
+
+    def delete_documents(self, ids: List[str]) -> None:
+        """
+        Deletes documents from the ChromaDB vector store by their IDs.
+
+        Args:
+            ids (List[str]): Document IDs to delete.
+        """
+        if ids:
+            self.vector_store.delete(ids=ids)
+
     def similarity_search(self, query: str, count: int = 4) -> List[Document]:
         """
         Performs a similarity search based on a text query.
@@ -76,6 +192,30 @@ class ChromaDBStore(BaseStore):
         """
         return self.vector_store.similarity_search(query, k=count)
 
+    def embed_query(self, query: str) -> List[float]:
+        """
+        Embeds a query with the store's embedding model, through the shared embedding cache.
+
+        Args:
+            query (str): The query text.
+
+        Returns:
+            List[float]: The query embedding.
+        """
+        return cached_embed_query(self.embeddings, query)
+
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """
+        Embeds several queries with one call to the embedding model, through the shared embedding cache.
+
+        Args:
+            queries (List[str]): The query texts.
+
+        Returns:
+            List[List[float]]: One embedding per query, in order.
+        """
+        return cached_embed_queries(self.embeddings, queries)
+
     def similarity_search_by_vector(self, query: str, count: int = 4) -> List[Document]:
         """
         Performs a similarity search using an embedding-based query.
@@ -87,6 +227,105 @@ class ChromaDBStore(BaseStore):
         Returns:
             List[Document]: A list of retrieved documents.
         """
-        return self.vector_store.similarity_search_by_vector(
-            embedding=self.embeddings.embed_query(query)
-        )
+        return self.similarity_search_by_embedding(self.embed_query(query), count)
+
+    def similarity_search_by_embedding(self, embedding: List[float], count: int = 4) -> List[Document]:
+        """
+        Performs a similarity search using a precomputed query embedding.
+
+        Each document carries its relevance score in `metadata["retrieval_score"]`
+        (used by the pre-grader), at no extra cost: Chroma computes the distances anyway.
+
+        Args:
+            embedding (List[float]): The query embedding.
+            count (int, optional): Number of documents to retrieve. Defaults to 4.
+
+        Returns:
+            List[Document]: A list of retrieved documents.
+        """
+        documents = []
+        for doc, score in self.similarity_search_by_embedding_with_score(embedding, count):
+            doc.metadata["retrieval_score"] = score
+            documents.append(doc)
+        return documents
+
+    def similarity_search_by_embedding_with_score(self, embedding: List[float], count: int = 4) -> List[Tuple[Document, float]]:
+        """
+        Performs a similarity search using a precomputed query embedding, with relevance scores.
+
+        Chroma returns distances; they are converted with the relevance function
+        matching the collection's distance metric and clamped to [0, 1].
+
+        Args:
+            embedding (List[float]): The query embedding.
+            count (int, optional): Number of documents to retrieve. Defaults to 4.
+
+        Returns:
+            List[Tuple[Document, float]]: Documents with a relevance score (higher is more similar).
+        """
+        with span("vector_search", k=count):
+            results = self.vector_store.similarity_search_by_vector_with_relevance_scores(embedding=embedding, k=count)
+        relevance = self.vector_store._select_relevance_score_fn()
+        return [(doc, min(1.0, max(0.0, relevance(distance)))) for doc, distance in results]
+
+    def similarity_search_by_embeddings(self, embeddings: List[List[float]], count: int = 4) -> List[List[Document]]:
+        """
+        Performs one grouped similarity search for several query embeddings.
+
+        Chroma answers every query of the group in a single collection query,
+        instead of one round trip per question. Documents carry their relevance
+        score in `metadata["retrieval_score"]`, as in `similarity_search_by_embedding`.
+
+        Args:
+            embeddings (List[List[float]]): The query embeddings.
+            count (int, optional): Number of documents to retrieve per query. Defaults to 4.
+
+        Returns:
+            List[List[Document]]: The retrieved documents of each query, in order.
+        """
+        if not embeddings:
+            return []
+        with span("vector_search", k=count, queries=len(embeddings)):
+            results = self.vector_store._collection.query(
+                query_embeddings=embeddings,
+                n_results=count,
+                include=["documents", "metadatas", "distances"],
+            )
+        relevance = self.vector_store._select_relevance_score_fn()
+
+        grouped = []
+        for ids, contents, metadatas, distances in zip(
+            results["ids"], results["documents"], results["metadatas"], results["distances"]
+        ):
+            documents = []
+            for doc_id, content, metadata, distance in zip(ids, contents, metadatas, distances):
+                metadata = dict(metadata or {})
+                metadata["retrieval_score"] = min(1.0, max(0.0, relevance(distance)))
+                documents.append(Document(page_content=content, metadata=metadata, id=doc_id))
+            grouped.append(documents)
+        return grouped
+
+
+def _unique_chunks(documents: List[Document], embeddings: Optional[List[List[float]]] = None):
+    """
+    Computes chunk IDs and drops repeated chunks (Chroma rejects duplicate IDs in one call).
+
+    Args:
+        documents (List[Document]): The chunks to store.
+        embeddings (Optional[List[List[float]]], optional): Their embeddings, filtered alongside.
+
+    Returns:
+        The unique documents and their IDs, plus the matching embeddings when given.
+    """
+    seen = set()
+    kept = []
+    for index, chunk_id in enumerate(generate_chunk_ids(documents)):
+        if chunk_id not in seen:
+            seen.add(chunk_id)
+            kept.append((index, chunk_id))
+
+    unique_documents = [documents[index] for index, _ in kept]
+    ids = [chunk_id for _, chunk_id in kept]
+    if embeddings is None:
+        return unique_documents, ids
+    return unique_documents, ids, [embeddings[index] for index, _ in kept]
@@ -0,0 +1,111 @@
+"""
+embedding_cache.py
+------------------
+Process-wide cache of query embeddings, keyed by (embedding model, text).
+
+Embeddings are deterministic for a given model, so entries never expire;
+the cache is only bounded in size. An optional SQLite file keeps them
+across restarts.
+"""
+
+import threading
+from typing import Callable, List, Optional
+from utils.cache import TieredCache
+from utils.id_utils import hash_text
+from utils.tracing import span
+from app.config import (
+    EMBEDDING_CACHE_ENABLED,
+    EMBEDDING_CACHE_SIZE,
+    EMBEDDING_CACHE_PATH,
+    EMBEDDING_CACHE_MAX_DISK_ENTRIES,
+)
+
+_embedding_cache: Optional[TieredCache] = None
+_lock = threading.Lock()
+
+
+def get_embedding_cache() -> Optional[TieredCache]:
+    """
+    Returns the shared embedding cache, creating it on first use.
+
+    Returns:
+        Optional[TieredCache]: The cache, or None when `EMBEDDING_CACHE_ENABLED` is false.
+    """
+    global _embedding_cache
+
+    if not EMBEDDING_CACHE_ENABLED:
+        return None
+
+    with _lock:
+        if _embedding_cache is None:
+            _embedding_cache = TieredCache(
+                max_size=EMBEDDING_CACHE_SIZE,
+                path=EMBEDDING_CACHE_PATH or None,
+                table="query_embeddings",
+                max_disk_entries=EMBEDDING_CACHE_MAX_DISK_ENTRIES,
+            )
+        return _embedding_cache
+
+
+def embedding_model_name(embeddings) -> str:
+    """
+    Returns the name identifying an embedding model in cache keys.
+    """
+    return getattr(embeddings, "model", None) or type(embeddings).__name__
+
+
+def cached_embed_query(embeddings, text: str, embed: Optional[Callable[[str], List[float]]] = None) -> List[float]:
+    """
+    Embeds a query text, going through the shared cache.
+
+    Args:
+        embeddings: Embedding model (anything exposing `embed_query`).
+        text (str): The text to embed.
+        embed (Optional[Callable], optional): Embedding function to call on a miss.
+            Defaults to `embeddings.embed_query`.
+
+    Returns:
+        List[float]: The embedding vector.
+    """
+    embed = embed or embeddings.embed_query
+    cache = get_embedding_cache()
+    if cache is None:
+        with span("embed_query"):
+            return embed(text)
+
+    key = hash_text(embedding_model_name(embeddings), text)
+    vector = cache.get(key)
+    if vector is None:
+        with span("embed_query"):
+            vector = embed(text)
+        cache.set(key, list(vector))
+    return vector
+
+
+def cached_embed_queries(embeddings, texts: List[str]) -> List[List[float]]:
+    """
+    Embeds several query texts, going through the shared cache; the misses are
+    embedded together in one `embed_documents` call.
+
+    Args:
+        embeddings: Embedding model (anything exposing `embed_documents`).
+        texts (List[str]): The texts to embed.
+
+    Returns:
+        List[List[float]]: One embedding vector per text, in order.
+    """
+    cache = get_embedding_cache()
+    model = embedding_model_name(embeddings)
+    keys = [hash_text(model, text) for text in texts]
+    vectors: List[Optional[List[float]]] = [cache.get(key) if cache is not None else None for key in keys]
+
+    missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+    if missing:
+        with span("embed_queries", texts=len(missing)):
+            embedded = dict(zip(missing, embeddings.embed_documents(missing)))
+        for i, text in enumerate(texts):
+            if vectors[i] is None:
+                vectors[i] = list(embedded[text])
+                if cache is not None:
+                    cache.set(keys[i], vectors[i])
+    return vectors
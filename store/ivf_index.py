@@ -0,0 +1,313 @@
+"""
+ivf_index.py
+------------
+Inverted-file (IVF) coarse partitioning, with optional product quantization
+(IVF-PQ), for approximate vector search over large corpora.
+
+Unit vectors are clustered with spherical k-means into `lists` cells; a query
+only scans the rows of its `probes` closest cells. Cell assignments are kept
+in a flat array aligned with the store's rows, and grouped into inverted lists
+lazily, on the first search after rows were added.
+
+With product quantization, every row is also encoded as `subvectors` one-byte
+codes (one k-means codebook of 256 centroids per slice of the vector). The
+rows of the probed cells are then scored from the codes alone (asymmetric
+distance: one lookup table per query), and only a short list is re-scored
+exactly by the store, so most of the full-precision matrix is never paged in.
+"""
+
+import logging
+from typing import Optional, Tuple
+import numpy as np
+
+_BLOCK = 65536
+PQ_CENTROIDS = 256
+
+
+def _nearest(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """
+    Returns the closest centroid of each unit vector (highest dot product), in blocks.
+    """
+    assignments = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), _BLOCK):
+        block = np.asarray(vectors[start:start + _BLOCK], dtype=np.float32)
+        assignments[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return assignments
+
+
+def _cluster_sums(sample: np.ndarray, labels: np.ndarray, clusters: int) -> np.ndarray:
+    """
+    Sums the vectors of each cluster (one `bincount` per dimension, much faster than `np.add.at`).
+    """
+    return np.stack(
+        [np.bincount(labels, weights=sample[:, d], minlength=clusters) for d in range(sample.shape[1])], axis=1
+    ).astype(np.float32)
+
+
+def _kmeans(sample: np.ndarray, clusters: int, iterations: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Plain (Euclidean) k-means, used to fit the PQ codebooks.
+    """
+    centroids = sample[rng.choice(len(sample), size=clusters, replace=False)].copy()
+    for _ in range(iterations):
+        labels = _closest(sample, centroids)
+        sums = _cluster_sums(sample, labels, clusters)
+        counts = np.bincount(labels, minlength=clusters)
+        empty = counts == 0
+        centroids = sums / np.maximum(counts, 1)[:, None]
+        centroids[empty] = sample[rng.choice(len(sample), size=int(empty.sum()))]
+    return centroids
+
+
+def _closest(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """
+    Returns the closest centroid of each vector in Euclidean distance, in blocks.
+    """
+    squared_norms = (centroids ** 2).sum(axis=1)
+    labels = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), _BLOCK):
+        # PQ slices are strided views; BLAS is much faster on contiguous blocks
+        block = np.ascontiguousarray(vectors[start:start + _BLOCK], dtype=np.float32)
+        labels[start:start + len(block)] = np.argmin(squared_norms - 2.0 * block @ centroids.T, axis=1)
+    return labels
+
+
+class ProductQuantizer:
+    """
+    Encodes vectors as one byte per slice (subvector).
+
+    Attributes:
+        codebooks (np.ndarray): Centroids of every slice, shape (subvectors, 256, dim / subvectors).
+    """
+
+    def __init__(self, codebooks: np.ndarray):
+        self.codebooks = np.ascontiguousarray(codebooks, dtype=np.float32)
+
+    @property
+    def subvectors(self) -> int:
+        return self.codebooks.shape[0]
+
+    @classmethod
+    def train(
+        cls, vectors: np.ndarray, subvectors: int, iterations: int = 10, sample_size: int = 25600, seed: int = 0
+    ) -> "ProductQuantizer":
+        """
+        Fits one 256-centroid codebook per slice.
+
+        Args:
+            vectors (np.ndarray): Training vectors, shape (rows, dim); `dim` must be a multiple of `subvectors`.
+            subvectors (int): Number of slices (bytes per encoded vector).
+            iterations (int, optional): k-means iterations. Defaults to 10.
+            sample_size (int, optional): Rows used for training (100 per centroid). Defaults to 25600.
+            seed (int, optional): Random seed. Defaults to 0.
+
+        Returns:
+            ProductQuantizer: The trained quantizer.
+
+        Raises:
+            ValueError: If the dimension is not a multiple of `subvectors`.
+        """
+        rows, dim = vectors.shape
+        if subvectors <= 0 or dim % subvectors:
+            raise ValueError(f"Vector dimension {dim} is not a multiple of {subvectors} subvectors.")
+        rng = np.random.default_rng(seed)
+        sample_rows = np.sort(rng.choice(rows, size=min(rows, sample_size), replace=False))
+        sample = np.asarray(vectors[sample_rows], dtype=np.float32).reshape(len(sample_rows), subvectors, -1)
+        clusters = min(PQ_CENTROIDS, len(sample))
+
+        codebooks = np.zeros((subvectors, PQ_CENTROIDS, dim // subvectors), dtype=np.float32)
+        for j in range(subvectors):
+            codebooks[j, :clusters] = _kmeans(sample[:, j], clusters, iterations, rng)
+        return cls(codebooks)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        """
+        Returns the codes of the given vectors, shape (rows, subvectors), as uint8.
+        """
+        codes = np.empty((len(vectors), self.subvectors), dtype=np.uint8)
+        for start in range(0, len(vectors), _BLOCK):
+            block = np.asarray(vectors[start:start + _BLOCK], dtype=np.float32)
+            block = block.reshape(len(block), self.subvectors, -1)
+            for j in range(self.subvectors):
+                codes[start:start + len(block), j] = _closest(block[:, j], self.codebooks[j])
+        return codes
+
+    def scores(self, query: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        """
+        Approximates the dot products between a query and encoded vectors.
+
+        Args:
+            query (np.ndarray): The query vector, shape (dim,).
+            codes (np.ndarray): Codes of the vectors to score, shape (rows, subvectors).
+
+        Returns:
+            np.ndarray: Approximate dot products, shape (rows,).
+        """
+        tables = np.einsum("jcd,jd->jc", self.codebooks, query.reshape(self.subvectors, -1))
+        return tables[np.arange(self.subvectors), codes].sum(axis=1)
+
+
+class IVFIndex:
+    """
+    Coarse k-means partitioning of the store's rows.
+
+    Attributes:
+        centroids (np.ndarray): Unit-norm cell centroids, shape (lists, dim).
+        assignments (np.ndarray): Cell of every row, aligned with the store's rows.
+        pq (Optional[ProductQuantizer]): Quantizer of the rows, when product quantization is enabled.
+        codes (np.ndarray): PQ codes of every row, aligned with the store's rows.
+    """
+
+    def __init__(
+        self,
+        centroids: np.ndarray,
+        assignments: Optional[np.ndarray] = None,
+        pq: Optional[ProductQuantizer] = None,
+        codes: Optional[np.ndarray] = None,
+    ):
+        """
+        Args:
+            centroids (np.ndarray): Unit-norm cell centroids, shape (lists, dim).
+            assignments (Optional[np.ndarray], optional): Cell of every existing row.
+            pq (Optional[ProductQuantizer], optional): Trained product quantizer.
+            codes (Optional[np.ndarray], optional): PQ codes of every existing row.
+        """
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.assignments = np.asarray(assignments if assignments is not None else [], dtype=np.int32)
+        self.pq = pq
+        subvectors = pq.subvectors if pq is not None else 0
+        self.codes = np.asarray(codes if codes is not None else np.empty((0, subvectors)), dtype=np.uint8)
+        self._order: Optional[np.ndarray] = None
+        self._offsets: Optional[np.ndarray] = None
+
+    @property
+    def lists(self) -> int:
+        return len(self.centroids)
+
+    @classmethod
+    def train(
+        cls,
+        vectors: np.ndarray,
+        lists: int,
+        subvectors: int = 0,
+        iterations: int = 10,
+        sample_size: int = 100000,
+        seed: int = 0,
+    ) -> "IVFIndex":
+        """
+        Clusters unit vectors with spherical k-means and assigns every row to its cell.
+
+        Args:
+            vectors (np.ndarray): Unit-norm vectors, shape (rows, dim) (may be memory-mapped).
+            lists (int): Number of cells.
+            subvectors (int, optional): PQ bytes per vector (0 disables product quantization).
+            iterations (int, optional): k-means iterations. Defaults to 10.
+            sample_size (int, optional): Rows used to fit the centroids. Defaults to 100000.
+            seed (int, optional): Random seed. Defaults to 0.
+
+        Returns:
+            IVFIndex: The trained index, with assignments (and codes) for every row.
+        """
+        rng = np.random.default_rng(seed)
+        rows = len(vectors)
+        lists = max(1, min(lists, rows))
+        sample_rows = np.sort(rng.choice(rows, size=min(rows, sample_size), replace=False))
+        sample = np.asarray(vectors[sample_rows], dtype=np.float32)
+
+        centroids = sample[rng.choice(len(sample), size=lists, replace=False)].copy()
+        for _ in range(iterations):
+            labels = _nearest(sample, centroids)
+            sums = _cluster_sums(sample, labels, lists)
+            counts = np.bincount(labels, minlength=lists)
+            # Empty cells are reseeded with random sample rows
+            empty = counts == 0
+            sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()))]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            centroids = sums / np.maximum(norms, 1e-12)
+
+        pq = codes = None
+        if subvectors > 0:
+            try:
+                pq = ProductQuantizer.train(vectors, subvectors, iterations, seed=seed)
+                codes = pq.encode(vectors)
+            except ValueError as e:
+                logging.warning(f"Product quantization disabled: {e}")
+                pq = None
+
+        logging.info(f"IVF index trained: {lists} lists over {rows} rows ({len(sample)} sampled), PQ: {pq is not None}.")
+        return cls(centroids, _nearest(vectors, centroids), pq, codes)
+
+    def assign(self, vectors: np.ndarray) -> np.ndarray:
+        """
+        Returns the cell of each unit vector, without recording it.
+        """
+        return _nearest(vectors, self.centroids)
+
+    def extend(self, vectors: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """
+        Assigns (and encodes) rows appended to the store.
+
+        Args:
+            vectors (np.ndarray): The new unit vectors, in row order.
+
+        Returns:
+            Tuple[np.ndarray, Optional[np.ndarray]]: Their cells, and their PQ codes (None without PQ).
+        """
+        assignments = self.assign(vectors)
+        self.assignments = np.concatenate([self.assignments, assignments])
+        codes = None
+        if self.pq is not None:
+            codes = self.pq.encode(vectors)
+            self.codes = np.concatenate([self.codes, codes])
+        self._order = None
+        return assignments, codes
+
+    def select(self, rows: np.ndarray) -> "IVFIndex":
+        """
+        Returns the index restricted to the given rows, renumbered from 0 (used by compaction).
+        """
+        codes = self.codes[rows] if self.pq is not None else None
+        return IVFIndex(self.centroids, self.assignments[rows], self.pq, codes)
+
+    def _build_lists(self) -> None:
+        self._order = np.argsort(self.assignments, kind="stable").astype(np.int64)
+        self._offsets = np.searchsorted(self.assignments[self._order], np.arange(self.lists + 1))
+
+    def candidates(self, query: np.ndarray, probes: int) -> np.ndarray:
+        """
+        Returns the rows of the `probes` cells closest to a query.
+
+        Args:
+            query (np.ndarray): A unit query vector, shape (dim,).
+            probes (int): Number of cells to scan.
+
+        Returns:
+            np.ndarray: Row numbers, ascending.
+        """
+        if self._order is None:
+            self._build_lists()
+        probes = max(1, min(probes, self.lists))
+        closest = np.argpartition(-(self.centroids @ query), probes - 1)[:probes]
+        rows = [self._order[self._offsets[cell]:self._offsets[cell + 1]] for cell in closest]
+        return np.sort(np.concatenate(rows)) if rows else np.empty(0, dtype=np.int64)
+
+    def shortlist(self, query: np.ndarray, probes: int, live: np.ndarray, size: int) -> np.ndarray:
+        """
+        Returns the live rows of the probed cells to score exactly: all of them,
+        or with PQ the `size` best by approximate score.
+
+        Args:
+            query (np.ndarray): A unit query vector, shape (dim,).
+            probes (int): Number of cells to scan.
+            live (np.ndarray): Live-row mask of the store.
+            size (int): Short list size when PQ is enabled.
+
+        Returns:
+            np.ndarray: Row numbers, ascending (sequential reads of the memory-mapped matrix).
+        """
+        rows = self.candidates(query, probes)
+        rows = rows[live[rows]]
+        if self.pq is None or len(rows) <= size:
+            return rows
+        approximate = self.pq.scores(query, self.codes[rows])
+        return np.sort(rows[np.argpartition(-approximate, size - 1)[:size]])
@@ -0,0 +1,355 @@
+"""
+lexical_index.py
+----------------
+Persistent BM25 inverted index, kept next to the vector store.
+
+Dense retrieval misses exact-term queries (product codes, error strings,
+identifiers). This index scores chunks lexically so that the repository can
+fuse both rankings (see `reciprocal_rank_fusion`).
+
+Layout (one SQLite file):
+- `docs`: one row per chunk, mapping a dense internal number to the chunk ID
+  and storing the chunk length in tokens;
+- `postings`: one row per term, holding two packed little-endian arrays
+  (chunk numbers as uint32, term frequencies as uint16). Chunk numbers only
+  grow, so adding chunks appends to the arrays in SQL without reading them.
+
+Deleted chunks are dropped from `docs` and masked at query time; their
+postings are purged by `compact`, which runs automatically once they make up
+a sizeable share of the index.
+
+API and ingestion worker processes share the index: writes are serialized
+across processes with an exclusive file lock (chunk numbers are allocated
+under it), and other processes notice them through SQLite's `data_version`
+and reload.
+"""
+
+import fcntl
+import logging
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+
+_TOKEN = re.compile(r"\w+(?:[-./:]\w+)*")
+_PARTS = re.compile(r"[-./:_]")
+
+STOPWORDS = frozenset((
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "do", "does", "for", "from", "how",
+    "in", "is", "it", "of", "on", "or", "that", "the", "this", "to", "was", "what", "when",
+    "where", "which", "who", "why", "with",
+))
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Splits a text into lowercase terms.
+
+    Compound tokens such as "err-404", "v1.2.3" or "pkg.module" are kept whole
+    and also split into their parts, so both exact and partial lookups match.
+
+    Args:
+        text (str): The text to tokenize.
+
+    Returns:
+        List[str]: The terms, in order, stopwords removed.
+    """
+    terms = []
+    for token in _TOKEN.findall(text.lower()):
+        if token not in STOPWORDS:
+            terms.append(token)
+        parts = _PARTS.split(token)
+        if len(parts) > 1:
+            terms.extend(part for part in parts if part and part not in STOPWORDS)
+    return terms
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = 60) -> List[str]:
+    """
+    Fuses several rankings of IDs with reciprocal rank fusion.
+
+    Args:
+        rankings (Sequence[Sequence[str]]): Ranked ID lists, best first.
+        k (int, optional): RRF damping constant. Defaults to 60.
+
+    Returns:
+        List[str]: Every ranked ID, ordered by fused score.
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+class LexicalIndex:
+    """
+    SQLite-backed BM25 index over chunk contents.
+
+    Attributes:
+        path (str): Path of the SQLite database file.
+        k1 (float): BM25 term frequency saturation.
+        b (float): BM25 length normalization.
+    """
+
+    def __init__(self, path: str, k1: float = 1.2, b: float = 0.75):
+        """
+        Opens (and creates if needed) the index.
+
+        Args:
+            path (str): Path of the SQLite database file.
+            k1 (float, optional): BM25 term frequency saturation. Defaults to 1.2.
+            b (float, optional): BM25 length normalization. Defaults to 0.75.
+        """
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._lock_path = path + ".lock"
+        self._lock = threading.RLock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS docs (num INTEGER PRIMARY KEY, doc_id TEXT UNIQUE NOT NULL, length INTEGER NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS postings (term TEXT PRIMARY KEY, docs BLOB NOT NULL, tfs BLOB NOT NULL)"
+            )
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._load()
+
+    def _load(self) -> None:
+        """
+        Loads the chunk table in memory: ID ↔ number map and chunk lengths.
+        """
+        self._data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        rows = self._conn.execute("SELECT num, doc_id, length FROM docs").fetchall()
+        next_num = self._conn.execute("SELECT value FROM meta WHERE key = 'next_num'").fetchone()
+        self._next_num = next_num[0] if next_num else 0
+
+        self._nums: Dict[str, int] = {}
+        self._ids: List[Optional[str]] = [None] * self._next_num
+        self._lengths = np.zeros(max(self._next_num, 1024), dtype=np.float32)
+        self._live = np.zeros(len(self._lengths), dtype=bool)
+        for num, doc_id, length in rows:
+            self._nums[doc_id] = num
+            self._ids[num] = doc_id
+            self._lengths[num] = length
+            self._live[num] = True
+        self._total_length = float(self._lengths[self._live].sum())
+        self._dead = self._next_num - len(rows)
+
+    def _refresh(self) -> None:
+        """
+        Reloads the chunk table if another process changed the index.
+        """
+        version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if version != self._data_version:
+            self._load()
+
+    @contextmanager
+    def _write_lock(self) -> Iterator[None]:
+        with self._lock, open(self._lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                self._refresh()
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._nums)
+
+    def __contains__(self, doc_id: str) -> bool:
+        with self._lock:
+            self._refresh()
+            return doc_id in self._nums
+
+    def _grow(self, size: int) -> None:
+        if size <= len(self._lengths):
+            return
+        capacity = max(size, 2 * len(self._lengths))
+        self._lengths = np.concatenate([self._lengths, np.zeros(capacity - len(self._lengths), dtype=np.float32)])
+        self._live = np.concatenate([self._live, np.zeros(capacity - len(self._live), dtype=bool)])
+
+    def add(self, ids: Sequence[str], contents: Sequence[str]) -> int:
+        """
+        Indexes chunks. Chunks already in the index are skipped (IDs are content-addressed).
+
+        Args:
+            ids (Sequence[str]): Chunk IDs.
+            contents (Sequence[str]): Chunk contents, aligned with `ids`.
+
+        Returns:
+            int: Number of newly indexed chunks.
+        """
+        with self._write_lock():
+            postings: Dict[str, Tuple[List[int], List[int]]] = {}
+            docs = []
+            for doc_id, content in zip(ids, contents):
+                if doc_id in self._nums:
+                    continue
+                num = self._next_num
+                self._next_num += 1
+                terms = Counter(tokenize(content))
+                length = sum(terms.values())
+                for term, tf in terms.items():
+                    nums, tfs = postings.setdefault(term, ([], []))
+                    nums.append(num)
+                    tfs.append(min(tf, 65535))
+
+                self._nums[doc_id] = num
+                self._ids.append(doc_id)
+                self._grow(num + 1)
+                self._lengths[num] = length
+                self._live[num] = True
+                self._total_length += length
+                docs.append((num, doc_id, length))
+
+            if not docs:
+                return 0
+
+            with self._conn:
+                self._conn.executemany("INSERT INTO docs (num, doc_id, length) VALUES (?, ?, ?)", docs)
+                self._conn.executemany(
+                    "INSERT INTO postings (term, docs, tfs) VALUES (?, ?, ?) "
+                    "ON CONFLICT(term) DO UPDATE SET "
+                    "docs = CAST(docs || excluded.docs AS BLOB), tfs = CAST(tfs || excluded.tfs AS BLOB)",
+                    (
+                        (term, np.asarray(nums, dtype="<u4").tobytes(), np.asarray(tfs, dtype="<u2").tobytes())
+                        for term, (nums, tfs) in postings.items()
+                    ),
+                )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('next_num', ?)", (self._next_num,)
+                )
+            return len(docs)
+
+    def delete(self, ids: Iterable[str]) -> int:
+        """
+        Removes chunks from the index.
+
+        Args:
+            ids (Iterable[str]): Chunk IDs to remove (unknown IDs are ignored).
+
+        Returns:
+            int: Number of removed chunks.
+        """
+        with self._write_lock():
+            nums = [self._nums.pop(doc_id) for doc_id in ids if doc_id in self._nums]
+            if not nums:
+                return 0
+            for num in nums:
+                self._ids[num] = None
+                self._total_length -= float(self._lengths[num])
+                self._lengths[num] = 0
+                self._live[num] = False
+            self._dead += len(nums)
+            with self._conn:
+                self._conn.executemany("DELETE FROM docs WHERE num = ?", ((num,) for num in nums))
+
+            if self._dead > max(1000, len(self._nums) // 5):
+                self._compact()
+            return len(nums)
+
+    def compact(self) -> None:
+        """
+        Purges the postings of deleted chunks.
+        """
+        with self._write_lock():
+            self._compact()
+
+    def _compact(self) -> None:
+        rewritten, dropped = [], []
+        for term, docs, tfs in self._conn.execute("SELECT term, docs, tfs FROM postings"):
+            nums = np.frombuffer(docs, dtype="<u4")
+            keep = self._live[nums]
+            if keep.all():
+                continue
+            if not keep.any():
+                dropped.append((term,))
+            else:
+                rewritten.append((nums[keep].tobytes(), np.frombuffer(tfs, dtype="<u2")[keep].tobytes(), term))
+
+        with self._conn:
+            self._conn.executemany("UPDATE postings SET docs = ?, tfs = ? WHERE term = ?", rewritten)
+            self._conn.executemany("DELETE FROM postings WHERE term = ?", dropped)
+        logging.info(f"Lexical index compacted: {self._dead} deleted chunks purged.")
+        self._dead = 0
+
+    def clear(self) -> None:
+        """
+        Empties the index.
+        """
+        with self._write_lock():
+            with self._conn:
+                self._conn.execute("DELETE FROM docs")
+                self._conn.execute("DELETE FROM postings")
+                self._conn.execute("DELETE FROM meta")
+            self._load()
+
+    def search(self, query: str, count: int = 20) -> List[Tuple[str, float]]:
+        """
+        Returns the chunks with the highest BM25 score for a query.
+
+        Args:
+            query (str): The query text.
+            count (int, optional): Maximum number of results. Defaults to 20.
+
+        Returns:
+            List[Tuple[str, float]]: (chunk ID, score) pairs, best first.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or count <= 0:
+            return []
+
+        with self._lock:
+            self._refresh()
+            live_count = len(self._nums)
+            if not live_count:
+                return []
+            average_length = self._total_length / live_count or 1.0
+
+            placeholders = ",".join("?" * len(terms))
+            rows = self._conn.execute(
+                f"SELECT docs, tfs FROM postings WHERE term IN ({placeholders})", terms
+            ).fetchall()
+
+            matched, partial_scores = [], []
+            for docs, tfs in rows:
+                nums = np.frombuffer(docs, dtype="<u4")
+                tf = np.frombuffer(tfs, dtype="<u2").astype(np.float32)
+                # Chunks committed by another process since the refresh are not loaded yet
+                known = nums < len(self._live)
+                nums, tf = nums[known], tf[known]
+                live = self._live[nums]
+                nums, tf = nums[live], tf[live]
+                if not len(nums):
+                    continue
+                df = len(nums)
+                idf = np.log(1.0 + (live_count - df + 0.5) / (df + 0.5))
+                norm = self.k1 * (1.0 - self.b + self.b * self._lengths[nums] / average_length)
+                matched.append(nums)
+                partial_scores.append(idf * tf * (self.k1 + 1.0) / (tf + norm))
+
+            if not matched:
+                return []
+
+            nums, inverse = np.unique(np.concatenate(matched), return_inverse=True)
+            scores = np.bincount(inverse, weights=np.concatenate(partial_scores))
+            if len(scores) > count:
+                top = np.argpartition(-scores, count - 1)[:count]
+            else:
+                top = np.arange(len(scores))
+            top = top[np.argsort(-scores[top], kind="stable")]
+            return [(self._ids[int(nums[i])], float(scores[i])) for i in top]
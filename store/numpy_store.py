@@ -0,0 +1,603 @@
+"""
+numpy_store.py
+--------------
+Vector store backed by a memory-mapped NumPy matrix, for read-heavy corpora.
+
+Layout (one directory):
+- `vectors.f32`: unit-norm float32 embeddings, one row per stored chunk,
+  append-only. It is memory-mapped read-only, so startup does not load it and
+  every worker process shares the same pages through the OS page cache;
+- `docs.sqlite3`: chunk ID, content and metadata of every live row;
+- `ivf_centroids.npy` / `ivf_assignments.i4`: optional IVF partitioning
+  (see `store.ivf_index`), trained once the corpus reaches `ivf_min_rows`;
+- `pq_codebooks.npy` / `pq_codes.u1`: optional product quantization codes of
+  every row (IVF-PQ).
+
+Search is exact top-k over dot products (cosine similarity) with
+`argpartition`, restricted to the closest IVF cells when the index is trained.
+With PQ, the rows of those cells are ranked from their codes and only the best
+`pq_rerank` candidates per result are read from the matrix and scored exactly.
+Recall and latency are traded through `ivf_probes` and `pq_rerank`.
+Replaced and deleted chunks leave dead rows behind; they are masked at query
+time and dropped by `compact`, which runs automatically once they make up a
+sizeable share of the matrix.
+
+Writes are serialized across processes with an exclusive file lock; readers in
+other processes notice them through SQLite's `data_version` and reload.
+"""
+
+import fcntl
+import json
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import numpy as np
+from langchain.schema import Document
+from store.base_store import BaseStore
+from store.embedding_cache import cached_embed_query, cached_embed_queries
+from store.ivf_index import IVFIndex, ProductQuantizer
+from utils.id_utils import generate_chunk_ids
+from utils.tracing import span
+from app.config import (
+    NUMPY_STORE_IVF_LISTS,
+    NUMPY_STORE_IVF_PROBES,
+    NUMPY_STORE_IVF_MIN_ROWS,
+    NUMPY_STORE_PQ_SUBVECTORS,
+    NUMPY_STORE_PQ_RERANK,
+)
+
+_QUERY_BLOCK = 16
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _relevance(similarity: np.ndarray) -> np.ndarray:
+    """
+    Converts cosine similarities to the relevance scores Chroma reports for its
+    default L2 space (1 - squared distance / sqrt(2)), so that thresholds such
+    as the pre-grading ones mean the same with both backends.
+    """
+    return np.clip(1.0 - (2.0 - 2.0 * similarity) / np.sqrt(2.0), 0.0, 1.0)
+
+
+class NumpyStore(BaseStore):
+    """
+    Implements a memory-mapped NumPy vector store with exact (optionally IVF-restricted) search.
+
+    Attributes:
+        embeddings: Embedding model used for documents and queries.
+        path (str): Directory holding the store files.
+        ivf_lists (int): Number of IVF cells (0 disables the partitioning).
+        ivf_probes (int): Number of cells scanned per query.
+        ivf_min_rows (int): Corpus size from which the IVF index is trained.
+        pq_subvectors (int): PQ bytes per vector (0 disables product quantization).
+        pq_rerank (int): Candidates re-scored exactly per requested result, with PQ.
+    """
+
+    def __init__(
+        self,
+        embeddings,
+        path: str,
+        ivf_lists: int = NUMPY_STORE_IVF_LISTS,
+        ivf_probes: int = NUMPY_STORE_IVF_PROBES,
+        ivf_min_rows: int = NUMPY_STORE_IVF_MIN_ROWS,
+        pq_subvectors: int = NUMPY_STORE_PQ_SUBVECTORS,
+        pq_rerank: int = NUMPY_STORE_PQ_RERANK,
+    ):
+        """
+        Opens (and creates if needed) the store.
+
+        Args:
+            embeddings: Embedding model used for documents and queries.
+            path (str): Directory holding the store files.
+            ivf_lists (int, optional): Number of IVF cells (0 disables the partitioning).
+            ivf_probes (int, optional): Number of cells scanned per query.
+            ivf_min_rows (int, optional): Corpus size from which the IVF index is trained.
+            pq_subvectors (int, optional): PQ bytes per vector (0 disables product quantization);
+                must divide the embedding dimension.
+            pq_rerank (int, optional): Candidates re-scored exactly per requested result, with PQ.
+        """
+        self.embeddings = embeddings
+        self.path = path
+        self.ivf_lists = ivf_lists
+        self.ivf_probes = ivf_probes
+        self.ivf_min_rows = ivf_min_rows
+        self.pq_subvectors = pq_subvectors
+        self.pq_rerank = pq_rerank
+        os.makedirs(path, exist_ok=True)
+
+        self._vectors_path = os.path.join(path, "vectors.f32")
+        self._centroids_path = os.path.join(path, "ivf_centroids.npy")
+        self._assignments_path = os.path.join(path, "ivf_assignments.i4")
+        self._codebooks_path = os.path.join(path, "pq_codebooks.npy")
+        self._codes_path = os.path.join(path, "pq_codes.u1")
+        self._lock_path = os.path.join(path, ".write.lock")
+        self._lock = threading.RLock()
+
+        self._conn = sqlite3.connect(os.path.join(path, "docs.sqlite3"), check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS docs "
+                "(row INTEGER PRIMARY KEY, doc_id TEXT UNIQUE NOT NULL, content TEXT NOT NULL, metadata TEXT NOT NULL)"
+            )
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self._load()
+
+    def _meta(self, key: str) -> Optional[str]:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _file_state(self) -> Tuple[int, int]:
+        try:
+            stat = os.stat(self._vectors_path)
+            return stat.st_ino, stat.st_size
+        except OSError:
+            return 0, 0
+
+    def _load(self) -> None:
+        """
+        Maps the vector file and loads the row table and IVF index.
+        """
+        dim = self._meta("dim")
+        self._dim = int(dim) if dim else None
+        self._data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        self._state = self._file_state()
+
+        rows = self._state[1] // (4 * self._dim) if self._dim else 0
+        self._matrix = (
+            np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(rows, self._dim)) if rows else None
+        )
+        self._ids: List[Optional[str]] = [None] * rows
+        self._rows: Dict[str, int] = {}
+        self._live = np.zeros(rows, dtype=bool)
+        for row, doc_id in self._conn.execute("SELECT row, doc_id FROM docs"):
+            if row < rows:
+                self._ids[row] = doc_id
+                self._rows[doc_id] = row
+                self._live[row] = True
+
+        self._ivf: Optional[IVFIndex] = None
+        if self.ivf_lists > 0 and os.path.exists(self._centroids_path) and rows:
+            assignments = np.empty(0, dtype=np.int32)
+            if os.path.exists(self._assignments_path):
+                assignments = np.fromfile(self._assignments_path, dtype="<i4")
+            pq = codes = None
+            if self.pq_subvectors > 0 and os.path.exists(self._codebooks_path):
+                pq = ProductQuantizer(np.load(self._codebooks_path))
+                codes = np.empty((0, pq.subvectors), dtype=np.uint8)
+                if os.path.exists(self._codes_path):
+                    codes = np.fromfile(self._codes_path, dtype=np.uint8)
+                    codes = codes[:len(codes) // pq.subvectors * pq.subvectors].reshape(-1, pq.subvectors)
+            # Both files are appended together; a crash between the two writes leaves one longer
+            known = min(len(assignments), len(codes)) if pq is not None else len(assignments)
+            known = min(known, rows)
+            self._ivf = IVFIndex(
+                np.load(self._centroids_path), assignments[:known], pq, codes[:known] if pq is not None else None
+            )
+            if known < rows:
+                # Rows written by a process that did not maintain the index
+                self._ivf.extend(self._matrix[known:])
+
+    def _refresh(self) -> None:
+        """
+        Reloads the state if another process changed the store.
+        """
+        version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if version != self._data_version or self._file_state() != self._state:
+            self._load()
+
+    @contextmanager
+    def _write_lock(self) -> Iterator[None]:
+        with self._lock, open(self._lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                self._refresh()
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def get_vector_store(self) -> "NumpyStore":
+        """
+        Returns the store itself (there is no separate client object).
+        """
+        return self
+
+    def add_documents(self, documents: List[Document]) -> Optional[List[str]]:
+        """
+        Embeds documents and adds them to the store.
+
+        Args:
+            documents (List[Document]): A list of LangChain Document objects.
+
+        Returns:
+            Optional[List[str]]: List of document IDs if successful, None otherwise.
+        """
+        if not documents:
+            return []
+        try:
+            vectors = self.embeddings.embed_documents([doc.page_content for doc in documents])
+        except Exception as e:
+            logging.error(f"Error embedding documents for the NumPy store: {e}")
+            return None
+        return self.add_embedded_documents(documents, vectors)
+
+    def add_embedded_documents(self, documents: List[Document], embeddings: List[List[float]]) -> Optional[List[str]]:
+        """
+        Upserts documents whose embeddings were computed by the caller.
+
+        Chunks already stored under the same ID are replaced (their old row is left dead).
+
+        Args:
+            documents (List[Document]): A list of LangChain Document objects.
+            embeddings (List[List[float]]): One embedding per document.
+
+        Returns:
+            Optional[List[str]]: List of document IDs if successful, None otherwise.
+        """
+        kept: Dict[str, int] = {}
+        for index, chunk_id in enumerate(generate_chunk_ids(documents)):
+            kept.setdefault(chunk_id, index)
+        if not kept:
+            return []
+
+        ids = list(kept)
+        vectors = _normalize(np.asarray([embeddings[i] for i in kept.values()], dtype=np.float32))
+        if vectors.ndim != 2 or (self._dim is not None and vectors.shape[1] != self._dim):
+            logging.error(f"Embedding dimension mismatch for the NumPy store: {vectors.shape}, expected {self._dim}.")
+            return None
+
+        with self._write_lock():
+            if self._dim is None:
+                self._dim = vectors.shape[1]
+                with self._conn:
+                    self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('dim', ?)", (str(self._dim),))
+
+            first_row = len(self._ids)
+            with open(self._vectors_path, "ab") as file:
+                file.write(vectors.astype("<f4").tobytes())
+            if self._ivf is not None:
+                assignments, codes = self._ivf.extend(vectors)
+                with open(self._assignments_path, "ab") as file:
+                    file.write(assignments.astype("<i4").tobytes())
+                if codes is not None:
+                    with open(self._codes_path, "ab") as file:
+                        file.write(codes.tobytes())
+
+            records = []
+            for offset, (doc_id, index) in enumerate(kept.items()):
+                doc = documents[index]
+                records.append((first_row + offset, doc_id, doc.page_content, json.dumps(doc.metadata or {})))
+            with self._conn:
+                self._conn.executemany("DELETE FROM docs WHERE doc_id = ?", ((doc_id,) for doc_id in ids))
+                self._conn.executemany(
+                    "INSERT INTO docs (row, doc_id, content, metadata) VALUES (?, ?, ?, ?)", records
+                )
+
+            for doc_id in ids:
+                old_row = self._rows.get(doc_id)
+                if old_row is not None:
+                    self._live[old_row] = False
+                    self._ids[old_row] = None
+            self._ids.extend(ids)
+            self._live = np.concatenate([self._live, np.ones(len(ids), dtype=bool)])
+            for offset, doc_id in enumerate(ids):
+                self._rows[doc_id] = first_row + offset
+            self._remap()
+            self._maintain()
+        return ids
+
+    def get_documents(self, ids: List[str]) -> List[Document]:
+        """
+        Returns the stored documents matching the given IDs.
+
+        Args:
+            ids (List[str]): Document IDs to fetch.
+
+        Returns:
+            List[Document]: The matching documents (unknown IDs are skipped).
+        """
+        if not ids:
+            return []
+        placeholders = ",".join("?" * len(ids))
+        with self._lock:
+            records = self._conn.execute(
+                f"SELECT doc_id, content, metadata FROM docs WHERE doc_id IN ({placeholders})", list(ids)
+            ).fetchall()
+        by_id = {doc_id: (content, metadata) for doc_id, content, metadata in records}
+        return [
+            Document(page_content=by_id[doc_id][0], metadata=json.loads(by_id[doc_id][1]), id=doc_id)
+            for doc_id in ids
+            if doc_id in by_id
+        ]
+
+    def list_ids(self) -> List[str]:
+        """
+        Returns the IDs of every stored document.
+
+        Returns:
+            List[str]: The stored document IDs.
+        """
+        with self._lock:
+            return [doc_id for (doc_id,) in self._conn.execute("SELECT doc_id FROM docs ORDER BY row")]
+
+    def delete_documents(self, ids: List[str]) -> None:
+        """
+        Deletes documents from the store by their IDs.
+
+        Args:
+            ids (List[str]): Document IDs to delete.
+        """
+        if not ids:
+            return
+        with self._write_lock():
+            with self._conn:
+                self._conn.executemany("DELETE FROM docs WHERE doc_id = ?", ((doc_id,) for doc_id in ids))
+            for doc_id in ids:
+                row = self._rows.pop(doc_id, None)
+                if row is not None:
+                    self._live[row] = False
+                    self._ids[row] = None
+            self._maintain()
+
+    def similarity_search(self, query: str, count: int = 4) -> List[Document]:
+        """
+        Performs a similarity search based on a text query.
+
+        Args:
+            query (str): The text query for retrieving similar documents.
+            count (int, optional): Number of documents to retrieve. Defaults to 4.
+
+        Returns:
+            List[Document]: A list of retrieved documents.
+        """
+        return self.similarity_search_by_vector(query, count)
+
+    def embed_query(self, query: str) -> List[float]:
+        """
+        Embeds a query with the store's embedding model, through the shared embedding cache.
+        """
+        return cached_embed_query(self.embeddings, query)
+
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """
+        Embeds several queries with one call to the embedding model, through the shared embedding cache.
+        """
+        return cached_embed_queries(self.embeddings, queries)
+
+    def similarity_search_by_vector(self, query: str, count: int = 4) -> List[Document]:
+        """
+        Performs a similarity search using an embedding-based query.
+
+        Args:
+            query (str): The query string, which will be converted into a vector.
+            count (int, optional): Number of documents to retrieve. Defaults to 4.
+
+        Returns:
+            List[Document]: A list of retrieved documents.
+        """
+        return self.similarity_search_by_embedding(self.embed_query(query), count)
+
+    def similarity_search_by_embedding(self, embedding: List[float], count: int = 4) -> List[Document]:
+        """
+        Performs a similarity search using a precomputed query embedding.
+
+        Each document carries its relevance score in `metadata["retrieval_score"]`.
+
+        Args:
+            embedding (List[float]): The query embedding.
+            count (int, optional): Number of documents to retrieve. Defaults to 4.
+
+        Returns:
+            List[Document]: A list of retrieved documents.
+        """
+        return self.similarity_search_by_embeddings([embedding], count)[0]
+
+    def similarity_search_by_embedding_with_score(self, embedding: List[float], count: int = 4) -> List[Tuple[Document, float]]:
+        """
+        Performs a similarity search using a precomputed query embedding, with relevance scores.
+
+        Args:
+            embedding (List[float]): The query embedding.
+            count (int, optional): Number of documents to retrieve. Defaults to 4.
+
+        Returns:
+            List[Tuple[Document, float]]: Documents with a relevance score (higher is more similar).
+        """
+        return [(doc, doc.metadata["retrieval_score"]) for doc in self.similarity_search_by_embedding(embedding, count)]
+
+    def similarity_search_by_embeddings(self, embeddings: List[List[float]], count: int = 4) -> List[List[Document]]:
+        """
+        Performs one similarity search for several query embeddings, as a matrix product.
+
+        Args:
+            embeddings (List[List[float]]): The query embeddings.
+            count (int, optional): Number of documents to retrieve per query. Defaults to 4.
+
+        Returns:
+            List[List[Document]]: The retrieved documents of each query, in order.
+        """
+        if not embeddings:
+            return []
+        with self._lock:
+            self._refresh()
+            with span("vector_search", k=count, queries=len(embeddings)):
+                hits = self._search(_normalize(np.asarray(embeddings, dtype=np.float32)), count)
+            ids = [[self._ids[row] for row, _ in query_hits] for query_hits in hits]
+
+        documents = {doc.id: doc for doc in self.get_documents(list({doc_id for row in ids for doc_id in row}))}
+        grouped = []
+        for query_ids, query_hits in zip(ids, hits):
+            results = []
+            for doc_id, (_, score) in zip(query_ids, query_hits):
+                doc = documents.get(doc_id)
+                if doc is not None:
+                    results.append(Document(
+                        page_content=doc.page_content, metadata={**doc.metadata, "retrieval_score": score}, id=doc_id
+                    ))
+            grouped.append(results)
+        return grouped
+
+    def _search(self, queries: np.ndarray, count: int) -> List[List[Tuple[int, float]]]:
+        """
+        Returns the (row, relevance) pairs of the best live rows for each unit query vector.
+        """
+        if self._matrix is None or not self._rows or count <= 0:
+            return [[] for _ in queries]
+        if queries.shape[1] != self._dim:
+            raise ValueError(f"Query dimension {queries.shape[1]} does not match the store ({self._dim}).")
+
+        if self._ivf is not None:
+            size = count * max(1, self.pq_rerank)
+            return [
+                self._top(query[None, :], count, self._ivf.shortlist(query, self.ivf_probes, self._live, size))[0]
+                for query in queries
+            ]
+
+        hits = []
+        for start in range(0, len(queries), _QUERY_BLOCK):
+            hits.extend(self._top(queries[start:start + _QUERY_BLOCK], count))
+        return hits
+
+    def _top(self, queries: np.ndarray, count: int, rows: Optional[np.ndarray] = None) -> List[List[Tuple[int, float]]]:
+        """
+        Exact top-k over every row, or over the given candidate rows.
+        """
+        if rows is None:
+            scores = queries @ self._matrix.T
+            live = self._live
+        else:
+            scores = queries @ self._matrix[rows].T
+            live = self._live[rows]
+        scores[:, ~live] = -np.inf
+
+        k = min(count, int(live.sum()))
+        if k <= 0:
+            return [[] for _ in queries]
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for query_scores, query_top in zip(scores, top):
+            query_top = query_top[np.argsort(-query_scores[query_top], kind="stable")]
+            relevance = _relevance(query_scores[query_top])
+            matched = rows[query_top] if rows is not None else query_top
+            results.append([(int(row), float(score)) for row, score in zip(matched, relevance)])
+        return results
+
+    def _remap(self) -> None:
+        self._state = self._file_state()
+        rows = len(self._ids)
+        self._matrix = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(rows, self._dim)) if rows else None
+
+    def _maintain(self) -> None:
+        """
+        Compacts dead rows and (re)trains the IVF index when due. Called under the write lock.
+        """
+        dead = len(self._ids) - len(self._rows)
+        if dead > max(1000, len(self._rows) // 5):
+            self._compact()
+
+        if self.ivf_lists <= 0 or len(self._rows) < self.ivf_min_rows or self._matrix is None:
+            return
+        trained_rows = int(self._meta("ivf_trained_rows") or 0)
+        # Retrain when the corpus doubled: the cells drift as new topics come in
+        if self._ivf is None or len(self._rows) >= 2 * trained_rows:
+            self._train_ivf()
+
+    def train_ivf(self) -> None:
+        """
+        Trains (or retrains) the IVF index over the current rows.
+        """
+        with self._write_lock():
+            self._train_ivf()
+
+    def _train_ivf(self) -> None:
+        if self._matrix is None or self.ivf_lists <= 0:
+            return
+        with span("ivf_training", rows=len(self._ids), lists=self.ivf_lists, subvectors=self.pq_subvectors):
+            self._ivf = IVFIndex.train(self._matrix, self.ivf_lists, self.pq_subvectors)
+        self._save_ivf()
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('ivf_trained_rows', ?)", (str(len(self._rows)),)
+            )
+
+    def _save_ivf(self) -> None:
+        np.save(self._centroids_path, self._ivf.centroids)
+        self._ivf.assignments.astype("<i4").tofile(self._assignments_path)
+        if self._ivf.pq is not None:
+            np.save(self._codebooks_path, self._ivf.pq.codebooks)
+            self._ivf.codes.tofile(self._codes_path)
+        else:
+            for path in (self._codebooks_path, self._codes_path):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def compact(self) -> None:
+        """
+        Rewrites the vector file without the rows of deleted or replaced chunks.
+        """
+        with self._write_lock():
+            self._compact()
+
+    def _compact(self) -> None:
+        live_rows = np.flatnonzero(self._live)
+        temporary = self._vectors_path + ".tmp"
+        with open(temporary, "wb") as file:
+            for start in range(0, len(live_rows), 65536):
+                file.write(np.asarray(self._matrix[live_rows[start:start + 65536]], dtype="<f4").tobytes())
+
+        # Rows only move down, so renumbering in ascending order never collides.
+        # The file is swapped inside the transaction: a failed swap rolls the renumbering back.
+        renumbered = [(new_row, self._ids[old_row]) for new_row, old_row in enumerate(live_rows)]
+        with self._conn:
+            self._conn.executemany("UPDATE docs SET row = ? WHERE doc_id = ?", renumbered)
+            os.replace(temporary, self._vectors_path)
+
+        if self._ivf is not None:
+            self._ivf = self._ivf.select(live_rows)
+            self._save_ivf()
+
+        dead = len(self._ids) - len(live_rows)
+        self._ids = [doc_id for _, doc_id in renumbered]
+        self._rows = {doc_id: row for row, doc_id in renumbered}
+        self._live = np.ones(len(self._ids), dtype=bool)
+        self._remap()
+        logging.info(f"NumPy store compacted: {dead} dead rows purged.")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the store size, index state and memory footprint (in bytes).
+        """
+        with self._lock:
+            ivf = self._ivf
+            return {
+                "documents": len(self._rows),
+                "rows": len(self._ids),
+                "dim": self._dim,
+                "ivf_lists": ivf.lists if ivf is not None else 0,
+                "pq_subvectors": ivf.pq.subvectors if ivf is not None and ivf.pq is not None else 0,
+                "vector_bytes": len(self._ids) * (self._dim or 0) * 4,
+                "index_bytes": (ivf.assignments.nbytes + ivf.codes.nbytes + ivf.centroids.nbytes) if ivf is not None else 0,
+            }
+
+    def live_vectors(self) -> Tuple[List[str], np.ndarray]:
+        """
+        Returns the IDs and unit vectors of every live row (e.g. for exact ground truth in benchmarks).
+
+        Returns:
+            Tuple[List[str], np.ndarray]: IDs and a (documents, dim) float32 array, in row order.
+        """
+        with self._lock:
+            self._refresh()
+            rows = np.flatnonzero(self._live)
+            if self._matrix is None or not len(rows):
+                return [], np.empty((0, self._dim or 0), dtype=np.float32)
+            return [self._ids[row] for row in rows], np.asarray(self._matrix[rows])
@@ -0,0 +1,99 @@
+"""
+test_cache.py
+-------------
+Tests of the generic caches: LRU eviction, TTL, tag invalidation and the
+SQLite layer behind `TieredCache`.
+"""
+
+import time
+from utils.cache import LRUCache, SQLiteCache, TieredCache
+
+
+def test_lru_evicts_the_least_recently_used_entry():
+    cache = LRUCache(max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+
+
+def test_lru_expires_entries():
+    cache = LRUCache(ttl=0.01)
+    cache.set("a", 1)
+
+    time.sleep(0.02)
+
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_lru_with_no_size_stores_nothing():
+    cache = LRUCache(max_size=0)
+    cache.set("a", 1)
+
+    assert cache.get("a") is None
+
+
+def test_lru_delete_tags_removes_only_tagged_entries():
+    cache = LRUCache()
+    cache.set("a", 1, tag="chunk-1")
+    cache.set("b", 2, tag="chunk-1")
+    cache.set("c", 3, tag="chunk-2")
+
+    assert cache.delete_tags(["chunk-1", "unknown"]) == 2
+    assert cache.get("a") is None
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+
+def test_sqlite_entries_survive_reopening(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    SQLiteCache(path).set("a", {"score": "yes"}, tag="chunk-1")
+
+    cache = SQLiteCache(path)
+
+    assert cache.get("a") == {"score": "yes"}
+    assert cache.delete_tags(["chunk-1"]) == 1
+    assert cache.get("a") is None
+
+
+def test_sqlite_evicts_the_least_recently_accessed_entries(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "cache.sqlite3"), max_entries=2)
+    cache.set("a", 1)
+    time.sleep(0.01)
+    cache.set("b", 2)
+    time.sleep(0.01)
+    cache.get("a")
+    time.sleep(0.01)
+
+    cache.set("c", 3)
+
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+
+
+def test_tiered_cache_promotes_disk_hits_and_counts_them(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    TieredCache(path=path).set("a", [0.1, 0.2])
+
+    cache = TieredCache(path=path)
+
+    assert cache.get("a") == [0.1, 0.2]
+    assert cache.memory.get("a") == [0.1, 0.2]
+    assert cache.get("missing") is None
+    assert cache.stats() == {"hits": 1, "misses": 1, "hit_ratio": 0.5, "memory_size": 1, "disk_size": 1}
+
+
+def test_tiered_cache_invalidates_every_layer(tmp_path):
+    cache = TieredCache(path=str(tmp_path / "cache.sqlite3"))
+    cache.set("a", 1, tag="chunk-1")
+
+    assert cache.delete_tags(["chunk-1"]) == 2
+    assert cache.get("a") is None
@@ -0,0 +1,94 @@
+"""
+test_context_builder.py
+-----------------------
+Tests of the generation context packing. Tokens are counted as words so the
+tests do not need the tiktoken encoding files.
+"""
+
+import pytest
+from langchain.schema import Document
+from generation import context_builder
+from generation.context_builder import build_context, compress_text
+
+
+class WordEncoder:
+    """
+    Stand-in for the tiktoken encoder: one token per word.
+    """
+
+    def encode(self, text, disallowed_special=()):
+        return text.split()
+
+    def decode(self, tokens):
+        return " ".join(tokens)
+
+
+@pytest.fixture(autouse=True)
+def word_tokens(monkeypatch):
+    monkeypatch.setattr(context_builder, "count_tokens", lambda text: len(text.split()))
+    monkeypatch.setattr(context_builder, "get_encoder", lambda: WordEncoder())
+
+
+def chunk(content, score=None):
+    metadata = {"source": "doc.pdf"}
+    if score is not None:
+        metadata["retrieval_score"] = score
+    return Document(page_content=content, metadata=metadata)
+
+
+def web_page(content):
+    return Document(page_content=content, metadata={"url": "https://example.com"})
+
+
+def test_chunks_are_ordered_by_retrieval_score():
+    documents = [chunk("low score chunk", 0.2), web_page("web result"), chunk("high score chunk", 0.9)]
+
+    context = build_context("q", documents, budget=100, compress_web=False)
+
+    assert context.split("\n") == ["high score chunk", "low score chunk", "web result"]
+
+
+def test_near_duplicates_are_dropped():
+    text = "the quick brown fox jumps over the lazy dog near the river bank today"
+    documents = [chunk(text, 0.9), chunk(text.upper(), 0.8), chunk("something entirely different here", 0.7)]
+
+    context = build_context("q", documents, budget=100, max_distance=8, compress_web=False)
+
+    assert context.split("\n") == [text, "something entirely different here"]
+
+
+def test_chunks_are_packed_within_the_budget():
+    documents = [chunk("one two three four", 0.9), chunk("five six seven eight", 0.8), chunk("nine ten", 0.7)]
+
+    context = build_context("q", documents, budget=6, max_distance=-1, compress_web=False)
+
+    # The second chunk does not fit, the smaller third one does
+    assert context.split("\n") == ["one two three four", "nine ten"]
+
+
+def test_the_best_chunk_is_truncated_when_nothing_fits():
+    context = build_context("q", [chunk("one two three four five", 0.9)], budget=3, compress_web=False)
+
+    assert context == "one two three"
+
+
+def test_no_budget_keeps_every_document():
+    documents = [chunk("a b", 0.1), chunk("a b", 0.9)]
+
+    assert build_context("q", documents, budget=0) == "a b\na b"
+
+
+def test_compress_text_keeps_the_sentences_sharing_question_terms():
+    text = "Paris is the capital of France. The weather is mild. France borders Spain."
+
+    compressed = compress_text("What is the capital of France?", text, max_tokens=8)
+
+    assert compressed == "Paris is the capital of France."
+
+
+def test_web_pages_are_compressed():
+    page = web_page("Bananas are yellow. Kubernetes schedules pods on nodes. Cats sleep a lot.")
+
+    context = build_context("How does Kubernetes schedule pods?", [page], budget=100, web_max_tokens=5)
+
+    assert context == "Kubernetes schedules pods on nodes."
@@ -0,0 +1,66 @@
+"""
+test_embedding_cache.py
+-----------------------
+Tests of the query embedding cache and of the `count` of vector searches.
+"""
+
+import pytest
+from langchain.schema import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from store import embedding_cache
+from store.chroma_db_store import ChromaDBStore
+from store.embedding_cache import cached_embed_query
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    """
+    Deterministic embeddings counting the queries they embed.
+    """
+
+    model: str = "fake-embeddings"
+    calls: int = 0
+
+    def embed_query(self, text):
+        self.calls += 1
+        return super().embed_query(text)
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    monkeypatch.setattr(embedding_cache, "_embedding_cache", None)
+
+
+def test_query_is_embedded_once():
+    embeddings = CountingEmbeddings(size=4)
+
+    first = cached_embed_query(embeddings, "what is rag?")
+    second = cached_embed_query(embeddings, "what is rag?")
+
+    assert embeddings.calls == 1
+    assert first == second == DeterministicFakeEmbedding(size=4).embed_query("what is rag?")
+
+
+def test_models_do_not_share_entries():
+    first, second = CountingEmbeddings(size=4, model="first"), CountingEmbeddings(size=4, model="second")
+
+    cached_embed_query(first, "q")
+    cached_embed_query(second, "q")
+
+    assert first.calls == second.calls == 1
+
+
+def test_embed_function_is_called_on_a_miss():
+    embeddings = CountingEmbeddings(size=2)
+
+    assert cached_embed_query(embeddings, "q", embed=lambda text: [1.0, 0.0]) == [1.0, 0.0]
+    assert cached_embed_query(embeddings, "q") == [1.0, 0.0]
+    assert embeddings.calls == 0
+
+
+def test_vector_searches_honour_count(tmp_path):
+    embeddings = DeterministicFakeEmbedding(size=8)
+    store = ChromaDBStore("articles", embeddings, persist_directory=str(tmp_path))
+    store.add_documents([Document(page_content=f"document {i}", metadata={"source": "test"}) for i in range(6)])
+
+    assert len(store.similarity_search_by_vector("document", count=2)) == 2
+    assert len(store.similarity_search_by_embedding(embeddings.embed_query("document"), count=5)) == 5
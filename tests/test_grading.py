@@ -0,0 +1,128 @@
+"""
+test_grading.py
+---------------
+Tests of the grading strategies: result order, early stop and error fallbacks.
+"""
+
+import time
+from langchain.schema import Document
+from workflow.grading import grade_batched, grade_concurrent, grade_sequential, is_relevant
+
+
+def documents(*contents):
+    return [Document(page_content=content) for content in contents]
+
+
+def make_grader(verdicts, delays=None, calls=None):
+    """
+    Returns a grading chain answering {"score": verdicts[fact]}, or raising it if it is an exception.
+    """
+    def grading_chain(question, fact):
+        if calls is not None:
+            calls.append(fact)
+        time.sleep((delays or {}).get(fact, 0))
+        verdict = verdicts[fact]
+        if isinstance(verdict, Exception):
+            raise verdict
+        return {"score": verdict}
+
+    return grading_chain
+
+
+def test_is_relevant():
+    assert is_relevant({"score": "yes"})
+    assert not is_relevant({"score": "no"})
+    assert not is_relevant({})
+    assert not is_relevant(None)
+
+
+def test_sequential_grades_every_document_in_order():
+    grader = make_grader({"a": "yes", "b": "no", "c": "yes"})
+
+    results = grade_sequential("q", documents("a", "b", "c"), grader)
+
+    assert results == [{"score": "yes"}, {"score": "no"}, {"score": "yes"}]
+
+
+def test_sequential_stops_at_the_first_irrelevant_document():
+    calls = []
+    grader = make_grader({"a": "yes", "b": "no", "c": "yes"}, calls=calls)
+
+    results = grade_sequential("q", documents("a", "b", "c"), grader, stop_on_irrelevant=True)
+
+    assert results == [{"score": "yes"}, {"score": "no"}, None]
+    assert calls == ["a", "b"]
+
+
+def test_sequential_stops_once_enough_documents_are_relevant():
+    calls = []
+    grader = make_grader({"a": "yes", "b": "yes", "c": "yes"}, calls=calls)
+
+    results = grade_sequential("q", documents("a", "b", "c"), grader, min_relevant=1)
+
+    assert results == [{"score": "yes"}, None, None]
+    assert calls == ["a"]
+
+
+def test_concurrent_keeps_the_document_order():
+    # The first document finishes last
+    grader = make_grader({"a": "yes", "b": "no", "c": "no"}, delays={"a": 0.05})
+
+    results = grade_concurrent("q", documents("a", "b", "c"), grader, max_workers=3)
+
+    assert results == [{"score": "yes"}, {"score": "no"}, {"score": "no"}]
+
+
+def test_concurrent_grades_failed_calls_no():
+    grader = make_grader({"a": "yes", "b": RuntimeError("ollama down")})
+
+    results = grade_concurrent("q", documents("a", "b"), grader)
+
+    assert results == [{"score": "yes"}, {"score": "no"}]
+
+
+def test_concurrent_early_stop_leaves_pending_documents_ungraded():
+    grader = make_grader({"a": "no", "b": "yes", "c": "yes"}, delays={"a": 0.02})
+
+    results = grade_concurrent("q", documents("a", "b", "c"), grader, max_workers=1, stop_on_irrelevant=True)
+
+    assert results == [{"score": "no"}, None, None]
+
+
+def test_concurrent_stops_once_enough_documents_are_relevant():
+    grader = make_grader({"a": "yes", "b": "yes", "c": "yes"}, delays={"a": 0.02, "b": 0.02})
+
+    results = grade_concurrent("q", documents("a", "b", "c"), grader, max_workers=1, min_relevant=2)
+
+    assert results == [{"score": "yes"}, {"score": "yes"}, None]
+
+
+def test_concurrent_without_documents():
+    assert grade_concurrent("q", [], make_grader({})) == []
+
+
+def test_batched_uses_the_batch_verdicts():
+    calls = []
+    grader = make_grader({"a": "no", "b": "no"}, calls=calls)
+
+    results = grade_batched("q", documents("a", "b"), lambda question, facts: [{"score": "yes"}] * len(facts), grader)
+
+    assert results == [{"score": "yes"}, {"score": "yes"}]
+    assert calls == []
+
+
+def test_batched_falls_back_to_per_document_grading():
+    calls = []
+    grader = make_grader({"a": "yes", "b": "no"}, calls=calls)
+
+    results = grade_batched("q", documents("a", "b"), lambda question, facts: None, grader)
+
+    assert results == [{"score": "yes"}, {"score": "no"}]
+    assert sorted(calls) == ["a", "b"]
+
+
+def test_batched_without_documents():
+    def batch_grading_chain(question, facts):
+        raise AssertionError("no call expected")
+
+    assert grade_batched("q", [], batch_grading_chain, make_grader({})) == []
@@ -0,0 +1,126 @@
+"""
+test_grading_cache.py
+---------------------
+Tests of the grading verdict cache: keys, chunk invalidation, and its use by
+the grading chains and the repository.
+"""
+
+import pytest
+from langchain.schema import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from generation import chains, grading_cache
+from generation.grading_cache import get_grading_cache, grading_cache_key, invalidate_chunks
+from repository.article_repository import ArticleRepository
+
+YES, NO = {"score": "yes"}, {"score": "no"}
+
+
+class FakeGrader(FakeListChatModel):
+    """
+    Chat model answering with `responses` in turn, counting its calls.
+    """
+
+    model: str = "fake-grader"
+    calls: int = 0
+
+    def _call(self, *args, **kwargs):
+        self.calls += 1
+        return super()._call(*args, **kwargs)
+
+
+@pytest.fixture(autouse=True)
+def cache(monkeypatch):
+    monkeypatch.setattr(grading_cache, "_grading_cache", None)
+    # The chain factories are memoized: rebuild them around the fake model and the fresh cache
+    chains.get_grading_chain.cache_clear()
+    chains.get_batch_grading_chain.cache_clear()
+    yield get_grading_cache()
+    chains.get_grading_chain.cache_clear()
+    chains.get_batch_grading_chain.cache_clear()
+
+
+def use_grader(monkeypatch, *responses) -> FakeGrader:
+    llm = FakeGrader(responses=list(responses))
+    monkeypatch.setattr(chains, "get_llm", lambda *args, **kwargs: llm)
+    return llm
+
+
+def test_key_ignores_question_case_and_spacing():
+    assert grading_cache_key("What is RAG?", "fact", "m") == grading_cache_key("  what is\nRAG? ", "fact", "m")
+
+
+def test_key_depends_on_the_chunk_and_the_model():
+    key, tag = grading_cache_key("q", "fact", "m")
+
+    assert grading_cache_key("q", "other fact", "m")[0] != key
+    assert grading_cache_key("q", "fact", "other model")[0] != key
+    assert grading_cache_key("other question", "fact", "m")[1] == tag
+
+
+def test_invalidate_chunks_drops_the_verdicts_of_a_chunk(cache):
+    for question in ("q1", "q2"):
+        key, tag = grading_cache_key(question, "fact", "m")
+        cache.set(key, YES, tag=tag)
+    other_key, other_tag = grading_cache_key("q1", "other fact", "m")
+    cache.set(other_key, NO, tag=other_tag)
+
+    assert invalidate_chunks(["fact"]) == 2
+    assert cache.get(grading_cache_key("q1", "fact", "m")[0]) is None
+    assert cache.get(other_key) == NO
+
+
+def test_grading_chain_reuses_cached_verdicts(monkeypatch):
+    llm = use_grader(monkeypatch, '{"score": "yes"}')
+    grading_chain = chains.get_grading_chain()
+
+    assert grading_chain("What is RAG?", "fact") == YES
+    assert grading_chain("what is  RAG?", "fact") == YES
+    assert llm.calls == 1
+
+
+def test_invalidated_chunks_are_graded_again(monkeypatch):
+    llm = use_grader(monkeypatch, '{"score": "yes"}', '{"score": "no"}')
+    grading_chain = chains.get_grading_chain()
+    grading_chain("q", "fact")
+
+    invalidate_chunks(["fact"])
+
+    assert grading_chain("q", "fact") == NO
+    assert llm.calls == 2
+
+
+def test_unparsable_verdicts_are_graded_no_and_not_cached(monkeypatch):
+    llm = use_grader(monkeypatch, "not json", '{"score": "yes"}')
+    grading_chain = chains.get_grading_chain()
+
+    assert grading_chain("q", "fact") == NO
+    assert grading_chain("q", "fact") == YES
+    assert llm.calls == 2
+
+
+def test_batch_grading_only_sends_uncached_facts(monkeypatch):
+    # The batch answer holds a single verdict: it only parses if "a" is not sent again
+    llm = use_grader(monkeypatch, '{"score": "yes"}', '{"scores": ["no"]}')
+    chains.get_grading_chain()("q", "a")
+    batch_grading_chain = chains.get_batch_grading_chain()
+
+    assert batch_grading_chain("q", ["a", "b"]) == [YES, NO]
+    assert batch_grading_chain("q", ["a", "b"]) == [YES, NO]
+    assert llm.calls == 2
+
+
+def test_repository_invalidates_added_and_deleted_chunks(tmp_path, cache):
+    repository = ArticleRepository(DeterministicFakeEmbedding(size=8), persist_directory=str(tmp_path))
+    key, tag = grading_cache_key("q", "fact", "m")
+    document = Document(page_content="fact", metadata={"source": "test"})
+    ids = repository.add([document])
+
+    cache.set(key, YES, tag=tag)
+    repository.add([document])
+    assert cache.get(key) is None
+
+    cache.set(key, YES, tag=tag)
+    repository.delete(ids)
+    assert cache.get(key) is None
+    assert repository.store_instance.get_documents(ids) == []
@@ -0,0 +1,183 @@
+"""
+test_ingestion_pipeline.py
+--------------------------
+Tests of the staged ingestion pipeline and of incremental re-indexing through
+the source manifest, with fake embeddings and a line splitter.
+"""
+
+from typing import List
+import pytest
+from langchain.schema import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from ingestion import pipeline as pipeline_module
+from ingestion.pipeline import IngestionPipeline
+from repository.article_repository import ArticleRepository
+from utils.base_spliter import BaseSpliter
+from utils.id_utils import generate_chunk_id
+
+
+class FakeEmbeddings(DeterministicFakeEmbedding):
+    """
+    Deterministic embeddings recording the chunks they embed; batches holding "boom" fail.
+    """
+
+    embedded: List[str] = []
+
+    def embed_documents(self, texts):
+        if any("boom" in text for text in texts):
+            raise RuntimeError("embedding server down")
+        self.embedded.extend(texts)
+        return super().embed_documents(texts)
+
+
+class LineSplitter(BaseSpliter):
+    """
+    Splits pages into one chunk per non-empty line.
+    """
+
+    def split(self, docs, chunk_size=250, chunk_overlap=0):
+        return [
+            Document(page_content=line, metadata=dict(doc.metadata))
+            for doc in docs
+            for line in doc.page_content.splitlines()
+            if line.strip()
+        ]
+
+
+def pages(*contents, source="doc.txt"):
+    return [Document(page_content=content, metadata={"source": source}) for content in contents]
+
+
+@pytest.fixture
+def repository(tmp_path):
+    return ArticleRepository(FakeEmbeddings(size=8, embedded=[]), persist_directory=str(tmp_path))
+
+
+def make_pipeline(repository, **kwargs) -> IngestionPipeline:
+    return IngestionPipeline(repository, LineSplitter(), embed_batch_size=2, embed_workers=2, **kwargs)
+
+
+def stored_contents(repository, ids):
+    return sorted(doc.page_content for doc in repository.store_instance.get_documents(ids))
+
+
+def test_documents_are_split_embedded_and_stored(repository):
+    result = make_pipeline(repository).ingest_documents(pages("a\nb\nc", "d"), source="doc.txt")
+
+    assert result["failed_sources"] == {}
+    assert stored_contents(repository, result["document_ids"]) == ["a", "b", "c", "d"]
+    assert sorted(repository.embeddings.embedded) == ["a", "b", "c", "d"]
+    for stage in ("split", "embed", "upsert"):
+        assert result["stats"][stage]["items"] == 4
+
+
+def test_a_failed_batch_does_not_stop_the_others(repository):
+    result = make_pipeline(repository).ingest_documents(pages("a\nboom", "c\nd"), source="doc.txt")
+
+    assert stored_contents(repository, result["document_ids"]) == ["c", "d"]
+    assert result["stats"]["embed"]["failures"] == 1
+
+
+def test_a_split_failure_is_recorded(repository):
+    class FailingSplitter(LineSplitter):
+        def split(self, docs, chunk_size=250, chunk_overlap=0):
+            raise ValueError("unreadable page")
+
+    pipeline = IngestionPipeline(repository, FailingSplitter())
+    result = pipeline.ingest_documents(pages("a"), source="doc.txt")
+
+    assert result["document_ids"] == []
+    assert result["failed_sources"] == {"doc.txt": "unreadable page"}
+    assert result["stats"]["split"]["failures"] == 1
+
+
+def test_progress_is_reported_per_stage(repository):
+    stages = []
+
+    make_pipeline(repository, on_progress=lambda stage, stats: stages.append(stage)).ingest_documents(pages("a\nb"))
+
+    assert {"split", "embed", "upsert"} <= set(stages)
+
+
+def test_unchanged_source_is_skipped(repository):
+    pipeline = make_pipeline(repository)
+    pipeline.ingest_documents(pages("a\nb"), source="doc.txt")
+    repository.embeddings.embedded.clear()
+
+    result = pipeline.ingest_documents(pages("a\nb"), source="doc.txt")
+
+    assert result["skipped_sources"] == ["doc.txt"]
+    assert result["document_ids"] == []
+    assert repository.embeddings.embedded == []
+
+
+def test_changed_source_embeds_new_chunks_and_deletes_stale_ones(repository):
+    pipeline = make_pipeline(repository)
+    first = pipeline.ingest_documents(pages("a\nb\nc"), source="doc.txt")
+    repository.embeddings.embedded.clear()
+
+    second = pipeline.ingest_documents(pages("a\nb\nd"), source="doc.txt")
+
+    assert repository.embeddings.embedded == ["d"]
+    chunk_ids = repository.get_source("doc.txt")["chunk_ids"]
+    assert stored_contents(repository, chunk_ids) == ["a", "b", "d"]
+    assert stored_contents(repository, first["document_ids"] + second["document_ids"]) == ["a", "b", "d"]
+
+
+def test_a_source_with_failed_chunks_is_not_recorded(repository):
+    pipeline = make_pipeline(repository)
+
+    result = pipeline.ingest_documents(pages("a\nboom"), source="doc.txt")
+
+    assert "doc.txt" in result["failed_sources"]
+    assert repository.get_source("doc.txt") is None
+    # Not skipped on the next run
+    assert pipeline.ingest_documents(pages("a\nb"), source="doc.txt")["skipped_sources"] == []
+    assert len(repository.get_source("doc.txt")["chunk_ids"]) == 2
+
+
+def test_chunk_ids_depend_on_source_and_content(repository):
+    pipeline = make_pipeline(repository)
+    first = pipeline.ingest_documents(pages("a", source="one.txt"), source="one.txt")
+    second = pipeline.ingest_documents(pages("a", source="two.txt"), source="two.txt")
+
+    assert len(set(first["document_ids"] + second["document_ids"])) == 2
+    assert first["document_ids"] == [generate_chunk_id("one.txt", "a")]
+
+
+class TextLoader:
+    """
+    Loader reading one page per paragraph, labelled with the file path like the PDF loader.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+
+    def lazy_load(self):
+        with open(self.file_path) as f:
+            for paragraph in f.read().split("\n\n"):
+                yield Document(page_content=paragraph, metadata={"source": self.file_path})
+
+
+def test_uploads_of_the_same_file_share_one_source(repository, tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        pipeline_module.LoaderFactory, "create_loader", lambda source_type, file_path: TextLoader(file_path)
+    )
+    paths = []
+    for upload in ("first", "second"):
+        (tmp_path / upload).mkdir()
+        paths.append(tmp_path / upload / "report.txt")
+        paths[-1].write_text("a\nb\n\nc")
+    pipeline = make_pipeline(repository)
+
+    first = pipeline.ingest_file(str(paths[0]), source="report.txt")
+    repository.embeddings.embedded.clear()
+    second = pipeline.ingest_file(str(paths[1]), source="report.txt")
+
+    assert repository.embeddings.embedded == []
+    assert second["failed_sources"] == {}
+    assert repository.get_source(str(paths[0])) is None
+    chunk_ids = repository.get_source("report.txt")["chunk_ids"]
+    assert sorted(chunk_ids) == sorted(first["document_ids"])
+    documents = repository.store_instance.get_documents(chunk_ids)
+    assert {doc.metadata["source"] for doc in documents} == {"report.txt"}
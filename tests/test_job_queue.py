@@ -0,0 +1,122 @@
+"""
+test_job_queue.py
+-----------------
+Tests of the SQLite ingestion job queue: fair claiming, stale job recovery,
+job results and job ownership.
+"""
+
+import pytest
+from ingestion.job_queue import JobQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), max_attempts=2)
+    yield queue
+    queue.close()
+
+
+def test_claim_marks_the_oldest_job_running(queue):
+    first = queue.enqueue("urls", {"urls": ["a"]})
+    queue.enqueue("urls", {"urls": ["b"]})
+
+    job = queue.claim("w1")
+
+    assert job["id"] == first
+    assert job["status"] == "running"
+    assert job["worker"] == "w1"
+    assert job["attempts"] == 1
+    assert queue.counts() == {"queued": 1, "running": 1, "done": 0, "failed": 0}
+
+
+def test_claim_returns_none_on_empty_queue(queue):
+    assert queue.claim("w1") is None
+
+
+def test_claim_is_fair_between_clients(queue):
+    queue.enqueue("urls", {"urls": ["a1"]}, client="a")
+    queue.enqueue("urls", {"urls": ["a2"]}, client="a")
+    queue.enqueue("urls", {"urls": ["b1"]}, client="b")
+
+    assert queue.claim("w1")["client"] == "a"
+    # Client "a" already has a running job: "b" goes first despite being newer
+    assert queue.claim("w2")["client"] == "b"
+
+
+def test_queue_position(queue):
+    first = queue.enqueue("urls", {"urls": ["a"]})
+    second = queue.enqueue("urls", {"urls": ["b"]})
+
+    assert queue.get(first)["position"] == 0
+    assert queue.get(second)["position"] == 1
+
+
+def test_requeue_stale_gives_the_job_to_another_worker(queue):
+    job_id = queue.enqueue("urls", {"urls": ["a"]})
+    queue.claim("w1")
+
+    assert queue.requeue_stale(timeout=-1) == 1
+    job = queue.claim("w2")
+
+    assert job["id"] == job_id
+    assert job["worker"] == "w2"
+    assert job["attempts"] == 2
+
+
+def test_requeue_stale_fails_jobs_out_of_attempts(queue):
+    job_id = queue.enqueue("urls", {"urls": ["a"]})
+    for worker in ("w1", "w2"):
+        queue.claim(worker)
+        queue.requeue_stale(timeout=-1)
+
+    job = queue.get(job_id)
+    assert job["status"] == "failed"
+    assert job["error"] == "worker stopped responding"
+
+
+def test_requeue_stale_keeps_live_jobs(queue):
+    queue.enqueue("urls", {"urls": ["a"]})
+    queue.claim("w1")
+
+    assert queue.requeue_stale(timeout=60) == 0
+
+
+def test_finish_stores_the_progress_and_result(queue):
+    job_id = queue.enqueue("urls", {"urls": ["a"]})
+    queue.claim("w1")
+
+    assert queue.heartbeat(job_id, "w1", {"fetch": {"items": 1}})
+    assert queue.finish(job_id, "w1", {"document_ids": ["x"]})
+
+    job = queue.get(job_id)
+    assert job["status"] == "done"
+    assert job["progress"] == {"fetch": {"items": 1}}
+    assert job["result"] == {"document_ids": ["x"]}
+
+
+def test_finish_with_an_error_fails_the_job(queue):
+    job_id = queue.enqueue("urls", {"urls": ["a"]})
+    queue.claim("w1")
+
+    assert queue.finish(job_id, "w1", {}, error="boom")
+
+    job = queue.get(job_id)
+    assert job["status"] == "failed"
+    assert job["error"] == "boom"
+
+
+def test_only_the_owner_can_heartbeat_and_finish(queue):
+    job_id = queue.enqueue("urls", {"urls": ["a"]})
+    queue.claim("w1")
+    queue.requeue_stale(timeout=-1)
+    queue.claim("w2")
+
+    assert not queue.heartbeat(job_id, "w1", {"fetch": {}})
+    assert not queue.finish(job_id, "w1", {}, error="late failure")
+    assert queue.heartbeat(job_id, "w2", {"fetch": {"items": 1}})
+    assert queue.finish(job_id, "w2", {"document_ids": ["x"]})
+
+    job = queue.get(job_id)
+    assert job["status"] == "done"
+    assert job["progress"] == {"fetch": {"items": 1}}
+    assert job["result"] == {"document_ids": ["x"]}
@@ -0,0 +1,82 @@
+"""
+test_lexical_index.py
+---------------------
+Tests of the BM25 index, including two instances sharing one database
+(API process and ingestion worker).
+"""
+
+import pytest
+from store.lexical_index import LexicalIndex, reciprocal_rank_fusion, tokenize
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "lexical.sqlite3")
+
+
+def test_tokenize_keeps_compound_tokens_and_their_parts():
+    assert tokenize("The ERR-404 of v1.2") == ["err-404", "err", "404", "v1.2", "v1", "2"]
+
+
+def test_search_ranks_exact_term_matches(path):
+    index = LexicalIndex(path)
+    index.add(["a", "b", "c"], ["error code err-404", "hello world", "another error"])
+
+    results = index.search("err-404")
+
+    assert [doc_id for doc_id, _ in results] == ["a"]
+    assert index.search("missing") == []
+
+
+def test_add_skips_known_ids(path):
+    index = LexicalIndex(path)
+    assert index.add(["a"], ["hello"]) == 1
+    assert index.add(["a", "b"], ["hello", "world"]) == 1
+    assert len(index) == 2
+
+
+def test_delete_masks_and_compact_purges(path):
+    index = LexicalIndex(path)
+    index.add(["a", "b"], ["shared term", "shared term too"])
+
+    assert index.delete(["a", "unknown"]) == 1
+    index.compact()
+
+    assert [doc_id for doc_id, _ in index.search("shared")] == ["b"]
+    assert "a" not in index
+
+
+def test_reader_sees_chunks_added_by_another_instance(path):
+    reader, writer = LexicalIndex(path), LexicalIndex(path)
+    assert reader.search("kubernetes") == []
+
+    writer.add(["a"], ["kubernetes deployment"])
+
+    assert [doc_id for doc_id, _ in reader.search("kubernetes")] == ["a"]
+    assert "a" in reader
+
+
+def test_two_writers_allocate_distinct_numbers(path):
+    first, second = LexicalIndex(path), LexicalIndex(path)
+
+    first.add(["a"], ["alpha shared"])
+    second.add(["b"], ["beta shared"])
+    first.add(["c"], ["gamma shared"])
+
+    ids = {doc_id for doc_id, _ in LexicalIndex(path).search("shared")}
+    assert ids == {"a", "b", "c"}
+    assert {doc_id for doc_id, _ in second.search("shared")} == ids
+
+
+def test_deletes_are_seen_by_other_instances(path):
+    first, second = LexicalIndex(path), LexicalIndex(path)
+    first.add(["a", "b"], ["shared one", "shared two"])
+    assert len(second) == 2
+
+    first.delete(["a"])
+
+    assert [doc_id for doc_id, _ in second.search("shared")] == ["b"]
+
+
+def test_reciprocal_rank_fusion_favours_items_ranked_by_both():
+    assert reciprocal_rank_fusion([["a", "b"], ["c", "b"]])[0] == "b"
@@ -0,0 +1,191 @@
+"""
+test_llm_scheduler.py
+---------------------
+Tests of the per-model LLM scheduler: concurrency limit, priority classes and
+request coalescing.
+"""
+
+import asyncio
+import threading
+import time
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_ollama import ChatOllama
+from generation import llm_manager
+from generation.llm_manager import ScheduledChatOllama
+from generation.llm_scheduler import ModelScheduler
+from utils.tracing import LLMMetricsCallback, start_trace
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.001)
+
+
+def test_concurrent_calls_are_limited():
+    scheduler = ModelScheduler("m", limit=2)
+    lock = threading.Lock()
+    active, peak = [0], [0]
+
+    def call():
+        with scheduler.slot():
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.02)
+            with lock:
+                active[0] -= 1
+
+    threads = [threading.Thread(target=call) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert peak[0] == 2
+
+
+def test_waiting_calls_are_admitted_by_priority():
+    scheduler = ModelScheduler("m", limit=1)
+    admitted = []
+
+    def call(role):
+        with scheduler.slot(role):
+            admitted.append(role)
+
+    scheduler.acquire()
+    threads = []
+    for count, role in enumerate(["rewriter", "grader", "generator", "grader"], start=1):
+        threads.append(threading.Thread(target=call, args=(role,)))
+        threads[-1].start()
+        wait_until(lambda: scheduler._waiting == count)
+    scheduler.release()
+    for thread in threads:
+        thread.join()
+
+    assert admitted == ["generator", "grader", "grader", "rewriter"]
+
+
+def test_cancelled_async_waiter_leaves_the_queue():
+    scheduler = ModelScheduler("m", limit=1)
+
+    async def main():
+        await scheduler.aacquire()
+        waiter = asyncio.create_task(scheduler.aacquire("grader"))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        scheduler.release()
+        # The slot was not handed to the cancelled waiter
+        await asyncio.wait_for(scheduler.aacquire(), timeout=1)
+        scheduler.release()
+
+    asyncio.run(main())
+
+
+def test_identical_requests_in_flight_share_one_call():
+    scheduler = ModelScheduler("m", limit=0)
+    started, finish = threading.Event(), threading.Event()
+    calls, results = [], []
+
+    def call():
+        calls.append(1)
+        started.set()
+        finish.wait(5)
+        return "answer"
+
+    leader = threading.Thread(target=lambda: results.append(scheduler.coalesce("k", call)))
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=lambda: results.append(scheduler.coalesce("k", call)))
+    follower.start()
+    time.sleep(0.05)
+    finish.set()
+    leader.join()
+    follower.join()
+
+    assert results == ["answer", "answer"]
+    assert len(calls) == 1
+    # Once settled, the same request runs again
+    assert scheduler.coalesce("k", lambda: "fresh") == "fresh"
+
+
+def test_coalesced_callers_get_the_error_of_the_call():
+    scheduler = ModelScheduler("m", limit=0)
+
+    async def call():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("ollama down")
+
+    async def main():
+        return await asyncio.gather(
+            scheduler.acoalesce("k", call), scheduler.acoalesce("k", call), return_exceptions=True
+        )
+
+    errors = asyncio.run(main())
+
+    assert [str(error) for error in errors] == ["ollama down", "ollama down"]
+
+
+def test_async_callers_are_coalesced():
+    scheduler = ModelScheduler("m", limit=0)
+    calls = []
+
+    async def call():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "answer"
+
+    async def main():
+        return await asyncio.gather(*(scheduler.acoalesce("k", call) for _ in range(3)))
+
+    assert asyncio.run(main()) == ["answer"] * 3
+    assert len(calls) == 1
+
+
+def test_coalesced_callers_get_their_own_copy():
+    scheduler = ModelScheduler("m", limit=0)
+
+    async def call():
+        await asyncio.sleep(0.01)
+        return {"answer": "yes"}
+
+    async def main():
+        return await asyncio.gather(*(scheduler.acoalesce("k", call, share=dict) for _ in range(3)))
+
+    results = asyncio.run(main())
+    results[1]["answer"] = "changed"
+
+    assert [result["answer"] for result in results] == ["yes", "changed", "yes"]
+
+
+def test_coalesced_duplicates_are_not_counted_as_llm_calls(monkeypatch):
+    calls = []
+
+    async def generate(self, messages, stop=None, run_manager=None, **kwargs):
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        message = AIMessage(
+            content="answer", usage_metadata={"input_tokens": 10, "output_tokens": 2, "total_tokens": 12}
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    monkeypatch.setattr(ChatOllama, "_agenerate", generate)
+    monkeypatch.setattr(llm_manager, "LLM_COALESCE", True)
+    llm = ScheduledChatOllama(model="coalesce-test", callbacks=[LLMMetricsCallback()])
+
+    async def main():
+        with start_trace() as trace:
+            answers = await asyncio.gather(*(llm.ainvoke([HumanMessage(content="q")]) for _ in range(3)))
+        return answers, trace.to_dict()
+
+    answers, trace = asyncio.run(main())
+
+    assert [answer.content for answer in answers] == ["answer"] * 3
+    assert len(calls) == 1
+    assert trace["llm_call_count"] == 1
+    assert trace["prompt_tokens"] == 10
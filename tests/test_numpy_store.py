@@ -0,0 +1,87 @@
+"""
+test_numpy_store.py
+-------------------
+Tests of the memory-mapped NumPy vector store, with precomputed embeddings.
+"""
+
+import numpy as np
+import pytest
+from langchain.schema import Document
+from store.numpy_store import NumpyStore
+
+
+def make_store(path) -> NumpyStore:
+    return NumpyStore(None, str(path), ivf_lists=0, pq_subvectors=0)
+
+
+def documents(*contents):
+    return [Document(page_content=content, metadata={"source": "test"}) for content in contents]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return make_store(tmp_path)
+
+
+def test_add_and_search(store):
+    ids = store.add_embedded_documents(documents("x", "y", "z"), [[1, 0, 0], [0, 1, 0], [0, 0, 1]])
+
+    results = store.similarity_search_by_embedding([0.9, 0.1, 0], count=2)
+
+    assert len(store) == 3
+    assert [doc.page_content for doc in results] == ["x", "y"]
+    assert results[0].id == ids[0]
+    assert results[0].metadata["source"] == "test"
+    assert results[0].metadata["retrieval_score"] > results[1].metadata["retrieval_score"]
+
+
+def test_upsert_replaces_the_previous_row(store):
+    store.add_embedded_documents(documents("x"), [[1, 0]])
+    store.add_embedded_documents(documents("x"), [[0, 1]])
+
+    assert len(store) == 1
+    assert [doc.page_content for doc in store.similarity_search_by_embedding([0, 1], count=5)] == ["x"]
+
+
+def test_delete_hides_documents(store):
+    ids = store.add_embedded_documents(documents("x", "y"), [[1, 0], [0, 1]])
+
+    store.delete_documents([ids[0]])
+
+    assert store.list_ids() == [ids[1]]
+    assert [doc.id for doc in store.get_documents(ids)] == [ids[1]]
+    assert [doc.page_content for doc in store.similarity_search_by_embedding([1, 0], count=5)] == ["y"]
+
+
+def test_dimension_mismatch_is_rejected(store):
+    store.add_embedded_documents(documents("x"), [[1, 0]])
+
+    assert store.add_embedded_documents(documents("y"), [[1, 0, 0]]) is None
+
+
+def test_search_by_several_embeddings(store):
+    store.add_embedded_documents(documents("x", "y"), [[1, 0], [0, 1]])
+
+    results = store.similarity_search_by_embeddings([[1, 0], [0, 1]], count=1)
+
+    assert [[doc.page_content for doc in hits] for hits in results] == [["x"], ["y"]]
+
+
+def test_other_instances_see_writes(tmp_path):
+    reader, writer = make_store(tmp_path), make_store(tmp_path)
+    assert reader.similarity_search_by_embedding([1, 0], count=1) == []
+
+    ids = writer.add_embedded_documents(documents("x", "y"), [[1, 0], [0, 1]])
+    assert [doc.page_content for doc in reader.similarity_search_by_embedding([1, 0], count=1)] == ["x"]
+
+    writer.delete_documents([ids[0]])
+    assert [doc.page_content for doc in reader.similarity_search_by_embedding([1, 0], count=1)] == ["y"]
+
+
+def test_vectors_are_stored_normalized(store):
+    store.add_embedded_documents(documents("x"), [[3, 4]])
+
+    ids, vectors = store.live_vectors()
+
+    assert len(ids) == 1
+    assert np.allclose(np.linalg.norm(vectors, axis=1), 1.0)
@@ -0,0 +1,120 @@
+"""
+test_semantic_cache.py
+----------------------
+Tests of the semantic answer cache: similarity threshold, LRU bound, TTL and
+corpus version changes.
+"""
+
+import time
+from langchain.schema import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from repository.article_repository import ArticleRepository
+from workflow import graph
+from workflow.semantic_cache import SemanticAnswerCache
+
+
+def test_near_duplicate_question_hits():
+    cache = SemanticAnswerCache(threshold=0.9)
+    cache.store("What is RAG?", [1.0, 0.0], "An answer.", ["retrieve", "generate"], version="v1")
+
+    hit = cache.lookup([0.99, 0.05], version="v1")
+
+    assert hit["question"] == "What is RAG?"
+    assert hit["generation"] == "An answer."
+    assert hit["steps"] == ["retrieve", "generate"]
+    assert hit["similarity"] > 0.9
+
+
+def test_dissimilar_question_misses():
+    cache = SemanticAnswerCache(threshold=0.9)
+    cache.store("What is RAG?", [1.0, 0.0], "An answer.", [], version="v1")
+
+    assert cache.lookup([0.0, 1.0], version="v1") is None
+    assert cache.stats() == {"hits": 0, "misses": 1, "hit_ratio": 0.0, "size": 1}
+
+
+def test_best_match_wins():
+    cache = SemanticAnswerCache(threshold=0.5)
+    cache.store("first", [1.0, 0.0], "first answer", [], version="v1")
+    cache.store("second", [0.6, 0.8], "second answer", [], version="v1")
+
+    assert cache.lookup([0.5, 0.85], version="v1")["generation"] == "second answer"
+
+
+def test_corpus_change_drops_cached_answers():
+    cache = SemanticAnswerCache(threshold=0.9)
+    cache.store("q", [1.0, 0.0], "old answer", [], version="v1")
+
+    assert cache.lookup([1.0, 0.0], version="v2") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_answer_of_an_outdated_corpus_is_not_stored():
+    cache = SemanticAnswerCache(threshold=0.9)
+    cache.lookup([0.0, 1.0], version="v2")
+    cache.store("fresh", [0.0, 1.0], "fresh answer", [], version="v2")
+
+    cache.store("late", [1.0, 0.0], "late answer", [], version="v1")
+
+    # The late answer neither wipes the fresh one nor rolls the cache back to v1
+    assert cache.lookup([1.0, 0.0], version="v2") is None
+    assert cache.lookup([0.0, 1.0], version="v2")["generation"] == "fresh answer"
+
+
+class ChangingCorpus:
+    """
+    Retriever whose corpus version changes at every read.
+    """
+
+    def __init__(self):
+        self.reads = 0
+
+    def corpus_version(self):
+        self.reads += 1
+        return f"v{self.reads}"
+
+
+def test_answer_is_not_cached_when_the_corpus_changed_during_the_run():
+    cache = SemanticAnswerCache(threshold=0.9)
+    retriever = ChangingCorpus()
+    context = {"cache": cache, "retriever": retriever, "vector": [1.0, 0.0], "version": retriever.corpus_version()}
+
+    graph._store_answer_cache(context, "q", {"generation": "answer", "steps": []})
+
+    assert cache.stats()["size"] == 0
+
+
+def test_least_recently_used_answer_is_evicted():
+    cache = SemanticAnswerCache(threshold=0.9, max_size=2)
+    cache.store("a", [1.0, 0.0, 0.0], "a", [], version="v1")
+    cache.store("b", [0.0, 1.0, 0.0], "b", [], version="v1")
+    cache.lookup([1.0, 0.0, 0.0], version="v1")
+
+    cache.store("c", [0.0, 0.0, 1.0], "c", [], version="v1")
+
+    assert cache.lookup([0.0, 1.0, 0.0], version="v1") is None
+    assert cache.lookup([1.0, 0.0, 0.0], version="v1")["generation"] == "a"
+
+
+def test_expired_answers_are_dropped():
+    cache = SemanticAnswerCache(threshold=0.9, ttl=0.01)
+    cache.store("q", [1.0, 0.0], "answer", [], version="v1")
+
+    time.sleep(0.02)
+
+    assert cache.lookup([1.0, 0.0], version="v1") is None
+
+
+def test_repository_changes_bump_the_corpus_version(tmp_path):
+    repository = ArticleRepository(DeterministicFakeEmbedding(size=8), persist_directory=str(tmp_path))
+    assert repository.corpus_version() == ""
+
+    ids = repository.add([Document(page_content="fact", metadata={"source": "test"})])
+    added = repository.corpus_version()
+    repository.delete(ids)
+
+    assert added
+    assert repository.corpus_version() not in ("", added)
+    # Another process sharing the directory sees the same version
+    other = ArticleRepository(DeterministicFakeEmbedding(size=8), persist_directory=str(tmp_path))
+    assert other.corpus_version() == repository.corpus_version()
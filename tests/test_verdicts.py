@@ -0,0 +1,47 @@
+"""
+test_verdicts.py
+----------------
+Tests of the grading verdict parsing.
+"""
+
+from generation.verdicts import batch_grading_schema, parse_verdict, parse_verdicts, strip_reasoning
+
+
+def test_parse_verdict_reads_json():
+    assert parse_verdict('{"score": "yes"}') == {"score": "yes"}
+    assert parse_verdict('{"score": " No "}') == {"score": "no"}
+
+
+def test_parse_verdict_finds_the_object_in_surrounding_text():
+    assert parse_verdict('Answer: {"score": "no"} done') == {"score": "no"}
+
+
+def test_parse_verdict_strips_reasoning():
+    assert parse_verdict('<think>{"score": "yes"} maybe</think>{"score": "no"}') == {"score": "no"}
+
+
+def test_parse_verdict_rejects_invalid_outputs():
+    assert parse_verdict("yes") is None
+    assert parse_verdict('{"score": "maybe"}') is None
+    assert parse_verdict('{"relevant": "yes"}') is None
+    assert parse_verdict('["yes"]') is None
+    # Reasoning cut short by the token cap
+    assert parse_verdict('<think>the document {"score": "yes"') is None
+
+
+def test_parse_verdicts_requires_one_verdict_per_fact():
+    assert parse_verdicts('{"scores": ["yes", "NO"]}', 2) == [{"score": "yes"}, {"score": "no"}]
+    assert parse_verdicts('{"scores": ["yes"]}', 2) is None
+    assert parse_verdicts('{"scores": ["yes", "unsure"]}', 2) is None
+    assert parse_verdicts('{"scores": "yes"}', 1) is None
+    assert parse_verdicts("not json", 1) is None
+
+
+def test_strip_reasoning():
+    assert strip_reasoning("<think>a\nb</think> answer") == "answer"
+    assert strip_reasoning("answer <THINK>unterminated") == "answer"
+
+
+def test_batch_grading_schema_bounds_the_list():
+    scores = batch_grading_schema(3)["properties"]["scores"]
+    assert scores["minItems"] == scores["maxItems"] == 3
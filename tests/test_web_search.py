@@ -0,0 +1,73 @@
+"""
+test_web_search.py
+------------------
+Tests of the web search result cache and of speculative execution.
+"""
+
+import asyncio
+import contextvars
+import pytest
+from workflow import web_search
+from workflow.web_search import asearch_web, search_web, speculate
+
+RESULTS = [{"url": "https://example.com", "content": "RAG news"}]
+
+
+class FakeSearchTool:
+    """
+    Search tool answering with `results`, counting its calls.
+    """
+
+    def __init__(self, results):
+        self.results = results
+        self.calls = 0
+
+    def invoke(self, payload):
+        self.calls += 1
+        return self.results
+
+    async def ainvoke(self, payload):
+        return self.invoke(payload)
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    monkeypatch.setattr(web_search, "_web_search_cache", None)
+
+
+def use_tool(monkeypatch, results) -> FakeSearchTool:
+    tool = FakeSearchTool(results)
+    monkeypatch.setattr(web_search, "get_web_search_tool", lambda: tool)
+    return tool
+
+
+def test_results_are_cached_by_normalized_query(monkeypatch):
+    tool = use_tool(monkeypatch, RESULTS)
+
+    assert search_web("Latest RAG news") == RESULTS
+    assert search_web("  latest rag\tnews") == RESULTS
+    assert tool.calls == 1
+
+
+def test_errors_are_not_cached(monkeypatch):
+    tool = use_tool(monkeypatch, "HTTPError('429 Too Many Requests')")
+
+    search_web("rag")
+    search_web("rag")
+
+    assert tool.calls == 2
+
+
+def test_async_search_shares_the_cache(monkeypatch):
+    tool = use_tool(monkeypatch, RESULTS)
+    search_web("rag")
+
+    assert asyncio.run(asearch_web("rag")) == RESULTS
+    assert tool.calls == 1
+
+
+def test_speculate_runs_in_a_copy_of_the_caller_context():
+    request = contextvars.ContextVar("request", default=None)
+    request.set("abc")
+
+    assert speculate(lambda suffix: request.get() + suffix, "-1").result(timeout=5) == "abc-1"
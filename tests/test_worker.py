@@ -0,0 +1,101 @@
+"""
+test_worker.py
+--------------
+Tests of the ingestion worker loop: job results and removal of uploaded files.
+"""
+
+import threading
+import time
+import pytest
+from ingestion import worker
+from ingestion.job_queue import JobQueue
+
+
+@pytest.fixture
+def queue_path(tmp_path):
+    return str(tmp_path / "jobs.sqlite3")
+
+
+def upload(tmp_path, name="report.pdf"):
+    directory = tmp_path / "uploads" / "abc"
+    directory.mkdir(parents=True)
+    (directory / name).write_bytes(b"%PDF")
+    return {"path": str(directory / name), "name": name, "upload_dir": str(directory), "source_type": "pdf"}
+
+
+def run_until_finished(queue_path, job_id):
+    queue = JobQueue(queue_path)
+    stop = threading.Event()
+    thread = threading.Thread(target=worker.work, args=("w1", stop, queue_path))
+    thread.start()
+    try:
+        deadline = time.monotonic() + 10
+        while queue.get(job_id)["status"] in ("queued", "running"):
+            assert time.monotonic() < deadline, "job not finished"
+            time.sleep(0.01)
+    finally:
+        stop.set()
+        thread.join(10)
+    job = queue.get(job_id)
+    queue.close()
+    return job
+
+
+def test_upload_is_removed_after_a_successful_job(tmp_path, queue_path, monkeypatch):
+    payload = upload(tmp_path)
+    sources = []
+
+    def run_job(queue, job):
+        sources.append(job["payload"]["name"])
+        return {"document_ids": ["x"], "failed_sources": {}, "skipped_sources": [], "stats": {}}
+
+    monkeypatch.setattr(worker, "run_job", run_job)
+    job_id = JobQueue(queue_path).enqueue("file", payload)
+
+    job = run_until_finished(queue_path, job_id)
+
+    assert job["status"] == "done"
+    assert sources == ["report.pdf"]
+    assert not (tmp_path / "uploads" / "abc").exists()
+
+
+def test_upload_is_removed_after_a_failed_job(tmp_path, queue_path, monkeypatch):
+    payload = upload(tmp_path)
+
+    def run_job(queue, job):
+        return {"document_ids": [], "failed_sources": {"report.pdf": "broken PDF"}, "skipped_sources": [], "stats": {}}
+
+    monkeypatch.setattr(worker, "run_job", run_job)
+    job_id = JobQueue(queue_path).enqueue("file", payload)
+
+    job = run_until_finished(queue_path, job_id)
+
+    assert job["status"] == "failed"
+    assert job["error"] == "report.pdf: broken PDF"
+    assert not (tmp_path / "uploads" / "abc").exists()
+
+
+def test_upload_is_kept_for_the_worker_taking_a_job_over(tmp_path, queue_path, monkeypatch):
+    payload = upload(tmp_path)
+
+    def run_job(queue, job):
+        # Presumed dead: another worker claims the job before this one finishes
+        queue.requeue_stale(timeout=-1)
+        queue.claim("w2")
+        return {"document_ids": [], "failed_sources": {}, "skipped_sources": [], "stats": {}}
+
+    monkeypatch.setattr(worker, "run_job", run_job)
+    job_id = JobQueue(queue_path).enqueue("file", payload)
+    stop = threading.Event()
+    thread = threading.Thread(target=worker.work, args=("w1", stop, queue_path))
+    thread.start()
+    queue = JobQueue(queue_path)
+    deadline = time.monotonic() + 10
+    while queue.get(job_id)["worker"] != "w2":
+        assert time.monotonic() < deadline, "job not taken over"
+        time.sleep(0.01)
+    stop.set()
+    thread.join(10)
+    queue.close()
+
+    assert (tmp_path / "uploads" / "abc" / "report.pdf").exists()
@@ -0,0 +1,359 @@
+"""
+cache.py
+--------
+Generic key/value caches used across the pipeline.
+
+- `LRUCache`: in-process, size-bounded, with optional TTL.
+- `SQLiteCache`: on-disk, with TTL and size-bounded eviction (least recently used first).
+- `TieredCache`: an LRU layer in front of an optional SQLite layer, with hit/miss counters.
+
+Entries can carry a `tag` so that a group of entries (e.g. every entry
+derived from one chunk) can be invalidated at once.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Set
+
+
+class LRUCache:
+    """
+    Thread-safe in-process LRU cache with an optional time-to-live.
+
+    Attributes:
+        max_size (int): Maximum number of entries kept in memory.
+        ttl (Optional[float]): Entry lifetime in seconds, None for no expiry.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = None):
+        """
+        Initializes the LRU cache.
+
+        Args:
+            max_size (int, optional): Maximum number of entries. Defaults to 1024.
+            ttl (Optional[float], optional): Entry lifetime in seconds. Defaults to None (no expiry).
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._tags: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Returns the cached value for `key`, or None if absent or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, tag, created_at = entry
+            if self.ttl is not None and time.time() - created_at > self.ttl:
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, tag: Optional[str] = None) -> None:
+        """
+        Stores `value` under `key`, evicting the least recently used entries if needed.
+        """
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, tag, time.time())
+            if tag is not None:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_size:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+
+    def delete(self, key: str) -> None:
+        """
+        Removes `key` from the cache if present.
+        """
+        with self._lock:
+            self._remove(key)
+
+    def delete_tags(self, tags: Iterable[str]) -> int:
+        """
+        Removes every entry stored with one of the given tags.
+
+        Returns:
+            int: Number of removed entries.
+        """
+        removed = 0
+        with self._lock:
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._remove(key)
+                    removed += 1
+        return removed
+
+    def clear(self) -> None:
+        """
+        Removes every entry.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        tag = entry[1]
+        if tag is not None and tag in self._tags:
+            self._tags[tag].discard(key)
+            if not self._tags[tag]:
+                del self._tags[tag]
+
+
+class SQLiteCache:
+    """
+    On-disk cache backed by a SQLite table.
+
+    Values are stored as JSON. Expired entries are dropped on read and purged
+    on write; when the table grows past `max_entries`, the least recently
+    accessed entries are evicted.
+
+    Attributes:
+        path (str): Path of the SQLite database file.
+        table (str): Table holding the entries.
+        ttl (Optional[float]): Entry lifetime in seconds, None for no expiry.
+        max_entries (int): Maximum number of entries kept on disk.
+    """
+
+    def __init__(self, path: str, table: str = "cache", ttl: Optional[float] = None, max_entries: int = 100000):
+        """
+        Opens (and creates if needed) the SQLite cache.
+
+        Args:
+            path (str): Path of the SQLite database file.
+            table (str, optional): Table name. Defaults to "cache".
+            ttl (Optional[float], optional): Entry lifetime in seconds. Defaults to None (no expiry).
+            max_entries (int, optional): Maximum number of entries. Defaults to 100000.
+        """
+        self.path = path
+        self.table = table
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, tag TEXT, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_tag ON {self.table} (tag)")
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_accessed ON {self.table} (accessed_at)")
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Returns the cached value for `key`, or None if absent or expired.
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                f"SELECT value, created_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            if self.ttl is not None and now - created_at > self.ttl:
+                self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                return None
+            self._conn.execute(f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(value)
+
+    def set(self, key: str, value: Any, tag: Optional[str] = None) -> None:
+        """
+        Stores `value` under `key`, then enforces the TTL and size bounds.
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, tag, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, json.dumps(value), tag, now, now),
+            )
+            if self.ttl is not None:
+                self._conn.execute(f"DELETE FROM {self.table} WHERE created_at < ?", (now - self.ttl,))
+            (count,) = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()
+            if count > self.max_entries:
+                self._conn.execute(
+                    f"DELETE FROM {self.table} WHERE key IN "
+                    f"(SELECT key FROM {self.table} ORDER BY accessed_at ASC LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+
+    def delete(self, key: str) -> None:
+        """
+        Removes `key` from the cache if present.
+        """
+        with self._lock, self._conn:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def delete_tags(self, tags: Iterable[str]) -> int:
+        """
+        Removes every entry stored with one of the given tags.
+
+        Returns:
+            int: Number of removed entries.
+        """
+        tags = list(tags)
+        if not tags:
+            return 0
+        removed = 0
+        with self._lock, self._conn:
+            for start in range(0, len(tags), 500):
+                batch = tags[start:start + 500]
+                placeholders = ",".join("?" for _ in batch)
+                cursor = self._conn.execute(f"DELETE FROM {self.table} WHERE tag IN ({placeholders})", batch)
+                removed += cursor.rowcount
+        return removed
+
+    def clear(self) -> None:
+        """
+        Removes every entry.
+        """
+        with self._lock, self._conn:
+            self._conn.execute(f"DELETE FROM {self.table}")
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()
+        return count
+
+
+class TieredCache:
+    """
+    In-process LRU layer in front of an optional SQLite layer.
+
+    Reads go to memory first, then to disk (promoting disk hits to memory).
+    Writes go to both layers.
+
+    Attributes:
+        memory (LRUCache): The in-process layer.
+        disk (Optional[SQLiteCache]): The on-disk layer, if configured.
+        hits (int): Number of lookups answered by either layer.
+        misses (int): Number of lookups answered by neither layer.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 1024,
+        ttl: Optional[float] = None,
+        path: Optional[str] = None,
+        table: str = "cache",
+        max_disk_entries: int = 100000,
+    ):
+        """
+        Initializes the tiered cache.
+
+        Args:
+            max_size (int, optional): Maximum number of in-memory entries. Defaults to 1024.
+            ttl (Optional[float], optional): Entry lifetime in seconds. Defaults to None (no expiry).
+            path (Optional[str], optional): SQLite file for the disk layer. Defaults to None (memory only).
+            table (str, optional): SQLite table name. Defaults to "cache".
+            max_disk_entries (int, optional): Maximum number of on-disk entries. Defaults to 100000.
+        """
+        self.memory = LRUCache(max_size=max_size, ttl=ttl)
+        self.disk = None
+        if path:
+            try:
+                self.disk = SQLiteCache(path, table=table, ttl=ttl, max_entries=max_disk_entries)
+            except sqlite3.Error as e:
+                logging.error(f"Could not open cache database '{path}': {e}. Using memory only.")
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Returns the cached value for `key`, or None on a miss.
+        """
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            try:
+                value = self.disk.get(key)
+            except sqlite3.Error as e:
+                logging.warning(f"Cache disk read failed: {e}")
+                value = None
+            if value is not None:
+                self.memory.set(key, value)
+
+        with self._stats_lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any, tag: Optional[str] = None) -> None:
+        """
+        Stores `value` under `key` in every layer.
+        """
+        self.memory.set(key, value, tag=tag)
+        if self.disk is not None:
+            try:
+                self.disk.set(key, value, tag=tag)
+            except sqlite3.Error as e:
+                logging.warning(f"Cache disk write failed: {e}")
+
+    def delete_tags(self, tags: Iterable[str]) -> int:
+        """
+        Removes every entry stored with one of the given tags from every layer.
+
+        Returns:
+            int: Number of removed entries (memory and disk combined).
+        """
+        tags = list(tags)
+        removed = self.memory.delete_tags(tags)
+        if self.disk is not None:
+            try:
+                removed += self.disk.delete_tags(tags)
+            except sqlite3.Error as e:
+                logging.warning(f"Cache disk invalidation failed: {e}")
+        return removed
+
+    def clear(self) -> None:
+        """
+        Removes every entry from every layer.
+        """
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns hit/miss counters and layer sizes.
+
+        Returns:
+            Dict[str, Any]: {"hits", "misses", "hit_ratio", "memory_size", "disk_size"}.
+        """
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "memory_size": len(self.memory),
+            "disk_size": len(self.disk) if self.disk is not None else 0,
+        }
@@ -1,6 +1,11 @@
+import hashlib
 import logging
+import re
 from uuid import uuid4
 from typing import List
+from langchain.schema import Document
+
+_WORD = re.compile(r"\w+")
 
 
 def generate_list_ids(length: int) -> List[str]:
@@ -21,3 +26,71 @@ def generate_list_ids(length: int) -> List[str]:
         raise ValueError("Length must be a non-negative integer.")
 
     return [str(uuid4()) for _ in range(length)]
+
+
+def hash_text(*parts: str) -> str:
+    """
+    Computes a stable SHA-256 hex digest of one or more text parts.
+
+    Parts are joined with a separator that cannot appear in normal text,
+    so ("ab", "c") and ("a", "bc") produce different digests.
+
+    Args:
+        *parts (str): Text parts to hash.
+
+    Returns:
+        str: The hexadecimal SHA-256 digest.
+    """
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+def generate_chunk_id(source: str, content: str) -> str:
+    """
+    Generates a deterministic, content-addressed ID for a chunk.
+
+    The same chunk of the same source always gets the same ID, so re-adding
+    a source overwrites its chunks instead of duplicating them.
+
+    Args:
+        source (str): The source the chunk comes from (URL or file path).
+        content (str): The chunk content.
+
+    Returns:
+        str: The chunk ID.
+    """
+    return hash_text(source, content)
+
+
+def generate_chunk_ids(documents: List[Document]) -> List[str]:
+    """
+    Generates content-addressed IDs for a list of chunks, using their "source" metadata.
+
+    Args:
+        documents (List[Document]): The chunks to identify.
+
+    Returns:
+        List[str]: One ID per chunk.
+    """
+    return [generate_chunk_id(str(doc.metadata.get("source", "")), doc.page_content) for doc in documents]
+
+
+def simhash(text: str) -> int:
+    """
+    Computes the 64-bit SimHash of a text, over lowercase word trigrams.
+
+    Near-duplicate texts get fingerprints that differ in only a few bits.
+
+    Args:
+        text (str): The text to fingerprint.
+
+    Returns:
+        int: The fingerprint.
+    """
+    words = _WORD.findall(text.lower())
+    shingles = [" ".join(words[i:i + 3]) for i in range(max(1, len(words) - 2))]
+    weights = [0] * 64
+    for shingle in shingles:
+        value = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little")
+        for bit in range(64):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    return sum(1 << bit for bit in range(64) if weights[bit] > 0)
@@ -7,10 +7,44 @@ preserving context for retrieval-augmented generation (RAG).
 """
 
 import logging
+from functools import lru_cache
 from typing import List
+import tiktoken
 from langchain.schema import Document
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from utils.base_spliter import BaseSpliter
+from utils.id_utils import hash_text, simhash
+
+# Encoding used to measure chunk sizes (the default of `from_tiktoken_encoder`)
+ENCODING_NAME = "gpt2"
+
+
+@lru_cache(maxsize=None)
+def get_encoder(encoding_name: str = ENCODING_NAME) -> tiktoken.Encoding:
+    """
+    Returns the tiktoken encoder, loaded once per process.
+    """
+    return tiktoken.get_encoding(encoding_name)
+
+
+def count_tokens(text: str) -> int:
+    """
+    Counts the tokens of a text with the splitter's encoding.
+    """
+    return len(get_encoder().encode(text, disallowed_special=()))
+
+
+@lru_cache(maxsize=32)
+def get_text_splitter(chunk_size: int, chunk_overlap: int) -> RecursiveCharacterTextSplitter:
+    """
+    Returns the text splitter for a (chunk_size, chunk_overlap) pair, built once per process.
+    """
+    return RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+        encoding_name=ENCODING_NAME,
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        add_start_index=True,
+    )
 
 
 class TiktokenSpliter(BaseSpliter):
@@ -23,6 +57,10 @@ class TiktokenSpliter(BaseSpliter):
     Methods:
         split(docs: List[Document], chunk_size: int, chunk_overlap: int) -> List[Document]:
             Splits documents into smaller chunks while maintaining context.
+
+    Each chunk gets precomputed metadata, so downstream consumers do not re-encode it:
+    `token_count`, `start_index`/`end_index` (character offsets in the loaded page),
+    `source_hash` (hash of the loaded page) and `simhash` (near-duplicate fingerprint, hex).
     """
 
     def split(self, docs: List[Document], chunk_size: int = 250, chunk_overlap: int = 0) -> List[Document]:
@@ -41,8 +79,17 @@ class TiktokenSpliter(BaseSpliter):
             logging.warning("No documents provided for splitting.")
             return []
 
-        text_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
-            chunk_size=chunk_size,
-            chunk_overlap=chunk_overlap
-        )
-        return text_splitter.split_documents(docs)
+        text_splitter = get_text_splitter(chunk_size, chunk_overlap)
+        chunks = []
+        for doc in docs:
+            source_hash = hash_text(doc.page_content)
+            for chunk in text_splitter.split_documents([doc]):
+                start = chunk.metadata.get("start_index", -1)
+                chunk.metadata.update(
+                    token_count=count_tokens(chunk.page_content),
+                    end_index=start + len(chunk.page_content) if start >= 0 else -1,
+                    source_hash=source_hash,
+                    simhash=format(simhash(chunk.page_content), "016x"),
+                )
+                chunks.append(chunk)
+        return chunks
@@ -0,0 +1,349 @@
+"""
+tracing.py
+----------
+Per-request tracing and process-wide Prometheus metrics.
+
+- `start_trace()` opens a trace for the current request (stored in a context
+  variable, so it follows the request across threads and async tasks).
+- `span(name)` / `@traced(name)` time a block or a function. Every span is
+  recorded in the current trace (if any) and in a Prometheus histogram.
+- `LLMMetricsCallback` is attached to every LLM client and records, for each
+  call, wall time, time-to-first-token and prompt/completion token counts,
+  attributed to the innermost open span.
+"""
+
+import contextvars
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+from uuid import UUID
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from prometheus_client import Counter, Gauge, Histogram
+
+SPAN_SECONDS = Histogram(
+    "crag_span_duration_seconds",
+    "Wall time of workflow nodes and pipeline operations.",
+    ["span"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+)
+LLM_SECONDS = Histogram(
+    "crag_llm_call_duration_seconds",
+    "Wall time of LLM calls.",
+    ["span", "model"],
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+)
+LLM_ROLE_SECONDS = Histogram(
+    "crag_llm_role_call_duration_seconds",
+    "Wall time of LLM calls, per role (generator, grader, rewriter) and model.",
+    ["role", "model"],
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+)
+LLM_TTFT_SECONDS = Histogram(
+    "crag_llm_time_to_first_token_seconds",
+    "Time between the start of an LLM call and its first token.",
+    ["span", "model"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+LLM_TOKENS = Counter(
+    "crag_llm_tokens_total",
+    "LLM tokens, by kind (prompt or completion).",
+    ["span", "model", "kind"],
+)
+LLM_CALLS_PER_QUESTION = Histogram(
+    "crag_llm_calls_per_question",
+    "Number of LLM calls made to answer one question.",
+    buckets=(0, 1, 2, 3, 4, 5, 6, 8, 10, 15, 20),
+)
+LLM_QUEUE_DEPTH = Gauge(
+    "crag_llm_queue_depth",
+    "LLM calls waiting for a slot, per model.",
+    ["model"],
+)
+LLM_IN_FLIGHT = Gauge(
+    "crag_llm_in_flight",
+    "LLM calls running, per model.",
+    ["model"],
+)
+LLM_QUEUE_WAIT_SECONDS = Histogram(
+    "crag_llm_queue_wait_seconds",
+    "Time LLM calls waited for a slot, per model and role.",
+    ["model", "role"],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+LLM_COALESCED = Counter(
+    "crag_llm_coalesced_total",
+    "LLM calls served by an identical call already in flight.",
+    ["model"],
+)
+GRADING_OUTPUTS = Counter(
+    "crag_grading_outputs_total",
+    "LLM grading outputs, by grading mode (single or batch) and outcome (ok or parse_error).",
+    ["mode", "outcome"],
+)
+PREGRADE_DECISIONS = Counter(
+    "crag_pregrade_decisions_total",
+    "Pre-grading outcomes per document (accepted, rejected, or ambiguous and sent to the LLM).",
+    ["verdict"],
+)
+
+
+class Trace:
+    """
+    Timing breakdown of one request.
+
+    Attributes:
+        spans (List[Dict[str, Any]]): Completed spans, in completion order.
+        llm_calls (List[Dict[str, Any]]): Completed LLM calls, in completion order.
+    """
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+        self.llm_calls: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def add_span(self, name: str, started: float, seconds: float, attributes: Dict[str, Any]) -> None:
+        with self._lock:
+            self.spans.append({
+                "name": name,
+                "start_offset": round(started - self.started_at, 4),
+                "seconds": round(seconds, 4),
+                **attributes,
+            })
+
+    def add_llm_call(self, call: Dict[str, Any]) -> None:
+        with self._lock:
+            self.llm_calls.append(call)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Returns the breakdown: total time, spans, LLM calls, LLM time per role and token totals.
+        """
+        with self._lock:
+            role_seconds: Dict[str, float] = {}
+            for call in self.llm_calls:
+                role = call.get("role") or "unknown"
+                role_seconds[role] = round(role_seconds.get(role, 0.0) + call["seconds"], 4)
+            return {
+                "total_seconds": round(time.perf_counter() - self.started_at, 4),
+                "spans": list(self.spans),
+                "llm_calls": list(self.llm_calls),
+                "llm_call_count": len(self.llm_calls),
+                "llm_seconds_by_role": role_seconds,
+                "prompt_tokens": sum(call.get("prompt_tokens") or 0 for call in self.llm_calls),
+                "completion_tokens": sum(call.get("completion_tokens") or 0 for call in self.llm_calls),
+            }
+
+
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("crag_trace", default=None)
+_current_span: contextvars.ContextVar[str] = contextvars.ContextVar("crag_span", default="")
+
+
+def current_trace() -> Optional[Trace]:
+    """
+    Returns the trace of the current request, if one was started.
+    """
+    return _current_trace.get()
+
+
+def current_span() -> str:
+    """
+    Returns the name of the innermost open span ("" outside of any span).
+    """
+    return _current_span.get()
+
+
+@contextmanager
+def start_trace() -> Iterator[Trace]:
+    """
+    Opens a trace for the current request.
+
+    Yields:
+        Trace: The trace collecting every span and LLM call of the request.
+    """
+    trace = Trace()
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Dict[str, Any]]:
+    """
+    Times a block and records it in the current trace and in Prometheus.
+
+    Args:
+        name (str): Span name (e.g. "vector_search").
+        **attributes: Extra fields stored with the span in the trace.
+
+    Yields:
+        Dict[str, Any]: The span attributes, which the block may complete (e.g. with result counts).
+    """
+    token = _current_span.set(name)
+    started = time.perf_counter()
+    try:
+        yield attributes
+    finally:
+        seconds = time.perf_counter() - started
+        _current_span.reset(token)
+        SPAN_SECONDS.labels(span=name).observe(seconds)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add_span(name, started, seconds, attributes)
+
+
+@contextmanager
+def count_llm_calls() -> Iterator[Trace]:
+    """
+    Records the number of LLM calls made inside the block in `LLM_CALLS_PER_QUESTION`.
+
+    Reuses the current trace, or opens one if none is active.
+
+    Yields:
+        Trace: The active trace.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        with start_trace() as trace:
+            yield trace
+            LLM_CALLS_PER_QUESTION.observe(len(trace.llm_calls))
+        return
+
+    before = len(trace.llm_calls)
+    yield trace
+    LLM_CALLS_PER_QUESTION.observe(len(trace.llm_calls) - before)
+
+
+def traced(name: str):
+    """
+    Decorator timing every call of a sync or async function as a span.
+
+    Args:
+        name (str): Span name.
+    """
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+class LLMMetricsCallback(BaseCallbackHandler):
+    """
+    LangChain callback recording wall time, time-to-first-token and token usage of LLM calls.
+
+    Calls are attributed to the span that was open when they started.
+    """
+
+    def __init__(self):
+        self._runs: Dict[UUID, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id: UUID, serialized: Optional[Dict[str, Any]], kwargs: Dict[str, Any]) -> None:
+        params = kwargs.get("invocation_params") or {}
+        metadata = kwargs.get("metadata") or {}
+        model = params.get("model") or metadata.get("ls_model_name") or "unknown"
+        with self._lock:
+            self._runs[run_id] = {
+                "span": current_span() or "llm",
+                "model": model,
+                "role": metadata.get("llm_role"),
+                "started": time.perf_counter(),
+                "first_token": None,
+                "trace": current_trace(),
+            }
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs: Any) -> None:
+        self._start(run_id, serialized, kwargs)
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, **kwargs: Any) -> None:
+        self._start(run_id, serialized, kwargs)
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            run = self._runs.get(run_id)
+            if run is not None and run["first_token"] is None:
+                run["first_token"] = time.perf_counter()
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is None or _is_coalesced(response):
+            # A coalesced duplicate: the call it waited for is already counted
+            return
+
+        ended = time.perf_counter()
+        prompt_tokens, completion_tokens = _token_usage(response)
+        call = {
+            "span": run["span"],
+            "model": run["model"],
+            "role": run["role"],
+            "seconds": round(ended - run["started"], 4),
+            "ttft_seconds": round(run["first_token"] - run["started"], 4) if run["first_token"] else None,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+        }
+
+        labels = {"span": run["span"], "model": run["model"]}
+        LLM_SECONDS.labels(**labels).observe(call["seconds"])
+        if run["role"]:
+            LLM_ROLE_SECONDS.labels(role=run["role"], model=run["model"]).observe(call["seconds"])
+        if call["ttft_seconds"] is not None:
+            LLM_TTFT_SECONDS.labels(**labels).observe(call["ttft_seconds"])
+        if prompt_tokens:
+            LLM_TOKENS.labels(kind="prompt", **labels).inc(prompt_tokens)
+        if completion_tokens:
+            LLM_TOKENS.labels(kind="completion", **labels).inc(completion_tokens)
+
+        if run["trace"] is not None:
+            run["trace"].add_llm_call(call)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            self._runs.pop(run_id, None)
+
+
+def _is_coalesced(response: LLMResult) -> bool:
+    """
+    Tells whether an LLM result was shared by a coalesced call (see `llm_scheduler`).
+    """
+    return any(
+        (generation.generation_info or {}).get("coalesced")
+        for generations in response.generations
+        for generation in generations
+    )
+
+
+def _token_usage(response: LLMResult):
+    """
+    Extracts (prompt_tokens, completion_tokens) from an LLM result, None when unknown.
+    """
+    for generations in response.generations:
+        for generation in generations:
+            message = getattr(generation, "message", None)
+            usage = getattr(message, "usage_metadata", None)
+            if usage:
+                return usage.get("input_tokens"), usage.get("output_tokens")
+            info = generation.generation_info or {}
+            if "prompt_eval_count" in info or "eval_count" in info:
+                return info.get("prompt_eval_count"), info.get("eval_count")
+    return None, None
+
+
+llm_metrics_callback = LLMMetricsCallback()
@@ -15,6 +15,7 @@ class GraphState(TypedDict):
         documents (List[Document]): List of retrieved or web-searched documents.
         steps (List[str]): List of processing steps already completed.
         retriever (Optional[Callable]): The document retriever used for fetching information.
+        web_results (Optional[List[dict]]): Web search results fetched speculatively during grading.
     """
 
     question: str
@@ -24,3 +25,4 @@ class GraphState(TypedDict):
     documents: List[Document]
     steps: List[str]
     retriever: Optional[Callable]  # More explicit than Any
+    web_results: Optional[List[dict]]
@@ -0,0 +1,271 @@
+"""
+batch.py
+--------
+Bulk question answering with cross-question batching.
+
+Questions are read from JSON Lines (one {"id", "question"} object, or one
+JSON string, per line) and answered concurrently on one event loop:
+- questions are embedded in groups with one `embed_documents` call, and each
+  group is sent to the vector store as one grouped search;
+- the next group is embedded and retrieved while the previous questions are
+  graded and answered, so retrieval overlaps with LLM work;
+- a global limit caps the LLM calls in flight across every question
+  (`set_llm_concurrency_limit`), so grading of many questions is pipelined
+  without flooding Ollama.
+
+Every result is appended to a checkpoint file (JSON Lines) as soon as it is
+known; restarting a batch with the same checkpoint skips the questions that
+were already answered.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Set
+from langchain.schema import Document
+from generation.llm_manager import set_llm_concurrency_limit
+from workflow.graph import arun_workflow
+from app.config import BATCH_CONCURRENCY, BATCH_LLM_CONCURRENCY, BATCH_EMBED_SIZE
+
+# Documents retrieved per question (the graph's retrieve node uses the default count)
+RETRIEVE_COUNT = 4
+
+
+def read_questions(lines: Iterable[str]) -> List[Dict[str, str]]:
+    """
+    Parses batch questions from JSON Lines.
+
+    Args:
+        lines (Iterable[str]): The input lines. Blank lines are ignored; questions
+            without an "id" are identified by their line number.
+
+    Returns:
+        List[Dict[str, str]]: {"id", "question"} items, in input order.
+
+    Raises:
+        ValueError: If a line is not valid JSON, has no question, or repeats an ID.
+    """
+    items, seen = [], set()
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Line {number}: invalid JSON ({e}).")
+
+        if isinstance(record, str):
+            record = {"question": record}
+        question = record.get("question") if isinstance(record, dict) else None
+        if not isinstance(question, str) or not question.strip():
+            raise ValueError(f"Line {number}: missing question.")
+
+        item_id = str(record.get("id", number))
+        if item_id in seen:
+            raise ValueError(f"Line {number}: duplicate id {item_id!r}.")
+        seen.add(item_id)
+        items.append({"id": item_id, "question": question})
+    return items
+
+
+class PrefetchedRetriever:
+    """
+    Retriever for one question of a batch, serving the embedding and documents
+    fetched for the whole group. Any other query goes to the repository.
+
+    Attributes:
+        repository: The underlying article repository.
+        question (str): The question the prefetched results belong to.
+    """
+
+    def __init__(self, repository, question: str, embedding: List[float], documents: List[Document]):
+        """
+        Args:
+            repository: The article repository.
+            question (str): The question the prefetched results belong to.
+            embedding (List[float]): The question embedding.
+            documents (List[Document]): The documents retrieved for the question.
+        """
+        self.repository = repository
+        self.question = question
+        self._embedding = embedding
+        self._documents = documents
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.repository, name)
+
+    def embed_query(self, query: str) -> List[float]:
+        if query == self.question:
+            return self._embedding
+        return self.repository.embed_query(query)
+
+    async def aembed_query(self, query: str) -> List[float]:
+        if query == self.question:
+            return self._embedding
+        return await self.repository.aembed_query(query)
+
+    def _prefetched(self, query: str, count: int) -> bool:
+        return query == self.question and count == RETRIEVE_COUNT
+
+    def retrieve(self, query: str, count: int = RETRIEVE_COUNT, embedding: Optional[List[float]] = None) -> List[Document]:
+        if self._prefetched(query, count):
+            return list(self._documents)
+        return self.repository.retrieve(query, count, embedding)
+
+    async def aretrieve(self, query: str, count: int = RETRIEVE_COUNT, embedding: Optional[List[float]] = None) -> List[Document]:
+        if self._prefetched(query, count):
+            return list(self._documents)
+        return await self.repository.aretrieve(query, count, embedding)
+
+
+class BatchRunner:
+    """
+    Answers a batch of questions concurrently, with grouped embedding and retrieval.
+
+    Attributes:
+        repository: The article repository.
+        concurrency (int): Questions in flight.
+        llm_concurrency (int): LLM calls in flight across the batch (0 for no cap).
+        embed_batch_size (int): Questions embedded and retrieved together.
+        checkpoint_path (Optional[str]): JSON Lines file recording every result.
+    """
+
+    def __init__(
+        self,
+        repository,
+        concurrency: int = BATCH_CONCURRENCY,
+        llm_concurrency: int = BATCH_LLM_CONCURRENCY,
+        embed_batch_size: int = BATCH_EMBED_SIZE,
+        checkpoint_path: Optional[str] = None,
+    ):
+        self.repository = repository
+        self.concurrency = max(1, concurrency)
+        self.llm_concurrency = llm_concurrency
+        self.embed_batch_size = max(1, embed_batch_size)
+        self.checkpoint_path = checkpoint_path
+
+    def completed(self) -> Dict[str, dict]:
+        """
+        Reads the answered questions from the checkpoint file.
+
+        Failed questions are not considered completed, so they are retried.
+
+        Returns:
+            Dict[str, dict]: The checkpointed results, by question ID.
+        """
+        results: Dict[str, dict] = {}
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return results
+        with open(self.checkpoint_path, encoding="utf-8") as file:
+            for line in file:
+                try:
+                    result = json.loads(line)
+                except json.JSONDecodeError:
+                    # A run interrupted mid-write leaves a truncated last line
+                    continue
+                if isinstance(result, dict) and "id" in result and "error" not in result:
+                    results[str(result["id"])] = result
+        return results
+
+    def _checkpoint(self, result: dict) -> None:
+        if not self.checkpoint_path:
+            return
+        directory = os.path.dirname(self.checkpoint_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.checkpoint_path, "a", encoding="utf-8") as file:
+            file.write(json.dumps(result) + "\n")
+
+    async def _prefetch(self, questions: List[str]) -> List[Optional[PrefetchedRetriever]]:
+        """
+        Embeds and retrieves a group of questions; on failure the questions fall
+        back to retrieving on their own.
+        """
+        try:
+            embeddings = await asyncio.to_thread(self.repository.embed_queries, questions)
+            grouped = await asyncio.to_thread(self.repository.retrieve_many, questions, RETRIEVE_COUNT, embeddings)
+        except Exception as e:
+            logging.warning(f"Grouped retrieval failed for {len(questions)} questions: {e}. Retrieving one by one.")
+            return [None] * len(questions)
+        return [
+            PrefetchedRetriever(self.repository, question, embedding, documents)
+            for question, embedding, documents in zip(questions, embeddings, grouped)
+        ]
+
+    async def _answer(self, item: Dict[str, str], retriever) -> dict:
+        started = time.perf_counter()
+        try:
+            final_state = await arun_workflow(item["question"], retriever or self.repository)
+            return {
+                "id": item["id"],
+                "question": item["question"],
+                "answer": final_state["generation"],
+                "steps": final_state["steps"],
+                "seconds": round(time.perf_counter() - started, 3),
+            }
+        except Exception as e:
+            logging.error(f"Batch question {item['id']} failed: {e}")
+            return {"id": item["id"], "question": item["question"], "error": str(e)}
+
+    async def arun(self, items: List[Dict[str, str]], replay: bool = False) -> AsyncIterator[dict]:
+        """
+        Answers the questions not yet in the checkpoint, yielding results as they complete.
+
+        Args:
+            items (List[Dict[str, str]]): {"id", "question"} items (see `read_questions`).
+            replay (bool, optional): Also yield the results already in the checkpoint, first.
+
+        Yields:
+            dict: {"id", "question", "answer", "steps", "seconds"}, or {"id", "question", "error"}.
+        """
+        done = self.completed()
+        if replay:
+            for item in items:
+                if item["id"] in done:
+                    yield done[item["id"]]
+        pending = [item for item in items if item["id"] not in done]
+        if not pending:
+            return
+
+        results: asyncio.Queue = asyncio.Queue()
+        slots = asyncio.Semaphore(self.concurrency)
+        tasks: Set[asyncio.Task] = set()
+
+        async def answer(item: Dict[str, str], retriever) -> None:
+            try:
+                result = await self._answer(item, retriever)
+            finally:
+                slots.release()
+            await results.put(result)
+
+        async def produce() -> None:
+            # Tasks started here inherit the LLM limit set in this task's context
+            set_llm_concurrency_limit(self.llm_concurrency)
+            for start in range(0, len(pending), self.embed_batch_size):
+                group = pending[start:start + self.embed_batch_size]
+                retrievers = await self._prefetch([item["question"] for item in group])
+                for item, retriever in zip(group, retrievers):
+                    await slots.acquire()
+                    task = asyncio.create_task(answer(item, retriever))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+
+        producer = asyncio.create_task(produce())
+        try:
+            for _ in range(len(pending)):
+                getter = asyncio.ensure_future(results.get())
+                if not producer.done():
+                    await asyncio.wait({getter, producer}, return_when=asyncio.FIRST_COMPLETED)
+                if not getter.done() and producer.exception() is not None:
+                    # The producer failed: surface its error instead of waiting forever
+                    getter.cancel()
+                    raise producer.exception()
+                result = await getter
+                self._checkpoint(result)
+                yield result
+        finally:
+            producer.cancel()
+            for task in list(tasks):
+                task.cancel()
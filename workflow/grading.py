@@ -0,0 +1,252 @@
+"""
+grading.py
+----------
+Grading strategies used by the `grade_documents` node, with async
+counterparts (prefixed with `a`) used by the async graph.
+Each strategy returns one grading result per document, in the original
+document order. A `None` entry means the document was not graded because
+an early-stop condition was reached.
+"""
+
+import asyncio
+import contextvars
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Awaitable, Callable, List, Optional
+from langchain.schema import Document
+
+
+def is_relevant(result: Optional[dict]) -> bool:
+    """
+    Tells whether a grading result marks the document as relevant.
+
+    Args:
+        result (Optional[dict]): A grading result such as {"score": "yes"}.
+
+    Returns:
+        bool: True only for an explicit "yes" score.
+    """
+    return bool(result) and result.get("score") == "yes"
+
+
+def should_stop(results: List[Optional[dict]], stop_on_irrelevant: bool, min_relevant: int) -> bool:
+    """
+    Checks whether the early-stop conditions are met for the results gathered so far.
+
+    Args:
+        results (List[Optional[dict]]): Results gathered so far (None for pending documents).
+        stop_on_irrelevant (bool): Stop as soon as one document is graded "no".
+        min_relevant (int): Stop once this many documents are graded "yes" (0 disables it).
+
+    Returns:
+        bool: True if grading can stop.
+    """
+    graded = [r for r in results if r is not None]
+    if stop_on_irrelevant and any(not is_relevant(r) for r in graded):
+        return True
+    if min_relevant > 0 and sum(1 for r in graded if is_relevant(r)) >= min_relevant:
+        return True
+    return False
+
+
+def grade_sequential(
+    question: str,
+    documents: List[Document],
+    grading_chain: Callable[[str, str], dict],
+    stop_on_irrelevant: bool = False,
+    min_relevant: int = 0,
+) -> List[Optional[dict]]:
+    """
+    Grades documents one after the other.
+
+    Args:
+        question (str): The user question.
+        documents (List[Document]): Retrieved documents to grade.
+        grading_chain (Callable[[str, str], dict]): Callable returned by `get_grading_chain`.
+        stop_on_irrelevant (bool, optional): Stop at the first "no". Defaults to False.
+        min_relevant (int, optional): Stop once this many "yes" are collected. Defaults to 0 (disabled).
+
+    Returns:
+        List[Optional[dict]]: One result per document, None for documents left ungraded.
+    """
+    results: List[Optional[dict]] = [None] * len(documents)
+
+    for index, doc in enumerate(documents):
+        results[index] = grading_chain(question, doc.page_content)
+        if should_stop(results, stop_on_irrelevant, min_relevant):
+            break
+
+    return results
+
+
+def grade_concurrent(
+    question: str,
+    documents: List[Document],
+    grading_chain: Callable[[str, str], dict],
+    max_workers: int = 4,
+    stop_on_irrelevant: bool = False,
+    min_relevant: int = 0,
+) -> List[Optional[dict]]:
+    """
+    Grades documents in parallel with a bounded thread pool.
+
+    Grading calls are I/O bound (HTTP calls to Ollama), so threads are enough
+    to overlap them. Results are stored by document index so the original order
+    is preserved regardless of completion order. When an early-stop condition
+    is reached, pending calls are cancelled and their documents stay ungraded.
+
+    Args:
+        question (str): The user question.
+        documents (List[Document]): Retrieved documents to grade.
+        grading_chain (Callable[[str, str], dict]): Callable returned by `get_grading_chain`.
+        max_workers (int, optional): Maximum number of concurrent grading calls. Defaults to 4.
+        stop_on_irrelevant (bool, optional): Stop at the first "no". Defaults to False.
+        min_relevant (int, optional): Stop once this many "yes" are collected. Defaults to 0 (disabled).
+
+    Returns:
+        List[Optional[dict]]: One result per document, None for documents left ungraded.
+    """
+    results: List[Optional[dict]] = [None] * len(documents)
+    if not documents:
+        return results
+
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(documents))))
+    try:
+        # Each call runs in a copy of the caller's context, so tracing spans follow it
+        futures = {
+            executor.submit(contextvars.copy_context().run, grading_chain, question, doc.page_content): index
+            for index, doc in enumerate(documents)
+        }
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                results[index] = future.result()
+            except Exception as e:
+                logging.warning(f"Grading of document {index} failed: {e}. Defaulting to 'no'.")
+                results[index] = {"score": "no"}
+
+            if should_stop(results, stop_on_irrelevant, min_relevant):
+                logging.info("Grading early stop reached; cancelling pending grading calls.")
+                break
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return results
+
+
+def grade_batched(
+    question: str,
+    documents: List[Document],
+    batch_grading_chain: Callable[[str, List[str]], Optional[List[dict]]],
+    grading_chain: Callable[[str, str], dict],
+    max_workers: int = 4,
+) -> List[Optional[dict]]:
+    """
+    Grades all documents with a single batched LLM call.
+
+    When the batched output cannot be parsed into one verdict per document,
+    falls back to per-document grading with `grade_concurrent`.
+
+    Args:
+        question (str): The user question.
+        documents (List[Document]): Retrieved documents to grade.
+        batch_grading_chain (Callable): Callable returned by `get_batch_grading_chain`.
+        grading_chain (Callable[[str, str], dict]): Callable returned by `get_grading_chain`, used as fallback.
+        max_workers (int, optional): Concurrency of the per-document fallback. Defaults to 4.
+
+    Returns:
+        List[Optional[dict]]: One result per document.
+    """
+    if not documents:
+        return []
+
+    results = batch_grading_chain(question, [doc.page_content for doc in documents])
+    if results is not None:
+        return results
+
+    logging.warning("Batched grading output could not be parsed; falling back to per-document grading.")
+    return grade_concurrent(question, documents, grading_chain, max_workers=max_workers)
+
+
+async def agrade_sequential(
+    question: str,
+    documents: List[Document],
+    grading_chain: Callable[[str, str], Awaitable[dict]],
+    stop_on_irrelevant: bool = False,
+    min_relevant: int = 0,
+) -> List[Optional[dict]]:
+    """
+    Async version of `grade_sequential`, taking an async grading chain.
+    """
+    results: List[Optional[dict]] = [None] * len(documents)
+
+    for index, doc in enumerate(documents):
+        results[index] = await grading_chain(question, doc.page_content)
+        if should_stop(results, stop_on_irrelevant, min_relevant):
+            break
+
+    return results
+
+
+async def agrade_concurrent(
+    question: str,
+    documents: List[Document],
+    grading_chain: Callable[[str, str], Awaitable[dict]],
+    max_workers: int = 4,
+    stop_on_irrelevant: bool = False,
+    min_relevant: int = 0,
+) -> List[Optional[dict]]:
+    """
+    Async version of `grade_concurrent`: grading coroutines run concurrently,
+    bounded by a semaphore of `max_workers`. Pending coroutines are cancelled
+    once an early-stop condition is reached.
+    """
+    results: List[Optional[dict]] = [None] * len(documents)
+    if not documents:
+        return results
+
+    semaphore = asyncio.Semaphore(max(1, max_workers))
+
+    async def grade(index: int, doc: Document):
+        async with semaphore:
+            try:
+                return index, await grading_chain(question, doc.page_content)
+            except Exception as e:
+                logging.warning(f"Grading of document {index} failed: {e}. Defaulting to 'no'.")
+                return index, {"score": "no"}
+
+    tasks = [asyncio.ensure_future(grade(index, doc)) for index, doc in enumerate(documents)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            index, result = await next_done
+            results[index] = result
+
+            if should_stop(results, stop_on_irrelevant, min_relevant):
+                logging.info("Grading early stop reached; cancelling pending grading calls.")
+                break
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    return results
+
+
+async def agrade_batched(
+    question: str,
+    documents: List[Document],
+    batch_grading_chain: Callable[[str, List[str]], Awaitable[Optional[List[dict]]]],
+    grading_chain: Callable[[str, str], Awaitable[dict]],
+    max_workers: int = 4,
+) -> List[Optional[dict]]:
+    """
+    Async version of `grade_batched`, falling back to `agrade_concurrent`.
+    """
+    if not documents:
+        return []
+
+    results = await batch_grading_chain(question, [doc.page_content for doc in documents])
+    if results is not None:
+        return results
+
+    logging.warning("Batched grading output could not be parsed; falling back to per-document grading.")
+    return await agrade_concurrent(question, documents, grading_chain, max_workers=max_workers)
@@ -1,16 +1,45 @@
+import asyncio
 import logging
+from concurrent.futures import Future
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
 from langchain.schema import Document
+from langchain_core.runnables import RunnableConfig
 from langgraph.graph import START, END, StateGraph
 
 from utils.types import GraphState
+from generation.context_builder import build_context
 from generation.chains import (
     get_rag_chain,
     get_grading_chain,
+    get_batch_grading_chain,
     get_rewrite_web_search_chain,
+    RAG_ERROR_MESSAGE,
+)
+from workflow.semantic_cache import get_answer_cache
+from workflow.web_search import search_web, asearch_web, speculate
+from workflow.grading import (
+    grade_sequential,
+    grade_concurrent,
+    grade_batched,
+    agrade_sequential,
+    agrade_concurrent,
+    agrade_batched,
+    is_relevant,
+    should_stop,
+)
+from utils.tracing import count_llm_calls, span, traced
+from workflow.pregrading import pregrade, merge_grades
+from app.config import (
+    GRADING_MODE,
+    GRADING_CONCURRENCY,
+    GRADING_STOP_ON_IRRELEVANT,
+    GRADING_MIN_RELEVANT,
+    WEB_SEARCH_SPECULATIVE,
+    PREGRADE_ENABLED,
 )
-from langchain_community.tools.tavily_search import TavilySearchResults
 
 
+@traced("retrieve")
 def retrieve(state: GraphState) -> GraphState:
     """
     Step 1: Retrieves documents using the retriever defined in the state.
@@ -29,34 +58,45 @@ def retrieve(state: GraphState) -> GraphState:
     return {**state, "documents": documents, "steps": steps}
 
 
-def grade_documents(state: GraphState) -> GraphState:
+@traced("retrieve")
+async def aretrieve(state: GraphState) -> GraphState:
     """
-    Step 2: Evaluates the relevance of retrieved documents using the grading chain.
-    If documents are not relevant, sets 'search' to "Yes".
+    Async version of `retrieve`.
+    """
+    question = state["question"]
+    retriever = state["retriever"]
+    documents = await retriever.aretrieve(question)
+    steps = state["steps"] + ["retrieve_documents"]
+
+    return {**state, "documents": documents, "steps": steps}
+
+
+def _apply_grades(state: GraphState, results: List[Optional[dict]]) -> GraphState:
+    """
+    Keeps the documents graded as relevant and sets the search flag.
 
     Args:
         state (GraphState): The current graph state.
+        results (List[Optional[dict]]): One grading result per document (None if ungraded).
 
     Returns:
         GraphState: Updated state with filtered documents and a search flag.
     """
-    question = state["question"]
     documents = state["documents"]
     steps = state["steps"] + ["grade_document_retrieval"]
 
-    grading_chain = get_grading_chain()
-
     filtered_docs = []
     search_needed = "No"
 
-    for doc in documents:
-        # Calls the grading chain to determine relevance
-        result = grading_chain(question, doc.page_content)
-        if result.get("score") == "yes":
+    for doc, result in zip(documents, results):
+        if result is None:
+            # Not graded (early stop): the search decision is already settled
+            continue
+        if is_relevant(result):
             filtered_docs.append(doc)
         else:
             search_needed = "Yes"
-        
+
         score = result.get("score")
         logging.warning(f"Grading step :  Result {result}; Grading score is : {score} - search_needed : {search_needed}?")
 
@@ -64,6 +104,221 @@ def grade_documents(state: GraphState) -> GraphState:
     return {**state, "documents": filtered_docs, "search": search_needed, "steps": steps}
 
 
+@traced("grade_documents")
+def grade_documents(state: GraphState) -> GraphState:
+    """
+    Step 2: Evaluates the relevance of retrieved documents using the grading chain.
+    If documents are not relevant, sets 'search' to "Yes".
+
+    Grading runs sequentially, concurrently or as a single batched call depending
+    on `GRADING_MODE`. Documents left ungraded by an early stop are dropped.
+
+    With `WEB_SEARCH_SPECULATIVE`, the query rewrite and the web search start
+    alongside grading; their result is kept only if grading asks for a search.
+
+    Args:
+        state (GraphState): The current graph state.
+
+    Returns:
+        GraphState: Updated state with filtered documents and a search flag.
+    """
+    question = state["question"]
+    if not WEB_SEARCH_SPECULATIVE:
+        return _apply_grades(state, _grade(question, state["documents"]))
+
+    speculation = speculate(_speculative_search, question)
+    try:
+        graded = _apply_grades(state, _grade(question, state["documents"]))
+    except Exception:
+        speculation.cancel()
+        raise
+    return _resolve_speculation(graded, speculation)
+
+
+def _pregrade(question: str, documents: List[Document]) -> Tuple[List[Optional[dict]], List[int], int]:
+    """
+    Runs the local pre-grader (when enabled) and tells what is left for the LLM grader.
+
+    Returns:
+        Tuple: The pre-grading results, the indexes of the documents still to grade
+        (empty if the early-stop conditions are already met) and the `min_relevant`
+        target left for them.
+    """
+    if not PREGRADE_ENABLED:
+        return [None] * len(documents), list(range(len(documents))), GRADING_MIN_RELEVANT
+
+    pregraded = pregrade(question, documents)
+    if should_stop(pregraded, GRADING_STOP_ON_IRRELEVANT, GRADING_MIN_RELEVANT):
+        return pregraded, [], GRADING_MIN_RELEVANT
+
+    pending = [index for index, result in enumerate(pregraded) if result is None]
+    accepted = sum(1 for result in pregraded if is_relevant(result))
+    min_relevant = GRADING_MIN_RELEVANT - accepted if GRADING_MIN_RELEVANT > 0 else 0
+    return pregraded, pending, min_relevant
+
+
+def _grade(question: str, documents: List[Document]) -> List[Optional[dict]]:
+    """
+    Grades the documents: the pre-grader settles the clear-cut ones, the strategy
+    selected by `GRADING_MODE` grades the others with the LLM.
+    """
+    pregraded, pending, min_relevant = _pregrade(question, documents)
+    if not pending:
+        return pregraded
+    documents = [documents[index] for index in pending]
+
+    grading_chain = get_grading_chain()
+
+    if GRADING_MODE == "batched":
+        results = grade_batched(
+            question,
+            documents,
+            get_batch_grading_chain(),
+            grading_chain,
+            max_workers=GRADING_CONCURRENCY,
+        )
+    elif GRADING_MODE == "concurrent":
+        results = grade_concurrent(
+            question,
+            documents,
+            grading_chain,
+            max_workers=GRADING_CONCURRENCY,
+            stop_on_irrelevant=GRADING_STOP_ON_IRRELEVANT,
+            min_relevant=min_relevant,
+        )
+    else:
+        results = grade_sequential(
+            question,
+            documents,
+            grading_chain,
+            stop_on_irrelevant=GRADING_STOP_ON_IRRELEVANT,
+            min_relevant=min_relevant,
+        )
+
+    return merge_grades(pregraded, pending, results)
+
+
+@traced("grade_documents")
+async def agrade_documents(state: GraphState) -> GraphState:
+    """
+    Async version of `grade_documents`, grading with `ainvoke`.
+    """
+    question = state["question"]
+    if not WEB_SEARCH_SPECULATIVE:
+        return _apply_grades(state, await _agrade(question, state["documents"]))
+
+    speculation = asyncio.create_task(_aspeculative_search(question))
+    try:
+        graded = _apply_grades(state, await _agrade(question, state["documents"]))
+    except BaseException:
+        speculation.cancel()
+        raise
+    return await _aresolve_speculation(graded, speculation)
+
+
+async def _agrade(question: str, documents: List[Document]) -> List[Optional[dict]]:
+    """
+    Async version of `_grade`.
+    """
+    pregraded, pending, min_relevant = _pregrade(question, documents)
+    if not pending:
+        return pregraded
+    documents = [documents[index] for index in pending]
+
+    grading_chain = get_grading_chain(asynchronous=True)
+
+    if GRADING_MODE == "batched":
+        results = await agrade_batched(
+            question,
+            documents,
+            get_batch_grading_chain(asynchronous=True),
+            grading_chain,
+            max_workers=GRADING_CONCURRENCY,
+        )
+    elif GRADING_MODE == "concurrent":
+        results = await agrade_concurrent(
+            question,
+            documents,
+            grading_chain,
+            max_workers=GRADING_CONCURRENCY,
+            stop_on_irrelevant=GRADING_STOP_ON_IRRELEVANT,
+            min_relevant=min_relevant,
+        )
+    else:
+        results = await agrade_sequential(
+            question,
+            documents,
+            grading_chain,
+            stop_on_irrelevant=GRADING_STOP_ON_IRRELEVANT,
+            min_relevant=min_relevant,
+        )
+
+    return merge_grades(pregraded, pending, results)
+
+
+def _speculative_search(question: str) -> Tuple[str, Any]:
+    """
+    Rewrites the question and searches the web ahead of the grading verdict.
+
+    Returns:
+        Tuple[str, Any]: The rewritten query and the web search results.
+    """
+    with span("speculative_web_search"):
+        query = _rewritten_query(question, get_rewrite_web_search_chain()(question=question))
+        return query, search_web(query)
+
+
+async def _aspeculative_search(question: str) -> Tuple[str, Any]:
+    """
+    Async version of `_speculative_search`.
+    """
+    with span("speculative_web_search"):
+        result = await get_rewrite_web_search_chain(asynchronous=True)(question=question)
+        query = _rewritten_query(question, result)
+        return query, await asearch_web(query)
+
+
+def _apply_speculation(state: GraphState, query: str, results: Any) -> GraphState:
+    """
+    Stores the speculative rewrite and search results for the corrective path.
+    """
+    logging.warning(f"Using speculative web search results for query: {query}")
+    steps = state["steps"] + ["speculative_web_search"]
+    return {**state, "web_search_query": query, "web_results": results, "steps": steps}
+
+
+def _resolve_speculation(state: GraphState, speculation: Future) -> GraphState:
+    """
+    Keeps the speculative web search if grading asked for a search, drops it otherwise.
+    """
+    if state["search"] != "Yes":
+        speculation.cancel()
+        return state
+
+    try:
+        query, results = speculation.result()
+    except Exception as e:
+        logging.warning(f"Speculative web search failed: {e}. Falling back to the regular path.")
+        return state
+    return _apply_speculation(state, query, results)
+
+
+async def _aresolve_speculation(state: GraphState, speculation: "asyncio.Task") -> GraphState:
+    """
+    Async version of `_resolve_speculation`.
+    """
+    if state["search"] != "Yes":
+        speculation.cancel()
+        return state
+
+    try:
+        query, results = await speculation
+    except Exception as e:
+        logging.warning(f"Speculative web search failed: {e}. Falling back to the regular path.")
+        return state
+    return _apply_speculation(state, query, results)
+
+
 def decide_to_generate(state: GraphState) -> str:
     """
     Conditional decision:
@@ -79,6 +334,31 @@ def decide_to_generate(state: GraphState) -> str:
     return "search" if state["search"] == "Yes" else "generate"
 
 
+def _rewritten_query(question: str, result: dict) -> str:
+    """
+    Extracts the rewritten query from the rewrite chain output, falling back to the question.
+    """
+    try:
+        return result['query_search']
+    except Exception as e:
+        logging.warning(f"Query rewriting failed: {e}. Falling back to original question.")
+        return question
+
+
+def _apply_rewrite(state: GraphState, result: dict) -> GraphState:
+    """
+    Stores the rewritten web search query, falling back to the original question.
+    """
+    question = state["question"]
+    steps = state["steps"] + ["rewrite_web_search_query"]
+    web_search_query = _rewritten_query(question, result)
+
+    logging.warning(f"User query rewriting for web search performed ; Initial version : {question} ; rewrite version : {result}")
+
+    return {**state, "web_search_query": web_search_query, "steps": steps}
+
+
+@traced("rewrite_web_search_query")
 def rewrite_web_search_query(state: GraphState) -> GraphState:
     """
     Step 3 (if needed): Rewrites the search query before performing a web search.
@@ -89,27 +369,53 @@ def rewrite_web_search_query(state: GraphState) -> GraphState:
     Returns:
         GraphState: Updated state with rewritten search query.
     """
-    question = state["question"]
-    steps = state["steps"] + ["rewrite_web_search_query"]
+    if state.get("web_results") is not None:
+        # Already rewritten speculatively during grading
+        return {**state, "steps": state["steps"] + ["rewrite_web_search_query"]}
 
     rewrite_web_search_chain = get_rewrite_web_search_chain()
+    result = rewrite_web_search_chain(question=state["question"])
 
-    try:
-        result = rewrite_web_search_chain(question=question)
-        web_search_query = result['query_search']
-    except Exception as e:
-        logging.warning(f"Query rewriting failed: {e}. Falling back to original question.")
-        web_search_query = question
+    return _apply_rewrite(state, result)
 
-    logging.warning(f"User query rewriting for web search performed ; Initial version : {question} ; rewrite version : {result}")
 
-    return {**state, "web_search_query": web_search_query, "steps": steps}
+@traced("rewrite_web_search_query")
+async def arewrite_web_search_query(state: GraphState) -> GraphState:
+    """
+    Async version of `rewrite_web_search_query`.
+    """
+    if state.get("web_results") is not None:
+        return {**state, "steps": state["steps"] + ["rewrite_web_search_query"]}
+
+    rewrite_web_search_chain = get_rewrite_web_search_chain(asynchronous=True)
+    result = await rewrite_web_search_chain(question=state["question"])
+
+    return _apply_rewrite(state, result)
+
 
+def _apply_web_results(state: GraphState, results: List[dict]) -> GraphState:
+    """
+    Appends web search results to the state documents.
+    """
+    documents = state["documents"]
+    steps = state["steps"] + ["web_search"]
 
+    new_documents = [
+        Document(page_content=r["content"], metadata={"url": r["url"]}) for r in results
+    ]
+    documents.extend(new_documents)
+
+    return {**state, "documents": documents, "steps": steps}
+
+
+@traced("web_search")
 def web_search(state: GraphState) -> GraphState:
     """
     Step 4 (if needed): Performs a web search using TavilySearch.
 
+    Results come from the speculative search when it ran, otherwise from the
+    web search cache or Tavily.
+
     Args:
         state (GraphState): The current graph state.
 
@@ -117,28 +423,40 @@ def web_search(state: GraphState) -> GraphState:
         GraphState: Updated state with additional web search documents.
     """
     web_search_query = state["web_search_query"]
-    documents = state["documents"]
-    steps = state["steps"] + ["web_search"]
 
-    tavily_tool = TavilySearchResults(k=3)
-    results = tavily_tool.invoke({"query": web_search_query})
+    results = state.get("web_results")
+    if results is None:
+        results = search_web(web_search_query)
 
     logging.warning(f"Performing web search with query: {web_search_query}")
 
-    new_documents = [
-        Document(page_content=r["content"], metadata={"url": r["url"]}) for r in results
-    ]
-    documents.extend(new_documents)
+    return _apply_web_results(state, results)
 
-    return {**state, "documents": documents, "steps": steps}
 
+@traced("web_search")
+async def aweb_search(state: GraphState) -> GraphState:
+    """
+    Async version of `web_search`, using Tavily's async client.
+    """
+    web_search_query = state["web_search_query"]
+
+    results = state.get("web_results")
+    if results is None:
+        results = await asearch_web(web_search_query)
+
+    logging.warning(f"Performing web search with query: {web_search_query}")
 
-def generate_answer(state: GraphState) -> GraphState:
+    return _apply_web_results(state, results)
+
+
+@traced("generate")
+def generate_answer(state: GraphState, config: RunnableConfig) -> GraphState:
     """
     Step 5: Generates the final answer using a RAG chain.
 
     Args:
         state (GraphState): The current graph state.
+        config (RunnableConfig): Node run configuration, forwarded to the chain for token streaming.
 
     Returns:
         GraphState: Updated state with the generated response.
@@ -147,55 +465,87 @@ def generate_answer(state: GraphState) -> GraphState:
     documents = state["documents"]
     steps = state["steps"] + ["generate_answer"]
 
-    # Concatenates retrieved documents
-    docs_text = "\n".join(d.page_content for d in documents)
+    # Packs the documents into the context token budget
+    docs_text = build_context(question, documents)
     rag_chain = get_rag_chain()
-    answer = rag_chain(question, docs_text)
+    answer = rag_chain(question, docs_text, config=config)
 
     return {**state, "generation": answer, "steps": steps}
 
 
-# Graph Construction
-workflow = StateGraph(GraphState)
-
-# Define nodes
-workflow.add_node("retrieve", retrieve)
-workflow.add_node("grade_documents", grade_documents)
-workflow.add_node("rewrite_web_search_query", rewrite_web_search_query)
-workflow.add_node("web_search", web_search)
-workflow.add_node("generate", generate_answer)
-
-# Define graph structure
-workflow.add_edge(START, "retrieve")
-workflow.add_edge("retrieve", "grade_documents")
-workflow.add_conditional_edges(
-    "grade_documents",
-    decide_to_generate,
-    {
-        "search": "rewrite_web_search_query",
-        "generate": "generate",
-    },
-)
-workflow.add_edge("rewrite_web_search_query", "web_search")
-workflow.add_edge("web_search", "generate")
-workflow.add_edge("generate", END)
+@traced("generate")
+async def agenerate_answer(state: GraphState, config: RunnableConfig) -> GraphState:
+    """
+    Async version of `generate_answer`.
+    """
+    question = state["question"]
+    documents = state["documents"]
+    steps = state["steps"] + ["generate_answer"]
+
+    docs_text = build_context(question, documents)
+    rag_chain = get_rag_chain(asynchronous=True)
+    answer = await rag_chain(question, docs_text, config=config)
 
-# Compile
-custom_graph = workflow.compile()
+    return {**state, "generation": answer, "steps": steps}
 
 
-def run_workflow(question: str, retriever=None) -> GraphState:
+def _build_graph(nodes: Dict[str, Any]):
     """
-    Runs the entire workflow by creating the initial state.
+    Builds and compiles the corrective RAG graph from a set of node functions.
 
     Args:
-        question (str): The input question.
-        retriever (optional): The document retriever.
+        nodes (Dict[str, Any]): Node functions keyed by node name (sync or async).
 
     Returns:
-        GraphState: The final state after executing the workflow.
+        The compiled graph.
     """
-    initial_state: GraphState = {
+    workflow = StateGraph(GraphState)
+
+    # Define nodes
+    for name, node in nodes.items():
+        workflow.add_node(name, node)
+
+    # Define graph structure
+    workflow.add_edge(START, "retrieve")
+    workflow.add_edge("retrieve", "grade_documents")
+    workflow.add_conditional_edges(
+        "grade_documents",
+        decide_to_generate,
+        {
+            "search": "rewrite_web_search_query",
+            "generate": "generate",
+        },
+    )
+    workflow.add_edge("rewrite_web_search_query", "web_search")
+    workflow.add_edge("web_search", "generate")
+    workflow.add_edge("generate", END)
+
+    # Compile
+    return workflow.compile()
+
+
+custom_graph = _build_graph({
+    "retrieve": retrieve,
+    "grade_documents": grade_documents,
+    "rewrite_web_search_query": rewrite_web_search_query,
+    "web_search": web_search,
+    "generate": generate_answer,
+})
+
+async_graph = _build_graph({
+    "retrieve": aretrieve,
+    "grade_documents": agrade_documents,
+    "rewrite_web_search_query": arewrite_web_search_query,
+    "web_search": aweb_search,
+    "generate": agenerate_answer,
+})
+
+
+def _initial_state(question: str, retriever=None) -> GraphState:
+    """
+    Builds the initial graph state for a question.
+    """
+    return {
         "question": question,
         "generation": "",
         "web_search_query": question,
@@ -203,6 +553,218 @@ def run_workflow(question: str, retriever=None) -> GraphState:
         "documents": [],
         "steps": [],
         "retriever": retriever,
+        "web_results": None,
     }
 
-    return custom_graph.invoke(initial_state)
+
+def _lookup_answer_cache(
+    question: str, retriever=None, question_vector: Optional[List[float]] = None
+) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """
+    Looks the question up in the semantic answer cache.
+
+    Args:
+        question (str): The input question.
+        retriever (optional): The document retriever, used for embeddings and the corpus version.
+        question_vector (Optional[List[float]], optional): Precomputed question embedding.
+
+    Returns:
+        Tuple: The cached answer (or None) and the context needed to store a new answer
+        (or None when the cache is disabled or the retriever cannot embed queries).
+    """
+    answer_cache = get_answer_cache()
+    if answer_cache is None or not hasattr(retriever, "embed_query"):
+        return None, None
+
+    # Cached by the embedding cache, so retrieval does not embed the question again
+    if question_vector is None:
+        question_vector = retriever.embed_query(question)
+    corpus_version = retriever.corpus_version()
+    context = {"cache": answer_cache, "retriever": retriever, "vector": question_vector, "version": corpus_version}
+
+    with span("answer_cache_lookup"):
+        cached = answer_cache.lookup(question_vector, corpus_version)
+    if cached is not None:
+        logging.warning(f"Semantic cache hit (similarity {cached['similarity']:.3f}) for: {cached['question']}")
+    return cached, context
+
+
+async def _alookup_answer_cache(
+    question: str, retriever=None
+) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """
+    Async version of `_lookup_answer_cache`; the question is embedded off the event loop.
+    """
+    if get_answer_cache() is None or not hasattr(retriever, "aembed_query"):
+        return None, None
+    question_vector = await retriever.aembed_query(question)
+    return _lookup_answer_cache(question, retriever, question_vector)
+
+
+def _store_answer_cache(context: Optional[Dict[str, Any]], question: str, final_state: GraphState) -> None:
+    """
+    Stores a generated answer in the semantic answer cache, unless generation failed
+    or the corpus changed while the question was being answered.
+    """
+    if context is None:
+        return
+    if not final_state["generation"] or final_state["generation"] == RAG_ERROR_MESSAGE:
+        return
+    if context["retriever"].corpus_version() != context["version"]:
+        # The answer may rest on chunks that were deleted or re-indexed during the run
+        logging.info("Corpus changed while answering; the answer is not cached.")
+        return
+    context["cache"].store(
+        question, context["vector"], final_state["generation"], final_state["steps"], context["version"]
+    )
+
+
+def _cached_state(initial_state: GraphState, cached: Dict[str, Any]) -> GraphState:
+    """
+    Builds the final state returned on a semantic cache hit.
+    """
+    return {**initial_state, "generation": cached["generation"], "steps": cached["steps"] + ["semantic_cache_hit"]}
+
+
+def _cached_events(cached: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Builds the stream events returned on a semantic cache hit.
+    """
+    steps = cached["steps"] + ["semantic_cache_hit"]
+    return [
+        {"event": "step", "node": "semantic_cache", "steps": steps},
+        {"event": "token", "content": cached["generation"]},
+        {"event": "end", "answer": cached["generation"], "steps": steps},
+    ]
+
+
+def run_workflow(question: str, retriever=None) -> GraphState:
+    """
+    Runs the entire workflow by creating the initial state.
+
+    When the semantic answer cache is enabled and the retriever exposes an
+    embedding model, a near-duplicate of a past question returns the cached
+    answer directly, with "semantic_cache_hit" appended to its steps.
+
+    Args:
+        question (str): The input question.
+        retriever (optional): The document retriever.
+
+    Returns:
+        GraphState: The final state after executing the workflow.
+    """
+    initial_state = _initial_state(question, retriever)
+
+    cached, cache_context = _lookup_answer_cache(question, retriever)
+    if cached is not None:
+        return _cached_state(initial_state, cached)
+
+    with count_llm_calls():
+        final_state = custom_graph.invoke(initial_state)
+    _store_answer_cache(cache_context, question, final_state)
+    return final_state
+
+
+async def arun_workflow(question: str, retriever=None) -> GraphState:
+    """
+    Async version of `run_workflow`: every node awaits its LLM, store and web
+    search calls, so many questions can be in flight on one event loop.
+
+    Args:
+        question (str): The input question.
+        retriever (optional): The document retriever (must expose `aretrieve`).
+
+    Returns:
+        GraphState: The final state after executing the workflow.
+    """
+    initial_state = _initial_state(question, retriever)
+
+    cached, cache_context = await _alookup_answer_cache(question, retriever)
+    if cached is not None:
+        return _cached_state(initial_state, cached)
+
+    with count_llm_calls():
+        final_state = await async_graph.ainvoke(initial_state)
+    _store_answer_cache(cache_context, question, final_state)
+    return final_state
+
+
+def _stream_event(mode: str, payload: Any, final_state: GraphState) -> Tuple[List[Dict[str, Any]], GraphState]:
+    """
+    Converts one LangGraph stream item into workflow events.
+
+    Args:
+        mode (str): The LangGraph stream mode ("updates" or "messages").
+        payload (Any): The stream payload.
+        final_state (GraphState): The state accumulated so far.
+
+    Returns:
+        Tuple: The events to emit and the updated accumulated state.
+    """
+    events = []
+    if mode == "messages":
+        chunk, metadata = payload
+        # Only the answer generation is streamed, not grading or rewriting outputs
+        if metadata.get("langgraph_node") == "generate" and chunk.content:
+            events.append({"event": "token", "content": chunk.content})
+    else:
+        for node, update in payload.items():
+            final_state = {**final_state, **update}
+            events.append({"event": "step", "node": node, "steps": update.get("steps", [])})
+    return events, final_state
+
+
+def stream_workflow(question: str, retriever=None) -> Iterator[Dict[str, Any]]:
+    """
+    Runs the entire workflow and yields events as soon as they are available.
+
+    Events are dictionaries with an "event" key:
+    - {"event": "step", "node": <node name>, "steps": [...]} when a node completes;
+    - {"event": "token", "content": <text>} for each token of the final answer;
+    - {"event": "end", "answer": <answer>, "steps": [...]} once the workflow is done.
+
+    Args:
+        question (str): The input question.
+        retriever (optional): The document retriever.
+
+    Yields:
+        Dict[str, Any]: Workflow events, in order.
+    """
+    initial_state = _initial_state(question, retriever)
+
+    cached, cache_context = _lookup_answer_cache(question, retriever)
+    if cached is not None:
+        yield from _cached_events(cached)
+        return
+
+    final_state = initial_state
+    with count_llm_calls():
+        for mode, payload in custom_graph.stream(initial_state, stream_mode=["updates", "messages"]):
+            events, final_state = _stream_event(mode, payload, final_state)
+            yield from events
+
+    _store_answer_cache(cache_context, question, final_state)
+    yield {"event": "end", "answer": final_state["generation"], "steps": final_state["steps"]}
+
+
+async def astream_workflow(question: str, retriever=None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Async version of `stream_workflow`, running the async graph.
+    """
+    initial_state = _initial_state(question, retriever)
+
+    cached, cache_context = await _alookup_answer_cache(question, retriever)
+    if cached is not None:
+        for event in _cached_events(cached):
+            yield event
+        return
+
+    final_state = initial_state
+    with count_llm_calls():
+        async for mode, payload in async_graph.astream(initial_state, stream_mode=["updates", "messages"]):
+            events, final_state = _stream_event(mode, payload, final_state)
+            for event in events:
+                yield event
+
+    _store_answer_cache(cache_context, question, final_state)
+    yield {"event": "end", "answer": final_state["generation"], "steps": final_state["steps"]}
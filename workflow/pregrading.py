@@ -0,0 +1,109 @@
+"""
+pregrading.py
+-------------
+Cheap local pre-grading run before the LLM grader.
+
+Each retrieved chunk carries the relevance score computed by the vector
+store (`metadata["retrieval_score"]`, 0-1, higher is more similar). Together
+with the share of question terms found in the chunk, it settles the clear-cut
+cases without an LLM call:
+- accepted: similarity at or above the accept threshold, or lexical overlap
+  at or above the overlap accept threshold (when enabled);
+- rejected: similarity at or below the reject threshold and lexical overlap
+  at or below the overlap reject threshold;
+- anything else (including chunks without a score, e.g. web results) is
+  left to the LLM grader.
+"""
+
+from typing import List, Optional
+from langchain.schema import Document
+from store.lexical_index import tokenize
+from utils.tracing import PREGRADE_DECISIONS, span
+from app.config import (
+    PREGRADE_ACCEPT_SIMILARITY,
+    PREGRADE_REJECT_SIMILARITY,
+    PREGRADE_ACCEPT_OVERLAP,
+    PREGRADE_REJECT_OVERLAP,
+)
+
+
+def lexical_overlap(question_terms: set, content: str) -> float:
+    """
+    Returns the share of the question terms found in a chunk.
+
+    Args:
+        question_terms (set): Distinct terms of the question.
+        content (str): The chunk content.
+
+    Returns:
+        float: Between 0 (no term in common) and 1 (every term present).
+    """
+    if not question_terms:
+        return 0.0
+    return len(question_terms & set(tokenize(content))) / len(question_terms)
+
+
+def pregrade(
+    question: str,
+    documents: List[Document],
+    accept_similarity: float = PREGRADE_ACCEPT_SIMILARITY,
+    reject_similarity: float = PREGRADE_REJECT_SIMILARITY,
+    accept_overlap: float = PREGRADE_ACCEPT_OVERLAP,
+    reject_overlap: float = PREGRADE_REJECT_OVERLAP,
+) -> List[Optional[dict]]:
+    """
+    Accepts or rejects the clear-cut documents without calling the LLM.
+
+    Args:
+        question (str): The user question.
+        documents (List[Document]): Retrieved documents.
+        accept_similarity (float, optional): Accept at or above this retrieval score.
+        reject_similarity (float, optional): Reject at or below this retrieval score.
+        accept_overlap (float, optional): Accept at or above this lexical overlap (0 disables it).
+        reject_overlap (float, optional): Rejection also requires the lexical overlap to be at or below this.
+
+    Returns:
+        List[Optional[dict]]: One result per document, such as {"score": "yes", "pregraded": "similarity"},
+        or None for documents left to the LLM grader.
+    """
+    question_terms = set(tokenize(question))
+    results: List[Optional[dict]] = []
+
+    with span("pregrade", documents=len(documents)) as attributes:
+        for doc in documents:
+            similarity = doc.metadata.get("retrieval_score")
+            overlap = lexical_overlap(question_terms, doc.page_content)
+
+            if similarity is not None and similarity >= accept_similarity:
+                result = {"score": "yes", "pregraded": "similarity"}
+            elif accept_overlap > 0 and overlap >= accept_overlap:
+                result = {"score": "yes", "pregraded": "lexical"}
+            elif similarity is not None and similarity <= reject_similarity and overlap <= reject_overlap:
+                result = {"score": "no", "pregraded": "similarity"}
+            else:
+                result = None
+
+            verdict = "ambiguous" if result is None else ("accepted" if result["score"] == "yes" else "rejected")
+            PREGRADE_DECISIONS.labels(verdict=verdict).inc()
+            attributes[verdict] = attributes.get(verdict, 0) + 1
+            results.append(result)
+
+    return results
+
+
+def merge_grades(pregraded: List[Optional[dict]], pending: List[int], graded: List[Optional[dict]]) -> List[Optional[dict]]:
+    """
+    Puts the LLM grading results of the pending documents back in document order.
+
+    Args:
+        pregraded (List[Optional[dict]]): Pre-grading results (None for pending documents).
+        pending (List[int]): Indexes of the documents sent to the LLM grader.
+        graded (List[Optional[dict]]): LLM grading results, aligned with `pending`.
+
+    Returns:
+        List[Optional[dict]]: One result per document.
+    """
+    results = list(pregraded)
+    for index, result in zip(pending, graded):
+        results[index] = result
+    return results
@@ -0,0 +1,200 @@
+"""
+semantic_cache.py
+-----------------
+Semantic answer cache placed in front of `run_workflow`.
+
+Past questions are embedded with the repository's embedding model and kept
+in a small in-process vector index. A new question whose cosine similarity
+with a cached question reaches the configured threshold gets the stored
+generation and steps back without running the graph.
+
+Entries are bounded by an LRU size and a TTL, and the whole cache is dropped
+whenever the repository corpus version changes (documents added or deleted,
+from this process or from `cli.py add-source`).
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+import numpy as np
+from app.config import (
+    ANSWER_CACHE_ENABLED,
+    ANSWER_CACHE_THRESHOLD,
+    ANSWER_CACHE_SIZE,
+    ANSWER_CACHE_TTL,
+)
+
+
+class SemanticAnswerCache:
+    """
+    In-process vector index of past questions and their answers.
+
+    Attributes:
+        threshold (float): Minimum cosine similarity for a hit.
+        max_size (int): Maximum number of cached questions.
+        ttl (Optional[float]): Entry lifetime in seconds, None for no expiry.
+        hits (int): Number of lookups answered from the cache.
+        misses (int): Number of lookups not answered from the cache.
+    """
+
+    def __init__(self, threshold: float = 0.95, max_size: int = 512, ttl: Optional[float] = 3600):
+        """
+        Initializes an empty semantic cache.
+
+        Args:
+            threshold (float, optional): Minimum cosine similarity for a hit. Defaults to 0.95.
+            max_size (int, optional): Maximum number of cached questions. Defaults to 512.
+            ttl (Optional[float], optional): Entry lifetime in seconds. Defaults to 3600.
+        """
+        self.threshold = threshold
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._next_id = 0
+        self._version: Optional[str] = None
+        self._matrix: Optional[np.ndarray] = None
+        self._matrix_ids: List[int] = []
+        self._lock = threading.Lock()
+
+    def lookup(self, vector: List[float], version: str) -> Optional[Dict[str, Any]]:
+        """
+        Finds the cached answer of the most similar past question.
+
+        Args:
+            vector (List[float]): Embedding of the incoming question.
+            version (str): Current corpus version; a change drops the whole cache.
+
+        Returns:
+            Optional[Dict[str, Any]]: {"question", "generation", "steps", "similarity"} on a hit, None otherwise.
+        """
+        query = _normalize(vector)
+
+        with self._lock:
+            self._check_version(version)
+            self._drop_expired()
+
+            best_id, best_score = None, -1.0
+            if self._entries:
+                if self._matrix is None:
+                    self._matrix_ids = list(self._entries.keys())
+                    self._matrix = np.vstack([self._entries[i]["vector"] for i in self._matrix_ids])
+                scores = self._matrix @ query
+                best = int(np.argmax(scores))
+                best_id, best_score = self._matrix_ids[best], float(scores[best])
+
+            if best_id is None or best_score < self.threshold:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._entries.move_to_end(best_id)
+            entry = self._entries[best_id]
+            return {
+                "question": entry["question"],
+                "generation": entry["generation"],
+                "steps": list(entry["steps"]),
+                "similarity": best_score,
+            }
+
+    def store(self, question: str, vector: List[float], generation: str, steps: List[str], version: str) -> None:
+        """
+        Adds a question and its answer to the cache, evicting the least recently used entries.
+        An answer produced on another corpus version than the cached one is dropped.
+
+        Args:
+            question (str): The original question.
+            vector (List[float]): Embedding of the question.
+            generation (str): The generated answer.
+            steps (List[str]): Steps followed to produce the answer.
+            version (str): Corpus version the answer was produced on.
+        """
+        if self.max_size <= 0:
+            return
+
+        with self._lock:
+            if self._version is not None and version != self._version:
+                # Only lookups move to a new version: a late store must not roll the cache back
+                return
+            self._version = version
+            self._entries[self._next_id] = {
+                "question": question,
+                "vector": _normalize(vector),
+                "generation": generation,
+                "steps": list(steps),
+                "created_at": time.time(),
+            }
+            self._next_id += 1
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            self._matrix = None
+
+    def clear(self) -> None:
+        """
+        Removes every cached answer.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns hit/miss counters and the number of cached questions.
+        """
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "size": len(self._entries),
+        }
+
+    def _check_version(self, version: str) -> None:
+        if version != self._version:
+            self._entries.clear()
+            self._matrix = None
+            self._version = version
+
+    def _drop_expired(self) -> None:
+        if self.ttl is None:
+            return
+        deadline = time.time() - self.ttl
+        expired = [key for key, entry in self._entries.items() if entry["created_at"] < deadline]
+        for key in expired:
+            del self._entries[key]
+        if expired:
+            self._matrix = None
+
+
+def _normalize(vector: List[float]) -> np.ndarray:
+    array = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(array)
+    return array / norm if norm > 0 else array
+
+
+_answer_cache: Optional[SemanticAnswerCache] = None
+_lock = threading.Lock()
+
+
+def get_answer_cache() -> Optional[SemanticAnswerCache]:
+    """
+    Returns the shared semantic answer cache, creating it on first use.
+
+    Returns:
+        Optional[SemanticAnswerCache]: The cache, or None when `ANSWER_CACHE_ENABLED` is false.
+    """
+    global _answer_cache
+
+    if not ANSWER_CACHE_ENABLED:
+        return None
+
+    with _lock:
+        if _answer_cache is None:
+            _answer_cache = SemanticAnswerCache(
+                threshold=ANSWER_CACHE_THRESHOLD,
+                max_size=ANSWER_CACHE_SIZE,
+                ttl=ANSWER_CACHE_TTL or None,
+            )
+        return _answer_cache
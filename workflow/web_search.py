@@ -0,0 +1,143 @@
+"""
+web_search.py
+-------------
+Tavily web search behind a result cache.
+
+Results are keyed by the normalized (rewritten) query and the number of
+results, kept in an LRU with a TTL and optionally on disk. Failed searches
+(Tavily returns an error string instead of a result list) are never cached.
+
+`speculate` runs a callable on a small shared thread pool; the graph uses it
+to rewrite the query and search the web while documents are being graded.
+"""
+
+import contextvars
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Callable, Optional
+from langchain_community.tools.tavily_search import TavilySearchResults
+from utils.cache import TieredCache
+from utils.id_utils import hash_text
+from utils.tracing import span
+from generation.grading_cache import normalize_question
+from app.config import (
+    WEB_SEARCH_RESULTS,
+    WEB_SEARCH_CACHE_ENABLED,
+    WEB_SEARCH_CACHE_SIZE,
+    WEB_SEARCH_CACHE_TTL,
+    WEB_SEARCH_CACHE_PATH,
+    WEB_SEARCH_CACHE_MAX_DISK_ENTRIES,
+)
+
+SPECULATION_WORKERS = 4
+
+_web_search_cache: Optional[TieredCache] = None
+_speculation_executor: Optional[ThreadPoolExecutor] = None
+_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def get_web_search_tool() -> TavilySearchResults:
+    """
+    Returns the shared Tavily search tool (one HTTP client per process).
+    """
+    return TavilySearchResults(k=WEB_SEARCH_RESULTS)
+
+
+def get_web_search_cache() -> Optional[TieredCache]:
+    """
+    Returns the shared web search cache, creating it on first use.
+
+    Returns:
+        Optional[TieredCache]: The cache, or None when `WEB_SEARCH_CACHE_ENABLED` is false.
+    """
+    global _web_search_cache
+
+    if not WEB_SEARCH_CACHE_ENABLED:
+        return None
+
+    with _lock:
+        if _web_search_cache is None:
+            _web_search_cache = TieredCache(
+                max_size=WEB_SEARCH_CACHE_SIZE,
+                ttl=WEB_SEARCH_CACHE_TTL or None,
+                path=WEB_SEARCH_CACHE_PATH or None,
+                table="web_search_results",
+                max_disk_entries=WEB_SEARCH_CACHE_MAX_DISK_ENTRIES,
+            )
+        return _web_search_cache
+
+
+def _cache_key(query: str) -> str:
+    return hash_text(normalize_question(query), str(WEB_SEARCH_RESULTS))
+
+
+def _remember(cache: Optional[TieredCache], key: str, results: Any) -> None:
+    if cache is not None and isinstance(results, list):
+        cache.set(key, results)
+
+
+def search_web(query: str) -> Any:
+    """
+    Searches the web for a query, going through the shared cache.
+
+    Args:
+        query (str): The web search query.
+
+    Returns:
+        Any: The Tavily results (a list of {"url", "content"} dicts), or an error string.
+    """
+    cache = get_web_search_cache()
+    key = _cache_key(query)
+    if cache is not None:
+        results = cache.get(key)
+        if results is not None:
+            logging.info(f"Web search cache hit for query: {query}")
+            return results
+
+    with span("tavily_search"):
+        results = get_web_search_tool().invoke({"query": query})
+    _remember(cache, key, results)
+    return results
+
+
+async def asearch_web(query: str) -> Any:
+    """
+    Async version of `search_web`.
+    """
+    cache = get_web_search_cache()
+    key = _cache_key(query)
+    if cache is not None:
+        results = cache.get(key)
+        if results is not None:
+            logging.info(f"Web search cache hit for query: {query}")
+            return results
+
+    with span("tavily_search"):
+        results = await get_web_search_tool().ainvoke({"query": query})
+    _remember(cache, key, results)
+    return results
+
+
+def speculate(func: Callable[..., Any], *args: Any) -> Future:
+    """
+    Runs `func(*args)` on the shared speculation pool, in a copy of the caller's context.
+
+    Args:
+        func (Callable): The work to start ahead of time.
+        *args: Arguments passed to `func`.
+
+    Returns:
+        Future: The pending result; cancel it (or ignore it) when it turns out to be unneeded.
+    """
+    global _speculation_executor
+
+    with _lock:
+        if _speculation_executor is None:
+            _speculation_executor = ThreadPoolExecutor(
+                max_workers=SPECULATION_WORKERS, thread_name_prefix="web-speculation"
+            )
+        executor = _speculation_executor
+    return executor.submit(contextvars.copy_context().run, func, *args)